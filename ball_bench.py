@@ -0,0 +1,125 @@
+"""乒乓球物理核心和轨迹绘制的基准，不打开窗口
+
+场地、木板和弹簧与 pingpang-1.py 的默认窗口相同，球从木板上方随机位置出发。
+--trails 时改为测量轨迹绘制：先用物理核心跑满一条轨迹的时长，再把所有球的轨迹画到离屏 Surface。
+
+用法示例：
+    python ball_bench.py --balls 5 100 1000 --steps 600
+    python ball_bench.py --world arrays --balls 10000 --no-ball-collisions
+    python ball_bench.py --broad-phase grid all --balls 100 1000
+    python ball_bench.py --trails stamps polyline --balls 5 100 1000 --steps 20
+"""
+import argparse
+import random
+import time
+
+import pygame
+
+from ball_physics import ArrayBallWorld, BallWorld, PhysicsConfig
+from broad_phase import BROAD_PHASES
+from trail_buffer import TrailBuffer, trail_capacity
+from trail_render import PolylineTrails, TrailAtlas, draw_trails
+
+WIDTH = 800
+HEIGHT = 600
+FPS = 120
+BALL_RADIUS = 10
+PADDLE_HEIGHT = 20
+SPRING_WIDTH = 50
+SPRING_HEIGHT = 20
+TRAIL_TIME = 2500  # 毫秒
+TRAIL_SEGMENTS = 16
+
+
+WORLDS = {"objects": BallWorld, "arrays": ArrayBallWorld}
+
+
+def create_world(balls: int, seed: int = 0, world_type: str = "objects", ball_collisions: bool = True,
+                 broad_phase: str = "grid"):
+    random.seed(seed)
+    config = PhysicsConfig(gravity=9.8 / FPS, ball_collisions=ball_collisions, broad_phase=broad_phase)
+    world = WORLDS[world_type](WIDTH, HEIGHT, config)
+    paddle_y = HEIGHT - PADDLE_HEIGHT - 10
+    world.set_paddle(0, paddle_y, WIDTH, PADDLE_HEIGHT)
+    world.set_spring((WIDTH - SPRING_WIDTH) // 2, paddle_y, SPRING_WIDTH, SPRING_HEIGHT)
+    for _ in range(balls):
+        world.add_ball(random.uniform(BALL_RADIUS, WIDTH - BALL_RADIUS),
+                       random.uniform(BALL_RADIUS, paddle_y - BALL_RADIUS), BALL_RADIUS)
+    return world
+
+
+def bench_physics(balls: int, steps: int, world_type: str = "objects", ball_collisions: bool = True,
+                  broad_phase: str = "grid"):
+    """返回每步的平均耗时（毫秒）和球对统计"""
+    world = create_world(balls, world_type=world_type, ball_collisions=ball_collisions, broad_phase=broad_phase)
+    begin = time.perf_counter()
+    for _ in range(steps):
+        world.step()
+    return (time.perf_counter() - begin) / steps * 1000, world.pair_stats
+
+
+def create_trails(balls: int):
+    """跑满一条轨迹的时长，每步记录一次所有球的位置"""
+    world = create_world(balls, world_type="arrays", ball_collisions=False)
+    trails = [TrailBuffer(trail_capacity(TRAIL_TIME / 1000, FPS)) for _ in range(balls)]
+    samples = int(TRAIL_TIME / 1000 * FPS)
+    for step in range(samples):
+        world.step()
+        now = step * 1000 / FPS
+        for (x, y), trail in zip(world.position.tolist(), trails):
+            trail.append(x, y, now)
+    return trails, (samples - 1) * 1000 / FPS
+
+
+def bench_trails(balls: int, frames: int, mode: str):
+    """返回每帧画出所有轨迹的平均耗时（毫秒）和每帧的绘制数（圆点数或线段数）"""
+    trails, now = create_trails(balls)
+    screen = pygame.Surface((WIDTH, HEIGHT))
+    if mode == "polyline":
+        polyline = PolylineTrails(TRAIL_SEGMENTS)
+        draw = lambda: polyline.draw(screen, trails, BALL_RADIUS, now, TRAIL_TIME)
+    else:
+        atlas = TrailAtlas()
+        draw = lambda: draw_trails(screen, atlas, trails, BALL_RADIUS, now, TRAIL_TIME)
+    draw()  # 第一次画出贴图集
+    begin = time.perf_counter()
+    for _ in range(frames):
+        screen.fill((50, 50, 50))
+        count = draw()
+    return (time.perf_counter() - begin) / frames * 1000, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ping-pong physics core without a window")
+    parser.add_argument("--balls", type=int, nargs="+", default=[5, 100, 1000], help="ball counts to measure")
+    parser.add_argument("--steps", type=int, default=600, help="steps per measurement")
+    parser.add_argument("--world", choices=sorted(WORLDS), nargs="+", default=sorted(WORLDS),
+                        help="physics implementations to measure")
+    parser.add_argument("--no-ball-collisions", action="store_true", help="skip ball-ball collisions")
+    parser.add_argument("--broad-phase", choices=sorted(BROAD_PHASES), nargs="+", default=["grid"],
+                        help="candidate pair search to measure")
+    parser.add_argument("--trails", choices=["polyline", "stamps"], nargs="+",
+                        help="measure trail drawing in these modes instead of physics (--steps frames each)")
+    args = parser.parse_args()
+
+    budget = 1000 / FPS
+    if args.trails:
+        for mode in args.trails:
+            for balls in args.balls:
+                ms, count = bench_trails(balls, args.steps, mode)
+                print(f"{mode:>8} {balls:>6} balls: {ms:8.3f} ms/frame ({ms / budget:.0%} of the {FPS} FPS budget), "
+                      f"{count} draws/frame")
+        return
+    for world_type in args.world:
+        for broad_phase in args.broad_phase:
+            for balls in args.balls:
+                ms, stats = bench_physics(balls, args.steps, world_type, not args.no_ball_collisions, broad_phase)
+                steps = max(stats.steps, 1)
+                print(f"{world_type:>8} {broad_phase:>4} {balls:>6} balls: {ms:8.3f} ms/step "
+                      f"({ms / budget:.0%} of the {FPS} FPS budget), "
+                      f"pairs/step tested {stats.tested / steps:.0f} candidates {stats.candidates / steps:.0f} "
+                      f"resolved {stats.resolved / steps:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,489 @@
+"""乒乓球游戏共用的物理核心
+
+与绘制无关，不依赖 pygame 或 arcade：各个版本的界面只调用 step() 推进一步，
+再读出球的位置画出来。可以脱离窗口单独跑基准（见 ball_bench.py）。
+
+BallWorld 每个球是一个 Ball 对象，适合几个球；ArrayBallWorld 接口相同，
+把所有球的位置、速度、半径和颜色存成 numpy 数组（结构数组），整批计算，适合成千上万个球。
+
+坐标为屏幕坐标，原点在左上角、y 轴向下，重力向 +y。
+arcade 的 y 轴向上，绘制和处理鼠标时自行翻转。
+"""
+import math
+import random
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from broad_phase import BROAD_PHASES, PairStats
+
+Color = Tuple[int, int, int]
+Rect = Tuple[float, float, float, float]  # (左, 上, 宽, 高)
+
+
+def random_color() -> Color:
+    """随机的非灰度颜色"""
+    while True:
+        r, g, b = random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)
+        if not (r == g == b):
+            return (r, g, b)
+
+
+# 弹簧的几种规则，各乒乓球界面沿用自己原来的那一种：
+# launch：球心在弹簧的水平范围内、下沿落在弹簧里时弹起；从弹簧上方落下的按 spring_speed 弹起，
+#         否则按 max(|vy| * spring_boost, spring_speed) 弹起（pingpang-1.py）
+# additive：条件同 launch，但上面的速度加到原来的竖直速度上，并且先于木板检测（pingpang.py）
+# boost：球心在弹簧的水平范围内、下沿低于弹簧上沿时，竖直速度变为向下的 |vy| * spring_boost，没有最小速度（pingpang-arcade.py）
+SPRING_RULES = ("launch", "additive", "boost")
+
+
+@dataclass
+class PhysicsConfig:
+    gravity: float = 9.8 / 120   # 每步加到竖直速度上的重力
+    damping_factor: float = 0.98  # 每 damping_interval 步竖直速度乘的衰减
+    damping_interval: int = 60    # 1 表示每步都衰减
+    semi_implicit: bool = False   # 先加重力再移动（半隐式欧拉），否则先移动再加重力
+    restitution: float = 1.0     # 球与球碰撞的弹性系数，1 为完全弹性
+    spring_speed: float = 5      # 弹簧把球弹起的最小速度
+    spring_boost: float = 1.2    # 弹簧把下落速度放大的倍数
+    spring_rule: str = "launch"  # 弹簧的规则，见 SPRING_RULES
+    rest_speed: float = 0        # 竖直速度小于此值且贴近木板时停在木板上，0 表示不停
+    bottom_wall: bool = False     # 场地下边也是墙
+    sticky_walls: bool = False    # 球在墙外时每步都反向（pingpang-arcade.py 原来的规则），否则只反弹朝墙外运动的球
+    paddle_band: bool = False     # 木板只接住下沿落在木板厚度内的球，否则下沿低于木板上沿就接住
+    ball_collisions: bool = True  # 是否计算球与球的碰撞
+    broad_phase: str = "grid"     # 找候选球对的方法，见 broad_phase.BROAD_PHASES
+
+
+@dataclass
+class Ball:
+    x: float
+    y: float
+    radius: float
+    vx: float
+    vy: float
+    color: Color = field(default_factory=random_color)
+    counter: int = 0      # 距上次衰减的步数
+    prev_y: float = None  # 上一步的 y，用来判断是否从弹簧上方落下
+
+    def __post_init__(self):
+        if self.prev_y is None:
+            self.prev_y = self.y
+
+
+class BallWorld:
+    """一组球在矩形场地中运动：重力、衰减、墙、木板、弹簧和球与球的弹性碰撞
+
+    场地左、右、上三面是墙（bottom_wall 时下面也是），下方由木板（paddle）和木板上的弹簧（spring）托住。
+    """
+
+    def __init__(self, width: float, height: float, config: Optional[PhysicsConfig] = None):
+        self.config = config or PhysicsConfig()
+        self.width = width
+        self.height = height
+        self.paddle: Rect = (0, height, width, 0)
+        self.spring: Rect = (0, height, 0, 0)
+        self.balls: List[Ball] = []
+        self.bounces = 0  # 累计碰撞次数
+        self.pair_stats = PairStats()
+
+    def __len__(self) -> int:
+        return len(self.balls)
+
+    def resize(self, width: float, height: float):
+        self.width = width
+        self.height = height
+
+    def set_paddle(self, x: float, y: float, width: float, height: float):
+        self.paddle = (x, y, width, height)
+
+    def set_spring(self, x: float, y: float, width: float, height: float):
+        self.spring = (x, y, width, height)
+
+    def add_ball(self, x: float, y: float, radius: float, speed: Optional[Tuple[float, float]] = None,
+                 color: Optional[Color] = None) -> int:
+        """添加一个球，返回它的序号；速度默认为向右下方的随机速度"""
+        if speed is None:
+            speed = (random.uniform(1, 3), random.uniform(1, 3))
+        self.balls.append(Ball(x, y, radius, speed[0], speed[1], color or random_color()))
+        return len(self.balls) - 1
+
+    def remove_ball(self, index: int = -1) -> Ball:
+        return self.balls.pop(index)
+
+    def positions(self) -> List[Tuple[float, float]]:
+        return [(ball.x, ball.y) for ball in self.balls]
+
+    def step(self) -> int:
+        """推进一步，返回这一步发生的碰撞次数（界面据此播放声音）"""
+        bounces = 0
+        for ball in self.balls:
+            self._integrate(ball)
+            bounces += self._collide_bounds(ball)
+        if self.config.ball_collisions:
+            bounces += self._collide_balls()
+        self.bounces += bounces
+        return bounces
+
+    def _integrate(self, ball: Ball):
+        config = self.config
+        ball.prev_y = ball.y
+        paddle_top = self.paddle[1]
+        if config.rest_speed and abs(ball.vy) < config.rest_speed and paddle_top - ball.y < 2 * ball.radius + 2:
+            # 速度很小又贴近木板时直接停在木板上，避免原地抖动
+            ball.x += ball.vx
+            ball.vy = 0
+            ball.y = paddle_top - ball.radius
+            return
+        ball.x += ball.vx
+        if config.semi_implicit:
+            ball.vy += config.gravity
+            ball.y += ball.vy
+        else:
+            ball.y += ball.vy
+            ball.vy += config.gravity
+        ball.counter += 1
+        if ball.counter >= config.damping_interval:
+            ball.vy *= config.damping_factor
+            ball.counter = 0
+
+    def _collide_bounds(self, ball: Ball) -> int:
+        """墙、木板和弹簧，返回碰撞次数"""
+        bounces = 0
+        # 只反弹朝墙外运动的球：被其他球推出墙外的球已经往回走时不再反向，否则会卡在墙外
+        sticky = self.config.sticky_walls
+        if ((ball.x - ball.radius < 0 and (sticky or ball.vx < 0))
+                or (ball.x + ball.radius > self.width and (sticky or ball.vx > 0))):
+            ball.vx = -ball.vx
+            bounces += 1
+        if ((ball.y - ball.radius < 0 and (sticky or ball.vy < 0))
+                or (self.config.bottom_wall and ball.y + ball.radius > self.height and (sticky or ball.vy > 0))):
+            ball.vy = -ball.vy
+            bounces += 1
+        if self.config.spring_rule == "additive":
+            # 先弹簧后木板：弹簧加上的向下速度再由木板反弹
+            return bounces + self._collide_spring(ball) + self._collide_paddle(ball)
+        return bounces + self._collide_paddle(ball) + self._collide_spring(ball)
+
+    def _collide_paddle(self, ball: Ball) -> int:
+        # 水平方向与木板相交、下沿低于木板上沿且向下运动时反弹；默认不限制木板下沿，一步越过整块木板的快球也能接住
+        x, y, width, height = self.paddle
+        bottom = ball.y + ball.radius
+        if (ball.vy > 0 and bottom > y and ball.x + ball.radius > x and ball.x - ball.radius < x + width
+                and (not self.config.paddle_band or bottom <= y + height)):
+            ball.vy = -ball.vy
+            return 1
+        return 0
+
+    def _collide_spring(self, ball: Ball) -> int:
+        x, y, width, height = self.spring
+        config = self.config
+        if config.spring_rule == "boost":
+            if x <= ball.x <= x + width and ball.y + ball.radius >= y:
+                ball.vy = abs(ball.vy) * config.spring_boost
+                return 1
+            return 0
+        if (_overlaps(ball, self.spring) and x <= ball.x <= x + width
+                and y <= ball.y + ball.radius <= y + height):
+            if ball.prev_y <= y:
+                # 从弹簧上方落下，按固定速度弹起
+                speed = config.spring_speed
+            else:
+                speed = max(abs(ball.vy) * config.spring_boost, config.spring_speed)
+            if config.spring_rule == "additive":
+                ball.vy += speed
+            else:
+                ball.vy = -speed
+            return 1
+        return 0
+
+    def _collide_balls(self) -> int:
+        """粗检测找出外接矩形相交的球对，按 (i, j) 顺序逐对求解：相向运动且重叠的一对交换法向速度并推开"""
+        balls = self.balls
+        if len(balls) < 2:
+            return 0
+        position = np.array([(ball.x, ball.y) for ball in balls])
+        radius = np.array([ball.radius for ball in balls])
+        first, second = BROAD_PHASES[self.config.broad_phase](position, radius, stats=self.pair_stats)
+        bounces = 0
+        for i, j in zip(first.tolist(), second.tolist()):
+            bounces += self._resolve(balls[i], balls[j])
+        self.pair_stats.resolved += bounces
+        return bounces
+
+    def _resolve(self, a: Ball, b: Ball) -> int:
+        dx = a.x - b.x
+        dy = a.y - b.y
+        reach = a.radius + b.radius
+        distance2 = dx * dx + dy * dy
+        if distance2 >= reach * reach:
+            return 0
+        distance = math.sqrt(distance2)
+        if distance > 0:
+            nx, ny = dx / distance, dy / distance
+        else:
+            nx, ny = 1.0, 0.0  # 完全重合时任取一个方向推开
+        # 法向相对速度为正说明正在远离，不处理
+        normal_vel = (a.vx - b.vx) * nx + (a.vy - b.vy) * ny
+        if normal_vel > 0:
+            return 0
+        # 质量相同，每个球得到一半的 (1 + e) 倍法向相对速度
+        impulse = -(1 + self.config.restitution) / 2 * normal_vel
+        a.vx += impulse * nx
+        a.vy += impulse * ny
+        b.vx -= impulse * nx
+        b.vy -= impulse * ny
+        overlap = (reach - distance) / 2
+        a.x += overlap * nx
+        a.y += overlap * ny
+        b.x -= overlap * nx
+        b.y -= overlap * ny
+        return 1
+
+
+def _overlaps(ball: Ball, rect: Rect) -> bool:
+    """球的外接矩形与 rect 是否相交"""
+    x, y, width, height = rect
+    return (ball.x + ball.radius > x and ball.x - ball.radius < x + width
+            and ball.y + ball.radius > y and ball.y - ball.radius < y + height)
+
+
+class ArrayBallWorld:
+    """与 BallWorld 接口和规则相同，所有球存成数组整批计算
+
+    数组容量按倍数增长，position/velocity/radius/color 等属性是前 len(self) 行的视图。
+    球与球的碰撞与 BallWorld 一样按 (i, j) 的顺序逐对求解，互不相交的球对分批整批计算，见 resolve_pairs_in_order。
+    """
+
+    def __init__(self, width: float, height: float, config: Optional[PhysicsConfig] = None,
+                 capacity: int = 64):
+        self.config = config or PhysicsConfig()
+        self.width = width
+        self.height = height
+        self.paddle: Rect = (0, height, width, 0)
+        self.spring: Rect = (0, height, 0, 0)
+        self.count = 0
+        self.bounces = 0
+        self.pair_stats = PairStats()
+        self._position = np.zeros((capacity, 2))
+        self._velocity = np.zeros((capacity, 2))
+        self._radius = np.zeros(capacity)
+        self._color = np.zeros((capacity, 3), dtype=np.uint8)
+        self._counter = np.zeros(capacity, dtype=np.intp)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def position(self) -> np.ndarray:
+        return self._position[:self.count]
+
+    @property
+    def velocity(self) -> np.ndarray:
+        return self._velocity[:self.count]
+
+    @property
+    def radius(self) -> np.ndarray:
+        return self._radius[:self.count]
+
+    @property
+    def color(self) -> np.ndarray:
+        return self._color[:self.count]
+
+    def resize(self, width: float, height: float):
+        self.width = width
+        self.height = height
+
+    def set_paddle(self, x: float, y: float, width: float, height: float):
+        self.paddle = (x, y, width, height)
+
+    def set_spring(self, x: float, y: float, width: float, height: float):
+        self.spring = (x, y, width, height)
+
+    def _grow(self, capacity: int):
+        for name in ("_position", "_velocity", "_radius", "_color", "_counter"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add_ball(self, x: float, y: float, radius: float, speed: Optional[Tuple[float, float]] = None,
+                 color: Optional[Color] = None) -> int:
+        """添加一个球，返回它的序号；速度默认为向右下方的随机速度"""
+        if speed is None:
+            speed = (random.uniform(1, 3), random.uniform(1, 3))
+        return self.add_balls([(x, y)], radius, [speed], [color or random_color()])
+
+    def add_balls(self, positions, radius, speeds=None, colors=None) -> int:
+        """一次添加多个球，speeds/colors 缺省时随机，返回第一个新球的序号"""
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        count = len(positions)
+        if speeds is None:
+            speeds = np.random.uniform(1, 3, (count, 2))
+        if colors is None:
+            colors = [random_color() for _ in range(count)]
+        start, end = self.count, self.count + count
+        if end > len(self._radius):
+            self._grow(max(end, 2 * len(self._radius)))
+        self._position[start:end] = positions
+        self._velocity[start:end] = speeds
+        self._radius[start:end] = radius
+        self._color[start:end] = colors
+        self._counter[start:end] = 0
+        self.count = end
+        return start
+
+    def remove_ball(self, index: int = -1):
+        """删除第 index 个球，后面的球依次前移，保持顺序"""
+        index %= self.count
+        for array in (self._position, self._velocity, self._radius, self._color, self._counter):
+            array[index:self.count - 1] = array[index + 1:self.count]
+        self.count -= 1
+
+    def positions(self) -> np.ndarray:
+        return self.position
+
+    def step(self) -> int:
+        """推进一步，返回这一步发生的碰撞次数（界面据此播放声音）"""
+        config = self.config
+        position, velocity, radius = self.position, self.velocity, self.radius
+        x, y = position[:, 0], position[:, 1]
+        vx, vy = velocity[:, 0], velocity[:, 1]
+        prev_y = y.copy()
+        paddle_x, paddle_top, paddle_width, paddle_height = self.paddle
+
+        # 积分；速度很小又贴近木板的球停在木板上，不受重力
+        x += vx
+        if config.rest_speed:
+            resting = (np.abs(vy) < config.rest_speed) & (paddle_top - y < 2 * radius + 2)
+            moving = ~resting
+            vy[resting] = 0
+            y[resting] = paddle_top - radius[resting]
+        else:
+            moving = slice(None)
+        if config.semi_implicit:
+            vy[moving] += config.gravity
+            y[moving] += vy[moving]
+        else:
+            y[moving] += vy[moving]
+            vy[moving] += config.gravity
+        counter = self._counter[:self.count]
+        counter[moving] += 1
+        damped = counter >= config.damping_interval
+        vy[damped] *= config.damping_factor
+        counter[damped] = 0
+
+        # 墙；规则同 BallWorld._collide_bounds
+        sticky = config.sticky_walls
+        side = ((x - radius < 0) & (sticky | (vx < 0))) | ((x + radius > self.width) & (sticky | (vx > 0)))
+        vx[side] *= -1
+        top = (y - radius < 0) & (sticky | (vy < 0))
+        if config.bottom_wall:
+            top |= (y + radius > self.height) & (sticky | (vy > 0))
+        vy[top] *= -1
+        bounces = int(side.sum()) + int(top.sum())
+
+        # 木板；additive 规则先弹簧后木板，与 BallWorld 相同
+        additive = config.spring_rule == "additive"
+        if not additive:
+            bounces += self._collide_paddle(x, y, vy, radius)
+
+        # 弹簧：规则见 SPRING_RULES
+        spring_x, spring_y, spring_width, spring_height = self.spring
+        bottom = y + radius
+        if config.spring_rule == "boost":
+            hit = (spring_x <= x) & (x <= spring_x + spring_width) & (bottom >= spring_y)
+            vy[hit] = np.abs(vy[hit]) * config.spring_boost
+        else:
+            hit = (_overlaps_rect(x, y, radius, self.spring) & (spring_x <= x) & (x <= spring_x + spring_width)
+                   & (spring_y <= bottom) & (bottom <= spring_y + spring_height))
+            if hit.any():
+                boosted = np.maximum(np.abs(vy[hit]) * config.spring_boost, config.spring_speed)
+                speed = np.where(prev_y[hit] <= spring_y, config.spring_speed, boosted)
+                vy[hit] = vy[hit] + speed if additive else -speed
+        bounces += int(hit.sum())
+        if additive:
+            bounces += self._collide_paddle(x, y, vy, radius)
+
+        if config.ball_collisions and self.count > 1:
+            first, second = BROAD_PHASES[config.broad_phase](position, radius, stats=self.pair_stats)
+            resolved = resolve_pairs_in_order(position, velocity, radius, first, second, config.restitution)
+            self.pair_stats.resolved += resolved
+            bounces += resolved
+        self.bounces += bounces
+        return bounces
+
+    def _collide_paddle(self, x: np.ndarray, y: np.ndarray, vy: np.ndarray, radius: np.ndarray) -> int:
+        # 规则同 BallWorld._collide_paddle
+        left, top, width, height = self.paddle
+        bottom = y + radius
+        hit = (vy > 0) & (bottom > top) & (x + radius > left) & (x - radius < left + width)
+        if self.config.paddle_band:
+            hit &= bottom <= top + height
+        vy[hit] *= -1
+        return int(hit.sum())
+
+
+def resolve_pairs(position: np.ndarray, velocity: np.ndarray, radius: np.ndarray,
+                  first: np.ndarray, second: np.ndarray, restitution: float = 1.0, relax: bool = False) -> int:
+    """候选球对中相向运动且重叠的，交换法向速度并推开，所有球对同时求解，返回求解的球对数
+
+    position/velocity 为 (n, d) 数组，原地修改，二维、三维通用；球的质量相同，一对球得到大小相等、方向相反的冲量。
+    同时求解时一个球的各对冲量直接相加，球挤在一起时会越撞越快；relax 为真时每对的冲量除以
+    两个球中较多的接触数（两个球用同一个系数，动量仍守恒），每个球的速度改变量不超过各对冲量的平均。
+    """
+    delta = position[first] - position[second]
+    reach = radius[first] + radius[second]
+    distance2 = (delta * delta).sum(axis=1)
+    touching = distance2 < reach * reach
+    first, second, delta, reach = first[touching], second[touching], delta[touching], reach[touching]
+    distance = np.sqrt(distance2[touching])
+    # 完全重合时任取一个方向（第一个坐标轴）推开
+    axis0 = np.eye(position.shape[1])[0]
+    normal = np.where(distance[:, None] > 0, delta / np.maximum(distance, 1e-12)[:, None], axis0)
+    normal_vel = ((velocity[first] - velocity[second]) * normal).sum(axis=1)
+    # 法向相对速度为正说明正在远离，不处理
+    approaching = normal_vel <= 0
+    first, second, normal = first[approaching], second[approaching], normal[approaching]
+    impulse = -(1 + restitution) / 2 * normal_vel[approaching]
+    push = (reach[approaching] - distance[approaching]) / 2
+    n = len(position)
+    if relax and len(first):
+        contacts = np.bincount(first, minlength=n) + np.bincount(second, minlength=n)
+        impulse /= np.maximum(contacts[first], contacts[second])
+    for axis in range(position.shape[1]):
+        dv = impulse * normal[:, axis]
+        dp = push * normal[:, axis]
+        velocity[:, axis] += np.bincount(first, dv, n) - np.bincount(second, dv, n)
+        position[:, axis] += np.bincount(first, dp, n) - np.bincount(second, dp, n)
+    return len(first)
+
+
+def resolve_pairs_in_order(position: np.ndarray, velocity: np.ndarray, radius: np.ndarray,
+                           first: np.ndarray, second: np.ndarray, restitution: float = 1.0) -> int:
+    """按 (i, j) 的顺序逐对求解，结果与 BallWorld 逐对求解相同，返回求解的球对数
+
+    球对须按 (i, j) 排好序（粗检测的 ordered=True）。一对球只受排在它前面、与它共用一个球的球对影响，
+    所以每一轮取出两个球都没有更早的未解球对的那些球对，它们互不相交，用 resolve_pairs 同时求解。
+    轮数是前后相依的球对链的最长长度，场地挤满时约为球数的五十分之一。
+    """
+    n = len(position)
+    pending = np.arange(len(first))
+    resolved = 0
+    while len(pending):
+        a, b = first[pending], second[pending]
+        # 每个球最早的未解球对
+        earliest = np.full(n, len(first))
+        np.minimum.at(earliest, a, pending)
+        np.minimum.at(earliest, b, pending)
+        ready = (earliest[a] == pending) & (earliest[b] == pending)
+        resolved += resolve_pairs(position, velocity, radius, a[ready], b[ready], restitution)
+        pending = pending[~ready]
+    return resolved
+
+
+def _overlaps_rect(x: np.ndarray, y: np.ndarray, radius: np.ndarray, rect: Rect) -> np.ndarray:
+    """每个球的外接矩形与 rect 是否相交"""
+    left, top, width, height = rect
+    return (x + radius > left) & (x - radius < left + width) & (y + radius > top) & (y - radius < top + height)
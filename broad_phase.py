@@ -0,0 +1,160 @@
+"""球与球碰撞的粗检测（broad phase）
+
+找出外接盒相交的球对，交给各自的精确检测和求解。与维数无关：position 为 (n, d) 数组，
+二维的乒乓球（ball_physics.py）和三维的 pingpang3d.py 共用。
+
+grid_pairs 用均匀网格，格子边长不小于最大直径，每个球只和自己所在格子及一半相邻格子里的球配对，
+每对只产生一次，耗时约 O(n)；all_pairs 是分块广播的两两比较，O(n²)，用作对照。
+两者返回的球对相同，都按 (i, j) 排序且 i < j。
+"""
+import itertools
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+
+@dataclass
+class PairStats:
+    """累计的粗检测统计，用来分析耗时
+
+    tested 是网格产生（或两两比较）的球对数，candidates 是其中外接盒相交、交给精确检测的球对数，
+    resolved 由调用方累加实际求解的碰撞数；brute_force 是同样的球数两两比较需要的球对数。
+    """
+    steps: int = 0
+    brute_force: int = 0
+    tested: int = 0
+    candidates: int = 0
+    resolved: int = 0
+
+    def reset(self):
+        self.steps = self.brute_force = self.tested = self.candidates = self.resolved = 0
+
+    def add(self, balls: int, tested: int, candidates: int):
+        self.steps += 1
+        self.brute_force += balls * (balls - 1) // 2
+        self.tested += tested
+        self.candidates += candidates
+
+    @property
+    def pruned(self) -> float:
+        """相对两两比较省掉的球对比例"""
+        return 1 - self.tested / self.brute_force if self.brute_force else 0.0
+
+
+def _half_offsets(dims: int) -> np.ndarray:
+    """自身和一半相邻格子的偏移：第一个非零分量为正，另一半由对面的格子负责"""
+    offsets = [offset for offset in itertools.product((-1, 0, 1), repeat=dims)
+               if next((value for value in offset if value), 1) > 0]
+    return np.array(offsets, dtype=np.int64)
+
+
+def _expand(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """把若干区间 [start, start + count) 连成一个下标数组"""
+    total = int(counts.sum())
+    ends = np.cumsum(counts)
+    return np.arange(total) - np.repeat(ends - counts - starts, counts)
+
+
+def _overlapping(position: np.ndarray, radius: np.ndarray,
+                 first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """每一对的外接盒是否相交"""
+    reach = radius[first] + radius[second]
+    near = np.ones(len(first), dtype=bool)
+    for axis in range(position.shape[1]):
+        column = position[:, axis]
+        near &= np.abs(column[first] - column[second]) < reach
+    return near
+
+
+def _sorted_pairs(first: np.ndarray, second: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    first, second = np.minimum(first, second), np.maximum(first, second)
+    keys = np.sort(first.astype(np.int64) * n + second)
+    return keys // n, keys % n
+
+
+def grid_pairs(position: np.ndarray, radius: np.ndarray, cell_size: float = None,
+               stats: PairStats = None, ordered: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """均匀网格找出外接盒相交的球对 (i, j)
+
+    cell_size 默认是最大直径，保证相交的两个球落在相同或相邻的格子里。
+    格子坐标编成一个整数键排序，相邻格子里的球用 searchsorted 找出区间，全部是数组运算。
+    ordered 为真时球对整理成 i < j 并按 (i, j) 排序，与 all_pairs 相同，逐对顺序求解时结果确定；
+    所有球对同时求解时不需要顺序，可以省掉排序。
+    """
+    position = np.asarray(position, dtype=float)
+    radius = np.asarray(radius, dtype=float)
+    n, dims = position.shape
+    empty = np.empty(0, dtype=np.intp)
+    if n < 2:
+        if stats is not None:
+            stats.add(n, 0, 0)
+        return empty, empty
+    if cell_size is None:
+        cell_size = 2 * float(radius.max())
+    cells = np.floor(position / max(cell_size, 1e-9)).astype(np.int64)
+    cells -= cells.min(axis=0) - 1  # 相邻格子的坐标也不小于 0
+    shape = cells.max(axis=0) + 2
+    strides = np.cumprod(np.concatenate(([1], shape[:-1])))
+    keys = cells @ strides
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+
+    ranks = np.arange(n)
+    first, second = [], []
+    for offset in _half_offsets(dims) @ strides:
+        target = keys + offset
+        if offset == 0:
+            # 同一格子里只和排在后面的球配对
+            lo = ranks + 1
+        else:
+            lo = np.searchsorted(keys, target, "left")
+        hi = np.searchsorted(keys, target, "right")
+        counts = np.maximum(hi - lo, 0)
+        if counts.any():
+            first.append(np.repeat(ranks, counts))
+            second.append(_expand(lo, counts))
+    if not first:
+        if stats is not None:
+            stats.add(n, 0, 0)
+        return empty, empty
+    first = order[np.concatenate(first)]
+    second = order[np.concatenate(second)]
+    tested = len(first)
+    near = _overlapping(position, radius, first, second)
+    first, second = first[near], second[near]
+    if ordered:
+        first, second = _sorted_pairs(first, second, n)
+    if stats is not None:
+        stats.add(n, tested, len(first))
+    return first, second
+
+
+def all_pairs(position: np.ndarray, radius: np.ndarray, block: int = 512,
+              stats: PairStats = None, ordered: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """所有外接盒相交的球对 (i, j)，i < j；按行分块广播，内存不随球数平方增长，耗时仍是 O(n²)
+
+    结果本来就按 (i, j) 排序，ordered 只为与 grid_pairs 参数一致。
+    """
+    position = np.asarray(position, dtype=float)
+    radius = np.asarray(radius, dtype=float)
+    n = len(position)
+    first, second = [], []
+    for start in range(0, n, block):
+        rows = np.arange(start, min(start + block, n))
+        reach = radius[rows, None] + radius[None, :]
+        near = (np.abs(position[rows, None, :] - position[None, :, :]) < reach[:, :, None]).all(axis=2)
+        near &= rows[:, None] < np.arange(n)[None, :]
+        i, j = np.nonzero(near)
+        first.append(rows[i])
+        second.append(j)
+    if n < 2:
+        first, second = np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    else:
+        first, second = np.concatenate(first), np.concatenate(second)
+    if stats is not None:
+        stats.add(n, n * (n - 1) // 2, len(first))
+    return first, second
+
+
+BROAD_PHASES = {"grid": grid_pairs, "all": all_pairs}
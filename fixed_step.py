@@ -0,0 +1,66 @@
+"""固定步长调度
+
+模拟按固定频率推进，与渲染帧率无关：每渲染一帧，按实际经过的时间累积出应推进的步数。
+渲染跟不上时一帧内补走多步（跳过渲染帧），落后太多时丢弃积压，避免越补越慢。
+剩余不足一步的时间比例 alpha 可用于在两步之间插值绘制。
+"""
+import time
+from typing import Callable
+
+
+class FixedStepClock:
+    """固定步长的时间累加器，同时统计每秒的模拟步数和渲染帧数"""
+
+    def __init__(self, rate: float, max_steps: int = 8, timer: Callable[[], float] = time.perf_counter):
+        self.rate = rate  # 每秒模拟步数
+        self.dt = 1 / rate
+        self.max_steps = max_steps  # 每帧最多补走的步数，超出的积压直接丢弃
+        self.timer = timer
+        self.accumulator = 0.0
+        self.dropped_steps = 0  # 累计丢弃的步数
+        self.sim_rate = 0.0
+        self.render_rate = 0.0
+        self._last = None
+        self._window_start = None
+        self._window_steps = 0
+        self._window_frames = 0
+
+    @property
+    def alpha(self) -> float:
+        """距离下一步还差的比例，0 表示正好在一步上"""
+        return min(self.accumulator / self.dt, 1.0)
+
+    def reset(self):
+        """丢弃累积的时间，例如暂停恢复之后"""
+        self.accumulator = 0.0
+        self._last = None
+
+    def advance(self) -> int:
+        """每渲染一帧调用一次，返回这一帧应推进的模拟步数"""
+        now = self.timer()
+        if self._last is None:
+            self._last = now
+        if self._window_start is None:
+            self._window_start = now
+        self.accumulator += now - self._last
+        self._last = now
+
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            self.dropped_steps += steps - self.max_steps
+            steps = self.max_steps
+            self.accumulator %= self.dt
+        else:
+            self.accumulator -= steps * self.dt
+
+        # 每秒更新一次两个频率
+        self._window_steps += steps
+        self._window_frames += 1
+        elapsed = now - self._window_start
+        if elapsed >= 1:
+            self.sim_rate = self._window_steps / elapsed
+            self.render_rate = self._window_frames / elapsed
+            self._window_start = now
+            self._window_steps = 0
+            self._window_frames = 0
+        return steps
@@ -1,3 +1,4 @@
 #!/bin/bash
 
-pyinstaller -y --clean --windowed --icon simple_wave_reflection.png --add-data "simple_wave_reflection.png:." --name Waves simple_wave_reflection.py
\ No newline at end of file
+# wave_kernels.py 的源码也要打包：numba 按源文件定位磁盘上的编译缓存（缓存目录见 wave_kernels.py）
+pyinstaller -y --clean --windowed --icon simple_wave_reflection.png --add-data "simple_wave_reflection.png:." --add-data "wave_kernels.py:." --name Waves simple_wave_reflection.py
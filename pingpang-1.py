@@ -1,59 +1,42 @@
 import pygame
 import sys
 import random
-import colorsys
+
+from ball_physics import ArrayBallWorld, PhysicsConfig
+from fixed_step import FixedStepClock
+from trail_buffer import TrailBuffer, trail_capacity
+from trail_render import PolylineTrails, TrailAtlas, draw_trails
 
 class GameConfig:
     def __init__(self):
         self.WINDOW_MIN_SIZE = (800, 600)
-        self.FPS = 120
+        self.FPS = 120           # 渲染帧率上限，30、60、240 都可以，物理不受影响
+        self.PHYSICS_RATE = 120  # 每秒物理步数；速度、重力和衰减间隔都以物理步为单位
+        self.MAX_SUBSTEPS = 8    # 渲染跟不上时每帧最多补走的物理步数，超出的积压丢弃
         self.DAMPING_FACTOR = 0.98
-        self.GRAVITY = 9.8 / self.FPS
+        self.GRAVITY = 9.8 / self.PHYSICS_RATE
         self.BALL_RADIUS = 10
         self.PADDLE_HEIGHT = 20
         self.PADDLE_COLOR = (0, 100, 0)
-        self.PADDLE_SPEED = 10
+        self.PADDLE_SPEED = 10  # 每个物理步移动的像素
         self.SPRING_WIDTH = 50
         self.SPRING_HEIGHT = 20
         self.SPRING_COLOR = (192, 192, 192)
         self.BACKGROUND_COLOR = (50, 50, 50)
-        self.MAX_BALLS = 5
+        # 球数上限：1200 个球时物理一步加绘制一帧 6 到 7.5 毫秒，仍在 120 FPS 的预算（8.3 毫秒）内；
+        # 默认窗口的场地大约只放得下 1300 个球，再多就挤成一团，碰撞一步要几十毫秒
+        self.MAX_BALLS = 1200
+        self.BALL_BATCH = 100  # 按住 Shift 时 + / - 一次增减的球数
+        self.MAX_TRAILS = 5    # 只有前几个球画轨迹
         self.TRAIL_TIME = 2500
+        self.TRAIL_STEPS = 64  # 圆点轨迹颜色/透明度的级数
+        # 轨迹画法："stamps" 每个采样一个圆点，最细致；"polyline" 抽稀成 TRAIL_SEGMENTS 段粗线，绘制快得多
+        self.TRAIL_MODE = "stamps"
+        self.TRAIL_SEGMENTS = 16
+        self.TRAIL_BANDS = 8  # 折线轨迹的颜色级数，同一级的相邻线段一次画出
+        self.TRAIL_ROUND_JOINTS = False  # 折线的折点补圆，每段多一次绘制调用
         self.BUTTON_RADIUS = 20
 
-class Ball:
-    def __init__(self, x, y, radius):
-        self.x = x
-        self.y = y
-        self.radius = radius
-        self.speed = [random.uniform(1, 3), random.uniform(1, 3)]
-        self.color = self.get_random_color()
-        self.trail = []
-        self.counter = 0
-        # 新增缓存surface以提高性能
-        self.trail_surface = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
-
-    @staticmethod
-    def get_random_color():
-        while True:
-            r, g, b = random.randint(0,255), random.randint(0,255), random.randint(0,255)
-            if not (r == g == b):
-                return (r, g, b)
-
-    def update(self, gravity, damping_factor):
-        self.x += self.speed[0]
-        self.y += self.speed[1]
-        self.speed[1] += gravity
-        self.counter += 1
-        if self.counter >= 60:
-            self.speed[1] *= damping_factor
-            self.counter = 0
-
-    def get_trail_surface(self, color):
-        # 缓存trail surface而不是每次重新创建
-        pygame.draw.circle(self.trail_surface, color, (self.radius, self.radius), self.radius)
-        return self.trail_surface
-
 class Button:
     def __init__(self, center, radius, color, text):
         self.center = center
@@ -98,12 +81,29 @@ class PingPongGame:
         self.spring_x = (self.window_size[0] - self.config.SPRING_WIDTH) // 2
         self.spring_y = self.paddle_y
 
-        ball_init_x = self.paddle_width / 4
-        ball_init_y = self.paddle_y - 200
-        self.balls = [Ball(ball_init_x, ball_init_y, self.config.BALL_RADIUS)]
+        # 物理由 ball_physics 的 ArrayBallWorld 整批计算，这里只保存轨迹和每个球的贴图
+        self.world = ArrayBallWorld(self.window_size[0], self.window_size[1],
+                                    PhysicsConfig(gravity=self.config.GRAVITY,
+                                                  damping_factor=self.config.DAMPING_FACTOR))
+        self.trails = []
+        self.ball_sprites = []
+        # 物理按固定步长推进，与渲染帧率无关；sim_time 为模拟经过的毫秒数，轨迹的时间戳也用它
+        self.physics_clock = FixedStepClock(self.config.PHYSICS_RATE, self.config.MAX_SUBSTEPS)
+        self.sim_time = 0.0
+        self.prev_position = None  # 最后一步之前的位置，绘制时在两步之间插值
+        self.update_world_geometry()
+        self.trail_atlas = TrailAtlas(self.config.TRAIL_STEPS)
+        self.polyline_trails = PolylineTrails(self.config.TRAIL_SEGMENTS, self.config.TRAIL_BANDS,
+                                              round_joints=self.config.TRAIL_ROUND_JOINTS)
+        self.add_ball()
 
         self.setup_buttons()
 
+    def update_world_geometry(self):
+        self.world.resize(*self.window_size)
+        self.world.set_paddle(self.paddle_x, self.paddle_y, self.paddle_width, self.config.PADDLE_HEIGHT)
+        self.world.set_spring(self.spring_x, self.spring_y, self.config.SPRING_WIDTH, self.config.SPRING_HEIGHT)
+
     def setup_buttons(self):
         increase_center = (self.window_size[0]//2 + self.config.BUTTON_RADIUS + 10, 
                          10 + self.config.BUTTON_RADIUS)
@@ -148,26 +148,33 @@ class PingPongGame:
         self.paddle_y = self.window_size[1] - self.config.PADDLE_HEIGHT - 10
         self.spring_x = (self.window_size[0] - self.config.SPRING_WIDTH) // 2
         self.spring_y = self.paddle_y
+        self.update_world_geometry()
         self.setup_buttons()
 
     def handle_mouse_click(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
             mouse_pos = pygame.mouse.get_pos()
-            if self.increase_button.is_clicked(mouse_pos) and len(self.balls) < self.config.MAX_BALLS:
-                self.add_ball()
-            elif self.decrease_button.is_clicked(mouse_pos) and len(self.balls) > 1:
-                self.remove_ball()
+            count = self.config.BALL_BATCH if pygame.key.get_mods() & pygame.KMOD_SHIFT else 1
+            if self.increase_button.is_clicked(mouse_pos):
+                self.add_balls(count)
+            elif self.decrease_button.is_clicked(mouse_pos):
+                self.remove_balls(count)
 
     def handle_keyboard(self, event):
         if event.type == pygame.KEYDOWN and event.mod & self.keys["CTRL"]:
-            if event.key in self.keys["MINUS"] and len(self.balls) > 1:
-                self.remove_ball()
-            elif event.key in self.keys["PLUS"] and len(self.balls) < self.config.MAX_BALLS:
-                self.add_ball()
+            count = self.config.BALL_BATCH if event.mod & pygame.KMOD_SHIFT else 1
+            if event.key in self.keys["MINUS"]:
+                self.remove_balls(count)
+            elif event.key in self.keys["PLUS"]:
+                self.add_balls(count)
 
     def update(self):
-        self.handle_paddle_movement()
-        self.update_balls()
+        bounced = False
+        for _ in range(self.physics_clock.advance()):
+            self.handle_paddle_movement()
+            bounced |= self.update_balls()
+        if bounced:
+            self.bounce_sound.play()
         self.update_buttons()
 
     def handle_paddle_movement(self):
@@ -176,113 +183,23 @@ class PingPongGame:
             self.paddle_x -= self.config.PADDLE_SPEED
         if keys[self.keys["RIGHT"]] and self.paddle_x < self.window_size[0] - self.paddle_width:
             self.paddle_x += self.config.PADDLE_SPEED
+        self.world.set_paddle(self.paddle_x, self.paddle_y, self.paddle_width, self.config.PADDLE_HEIGHT)
 
     def update_balls(self):
-        current_time = pygame.time.get_ticks()
-        for ball in self.balls:
-            ball.update(self.config.GRAVITY, self.config.DAMPING_FACTOR)
-            self.handle_collisions(ball)
-            self.update_trail(ball, current_time)
-
-    def handle_collisions(self, ball):
-        # 使用矩形碰撞检测来优化性能
-        ball_rect = pygame.Rect(ball.x - ball.radius, 
-                              ball.y - ball.radius,
-                              ball.radius * 2, 
-                              ball.radius * 2)
-        
-        paddle_rect = pygame.Rect(self.paddle_x, 
-                                self.paddle_y,
-                                self.paddle_width, 
-                                self.config.PADDLE_HEIGHT)
-        
-        spring_rect = pygame.Rect(self.spring_x,
-                                self.spring_y,
-                                self.config.SPRING_WIDTH,
-                                self.config.SPRING_HEIGHT)
-        
-        # 墙体碰撞
-        if ball.x - ball.radius < 0 or ball.x + ball.radius > self.window_size[0]:
-            ball.speed[0] = -ball.speed[0]
-            self.bounce_sound.play()
-        if ball.y - ball.radius < 0:
-            ball.speed[1] = -ball.speed[1]
-            self.bounce_sound.play()
-            
-        # 球拍碰撞
-        if ball_rect.colliderect(paddle_rect) and ball.speed[1] > 0:
-            # 根据击球位置计算反弹角度
-            # hit_pos = (ball.x - self.paddle_x) / self.paddle_width
-            # ball.speed[0] = (hit_pos - 0.25) * 10  # 根据击球位置调整水平速度
-            ball.speed[1] = -ball.speed[1]
-            self.bounce_sound.play()
-            
-        # 弹簧碰撞
-        if ball_rect.colliderect(spring_rect):
-            self.handle_spring_collision(ball)
-
-        # 添加球与球之间的碰撞检测
-        for other_ball in self.balls:
-            if ball is other_ball:
-                continue
-            
-            # 计算两球之间的距离
-            dx = ball.x - other_ball.x
-            dy = ball.y - other_ball.y
-            distance = (dx * dx + dy * dy) ** 0.5
-            
-            # 如果两球相撞
-            if distance < ball.radius + other_ball.radius:
-                # 计算碰撞后的速度
-                # 于动量守恒和能量守恒的弹性碰撞
-                
-                # 计算法向量（两球中心连线方向）
-                nx = dx / distance
-                ny = dy / distance
-                
-                # 计算相对速度
-                dvx = ball.speed[0] - other_ball.speed[0]
-                dvy = ball.speed[1] - other_ball.speed[1]
-                
-                # 计算法向相对速度
-                normal_vel = dvx * nx + dvy * ny
-                
-                # 如果球正在远离，不需要处理碰撞
-                if normal_vel > 0:
-                    continue
-                    
-                # 计算冲量
-                impulse = -(1 + 0.0) * normal_vel  # 0.8 是弹性系数
-                
-                # 更新速度
-                ball.speed[0] += impulse * nx
-                ball.speed[1] += impulse * ny
-                other_ball.speed[0] -= impulse * nx
-                other_ball.speed[1] -= impulse * ny
-                
-                # 阻止球重叠
-                overlap = (ball.radius + other_ball.radius - distance) / 2
-                ball.x += overlap * nx
-                ball.y += overlap * ny
-                other_ball.x -= overlap * nx
-                other_ball.y -= overlap * ny
-                
-                self.bounce_sound.play()
-
-    def handle_spring_collision(self, ball):
-        spring_speed = 5
-        if (self.spring_x <= ball.x <= self.spring_x + self.config.SPRING_WIDTH and 
-            ball.y + ball.radius >= self.spring_y and 
-            ball.y + ball.radius <= self.spring_y + self.config.SPRING_HEIGHT):
-            if ball.trail and ball.trail[-1][1] <= self.spring_y:
-                ball.speed[1] = -spring_speed
-            else:
-                ball.speed[1] = -max(abs(ball.speed[1]) * 1.2, spring_speed)
-            self.bounce_sound.play()
+        """推进一个物理步，返回是否发生了碰撞"""
+        self.prev_position = self.world.position.copy()
+        bounces = self.world.step()
+        self.sim_time += 1000 / self.config.PHYSICS_RATE
+        for (x, y), trail in zip(self.world.position[:len(self.trails)].tolist(), self.trails):
+            self.update_trail(x, y, trail, self.sim_time)
+        return bounces > 0
+
+    def update_trail(self, x, y, trail, current_time):
+        trail.append(x, y, current_time)
+        trail.evict(current_time - self.config.TRAIL_TIME)
 
-    def update_trail(self, ball, current_time):
-        ball.trail.append((ball.x, ball.y, current_time))
-        ball.trail = [pt for pt in ball.trail if current_time - pt[2] <= self.config.TRAIL_TIME]
+    def new_trail(self):
+        return TrailBuffer(trail_capacity(self.config.TRAIL_TIME / 1000, self.config.PHYSICS_RATE))
 
     def update_buttons(self):
         mouse_pressed = pygame.mouse.get_pressed()[0]
@@ -293,6 +210,7 @@ class PingPongGame:
     def draw(self):
         self.screen.fill(self.config.BACKGROUND_COLOR)
         self.draw_buttons()
+        self.draw_ball_count()
         self.draw_trails()
         self.draw_balls()
         self.draw_paddle_and_spring()
@@ -305,23 +223,38 @@ class PingPongGame:
             text_rect = text.get_rect(center=button.center)
             self.screen.blit(text, text_rect)
 
+    def draw_ball_count(self):
+        clock = self.physics_clock
+        text = self.font.render(f"Balls: {len(self.world)}  FPS: {clock.render_rate:.0f}  "
+                                f"Physics: {clock.sim_rate:.0f}/{self.config.PHYSICS_RATE} Hz", True, (255, 255, 255))
+        self.screen.blit(text, (10, 10))
+
     def draw_trails(self):
-        current_time = pygame.time.get_ticks()
-        for ball in self.balls:
-            if not ball.trail:
-                continue
-            for tx, ty, t in ball.trail:
-                age = current_time - t
-                progress = min(1, age / self.config.TRAIL_TIME)
-                alpha = int(255 * (1 - progress))
-                rgb = colorsys.hsv_to_rgb(progress, 1, 1)
-                rainbow_color = (*[int(c*255) for c in rgb], alpha)
-                trail_surface = ball.get_trail_surface(rainbow_color)
-                self.screen.blit(trail_surface, (int(tx)-ball.radius, int(ty)-ball.radius))
+        now = self.sim_time
+        if self.config.TRAIL_MODE == "polyline":
+            self.polyline_trails.draw(self.screen, self.trails, self.config.BALL_RADIUS, now, self.config.TRAIL_TIME)
+        else:
+            draw_trails(self.screen, self.trail_atlas, self.trails, self.config.BALL_RADIUS,
+                        now, self.config.TRAIL_TIME)
 
     def draw_balls(self):
-        for ball in self.balls:
-            pygame.draw.circle(self.screen, ball.color, (int(ball.x), int(ball.y)), ball.radius)
+        # 每个球的贴图在添加时画好，所有球一次 blits
+        radius = self.config.BALL_RADIUS
+        position = self.world.position
+        if self.prev_position is not None and len(self.prev_position) == len(position):
+            # 渲染帧率高于物理步频时，按剩余时间比例在上一步和这一步之间插值
+            position = self.prev_position + (position - self.prev_position) * self.physics_clock.alpha
+        corners = (position - radius).astype(int).tolist()
+        self.screen.blits(zip(self.ball_sprites, corners), doreturn=False)
+
+    def make_ball_sprite(self, color):
+        radius = self.config.BALL_RADIUS
+        # 用透明色而不是逐像素 alpha，RLE 加速后上万个球的 blits 也很快
+        sprite = pygame.Surface((radius*2, radius*2)).convert()
+        sprite.fill((0, 0, 0))
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        sprite.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+        return sprite
 
     def draw_paddle_and_spring(self):
         pygame.draw.rect(self.screen, self.config.PADDLE_COLOR, 
@@ -332,10 +265,35 @@ class PingPongGame:
     def add_ball(self):
         ball_init_x = self.paddle_width / 4
         ball_init_y = self.paddle_y - 200
-        self.balls.append(Ball(ball_init_x, ball_init_y, self.config.BALL_RADIUS))
+        index = self.world.add_ball(ball_init_x, ball_init_y, self.config.BALL_RADIUS)
+        self.ball_sprites.append(self.make_ball_sprite(self.world.color[index].tolist()))
+        if len(self.trails) < self.config.MAX_TRAILS:
+            self.trails.append(self.new_trail())
+
+    def add_balls(self, count):
+        """添加 count 个球，不超过 MAX_BALLS；一次添加多个时散布在木板上方，避免全部重叠在同一点"""
+        count = min(count, self.config.MAX_BALLS - len(self.world))
+        if count == 1:
+            self.add_ball()
+        elif count > 1:
+            radius = self.config.BALL_RADIUS
+            positions = [(random.uniform(radius, self.window_size[0] - radius),
+                          random.uniform(radius, self.paddle_y - radius)) for _ in range(count)]
+            start = self.world.add_balls(positions, radius)
+            self.ball_sprites.extend(self.make_ball_sprite(color) for color in self.world.color[start:].tolist())
+            while len(self.trails) < min(len(self.world), self.config.MAX_TRAILS):
+                self.trails.append(self.new_trail())
 
     def remove_ball(self):
-        self.balls.pop()
+        self.world.remove_ball()
+        self.ball_sprites.pop()
+        if len(self.trails) > len(self.world):
+            self.trails.pop()
+
+    def remove_balls(self, count):
+        """删除最后 count 个球，至少保留一个"""
+        for _ in range(min(count, len(self.world) - 1)):
+            self.remove_ball()
 
     def run(self):
         running = True
@@ -1,14 +1,16 @@
 import arcade
-import random
 import time
 import colorsys
 
+from ball_physics import BallWorld, PhysicsConfig
+from trail_buffer import TrailBuffer, trail_capacity
+
 class GameConfig:
     def __init__(self):
         self.WINDOW_MIN_SIZE = (800, 600)
         self.FPS = 110
         self.DAMPING_FACTOR = 0.98
-        self.GRAVITY = -9.8 / self.FPS
+        self.GRAVITY = 9.8 / self.FPS  # 物理核心的 y 轴向下，重力为正
         self.BALL_RADIUS = 10
         self.PADDLE_HEIGHT = 20
         self.PADDLE_COLOR = arcade.color.DARK_GREEN
@@ -21,34 +23,6 @@ class GameConfig:
         self.TRAIL_TIME = 2.5  # in seconds
         self.BUTTON_RADIUS = 20
 
-class Ball:
-    def __init__(self, x, y, radius, config: GameConfig):
-        self.x = x
-        self.y = y
-        self.radius = radius
-        self.speed = [random.uniform(1, 3), random.uniform(1, 3)]
-        self.color = self.get_random_color()
-        self.trail = []  # list of (x, y, timestamp)
-        self.game_config = config
-
-    @staticmethod
-    def get_random_color():
-        while True:
-            r, g, b = random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)
-            if not (r == g == b):
-                return (r, g, b)
-
-    def update(self, delta_time):
-        self.x += self.speed[0]
-        self.y += self.speed[1]
-        self.speed[1] += self.game_config.GRAVITY
-        self.speed[1] *= self.game_config.DAMPING_FACTOR
-
-    def update_trail(self):
-        current_time = time.time()
-        self.trail.append((self.x, self.y, current_time))
-        self.trail = [pt for pt in self.trail if current_time - pt[2] <= self.game_config.TRAIL_TIME]
-
 class Button:
     def __init__(self, center, radius, color, text):
         self.center = center
@@ -74,14 +48,24 @@ class PingPongGame(arcade.Window):
         width, height = self.game_config.WINDOW_MIN_SIZE
         super().__init__(width, height, "Ping Pong Bounce")
         arcade.set_background_color(self.game_config.BACKGROUND_COLOR)
+        # 木板和弹簧用物理核心的坐标（y 轴向下，y 为上沿），绘制时翻转到 arcade 坐标
         self.paddle_width = self.width
         self.paddle_x = 0
-        self.paddle_y = 20
+        self.paddle_y = self.height - self.game_config.PADDLE_HEIGHT - 20
         self.spring_x = (self.width - self.game_config.SPRING_WIDTH) // 2
         self.spring_y = self.paddle_y
-        ball_init_x = self.width / 4
-        ball_init_y = self.paddle_y + 200
-        self.balls = [Ball(ball_init_x, ball_init_y, self.game_config.BALL_RADIUS, self.game_config)]
+        # 沿用本文件原来的规则：上下左右四面都是墙，每帧都衰减
+        self.world = BallWorld(self.width, self.height,
+                               PhysicsConfig(gravity=self.game_config.GRAVITY,
+                                             damping_factor=self.game_config.DAMPING_FACTOR,
+                                             damping_interval=1, bottom_wall=True, sticky_walls=True,
+                                             paddle_band=True, spring_rule="boost"))
+        self.world.set_paddle(self.paddle_x, self.paddle_y, self.paddle_width, self.game_config.PADDLE_HEIGHT)
+        self.world.set_spring(self.spring_x, self.spring_y,
+                              self.game_config.SPRING_WIDTH, self.game_config.SPRING_HEIGHT)
+        self.balls = self.world.balls
+        self.trails = []  # trails[i] 为第 i 个球的轨迹（TrailBuffer，物理坐标，时间单位为秒）
+        self.add_ball()
         self.setup_buttons()
         self.left_pressed = False
         self.right_pressed = False
@@ -107,27 +91,27 @@ class PingPongGame(arcade.Window):
             )
         # Draw ball trails
         current_time = time.time()
-        for ball in self.balls:
-            for (tx, ty, t) in ball.trail:
+        for ball, trail in zip(self.balls, self.trails):
+            for (tx, ty, t) in trail:
                 progress = min(1, (current_time - t) / self.game_config.TRAIL_TIME)
                 alpha = int(255 * (1 - progress))
                 rgb = colorsys.hsv_to_rgb(progress, 1, 1)
                 trail_color = (int(rgb[0]*255), int(rgb[1]*255), int(rgb[2]*255), alpha)
-                arcade.draw_circle_filled(tx, ty, ball.radius, trail_color)
+                arcade.draw_circle_filled(tx, self.height - ty, ball.radius, trail_color)
         # Draw balls
         for ball in self.balls:
-            arcade.draw_circle_filled(ball.x, ball.y, ball.radius, ball.color)
-        # Draw paddle and spring
+            arcade.draw_circle_filled(ball.x, self.height - ball.y, ball.radius, ball.color)
+        # Draw paddle and spring (left, bottom, width, height in arcade coordinates)
         arcade.draw_lbwh_rectangle_filled(
-            self.paddle_x, # + self.paddle_width / 2, 
-            self.paddle_y + self.game_config.PADDLE_HEIGHT / 2,
+            self.paddle_x,
+            self.height - self.paddle_y - self.game_config.PADDLE_HEIGHT,
             self.paddle_width, 
             self.game_config.PADDLE_HEIGHT, 
             self.game_config.PADDLE_COLOR
         )
         arcade.draw_lbwh_rectangle_filled(
-            self.spring_x + self.game_config.SPRING_WIDTH / 2, 
-            self.spring_y + self.game_config.SPRING_HEIGHT / 2,
+            self.spring_x,
+            self.height - self.spring_y - self.game_config.SPRING_HEIGHT,
             self.game_config.SPRING_WIDTH, 
             self.game_config.SPRING_HEIGHT, 
             self.game_config.SPRING_COLOR
@@ -138,52 +122,12 @@ class PingPongGame(arcade.Window):
             self.paddle_x -= self.game_config.PADDLE_SPEED
         if self.right_pressed and self.paddle_x < self.width - self.paddle_width:
             self.paddle_x += self.game_config.PADDLE_SPEED
-        for ball in self.balls:
-            ball.update(delta_time)
-            ball.update_trail()
-            self.handle_collisions(ball)
-
-    def handle_collisions(self, ball):
-        # Wall collisions
-        if ball.x - ball.radius < 0 or ball.x + ball.radius > self.width:
-            ball.speed[0] *= -1
-        if ball.y - ball.radius < 0 or ball.y + ball.radius > self.height:
-            ball.speed[1] *= -1
-        # Paddle collision
-        paddle_bottom = self.paddle_y
-        paddle_top = self.paddle_y + self.game_config.PADDLE_HEIGHT
-        if (paddle_bottom <= ball.y - ball.radius <= paddle_top) and (self.paddle_x <= ball.x <= self.paddle_x + self.paddle_width) and ball.speed[1] < 0:
-            ball.speed[1] *= -1
-        # Spring collision
-        spring_left = self.spring_x
-        spring_right = self.spring_x + self.game_config.SPRING_WIDTH
-        if (spring_left <= ball.x <= spring_right) and (ball.y - ball.radius <= self.spring_y + self.game_config.SPRING_HEIGHT):
-            ball.speed[1] = -abs(ball.speed[1]) * 1.2
-        # Ball-ball collisions (simplified)
-        for other in self.balls:
-            if other is ball:
-                continue
-            dx = ball.x - other.x
-            dy = ball.y - other.y
-            distance = (dx**2 + dy**2) ** 0.5
-            if distance < ball.radius + other.radius:
-                nx = dx / distance
-                ny = dy / distance
-                dvx = ball.speed[0] - other.speed[0]
-                dvy = ball.speed[1] - other.speed[1]
-                normal_vel = dvx * nx + dvy * ny
-                if normal_vel > 0:
-                    continue
-                impulse = -normal_vel
-                ball.speed[0] += impulse * nx
-                ball.speed[1] += impulse * ny
-                other.speed[0] -= impulse * nx
-                other.speed[1] -= impulse * ny
-                overlap = (ball.radius + other.radius - distance) / 2
-                ball.x += overlap * nx
-                ball.y += overlap * ny
-                other.x -= overlap * nx
-                other.y -= overlap * ny
+        self.world.set_paddle(self.paddle_x, self.paddle_y, self.paddle_width, self.game_config.PADDLE_HEIGHT)
+        self.world.step()
+        current_time = time.time()
+        for ball, trail in zip(self.balls, self.trails):
+            trail.append(ball.x, ball.y, current_time)
+            trail.evict(current_time - self.game_config.TRAIL_TIME)
 
     def on_key_press(self, key, modifiers):
         if key == arcade.key.LEFT:
@@ -213,12 +157,14 @@ class PingPongGame(arcade.Window):
 
     def add_ball(self):
         ball_init_x = self.width / 4
-        ball_init_y = self.paddle_y + 200
-        self.balls.append(Ball(ball_init_x, ball_init_y, self.game_config.BALL_RADIUS, self.game_config))
+        ball_init_y = self.paddle_y - 200
+        self.world.add_ball(ball_init_x, ball_init_y, self.game_config.BALL_RADIUS)
+        self.trails.append(TrailBuffer(trail_capacity(self.game_config.TRAIL_TIME, self.game_config.FPS)))
 
     def remove_ball(self):
         if self.balls:
-            self.balls.pop()
+            self.world.remove_ball()
+            self.trails.pop()
 
 def main():
     game = PingPongGame()
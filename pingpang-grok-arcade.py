@@ -1,9 +1,11 @@
 # pingpang-grok-arcade.py
 import arcade
-import random
 import colorsys
 import time  # added import for time module
 
+from ball_physics import BallWorld, PhysicsConfig
+from trail_buffer import TrailBuffer, trail_capacity
+
 class GameConfig:
     def __init__(self):
         self.WINDOW_MIN_SIZE = (800, 600)
@@ -22,32 +24,6 @@ class GameConfig:
         self.TRAIL_TIME = 2500
         self.BUTTON_RADIUS = 20
 
-class Ball:
-    def __init__(self, x, y, radius):
-        self.x = x
-        self.y = y
-        self.radius = radius
-        self.speed = [random.uniform(1, 3), random.uniform(1, 3)]
-        self.color = self.get_random_color()
-        self.trail = []
-        self.counter = 0
-
-    @staticmethod
-    def get_random_color():
-        while True:
-            r, g, b = random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)
-            if not (r == g == b):
-                return (r, g, b)
-
-    def update(self, gravity, damping_factor):
-        self.x += self.speed[0]
-        self.y += self.speed[1]
-        self.speed[1] += gravity
-        self.counter += 1
-        if self.counter >= 60:
-            self.speed[1] *= damping_factor
-            self.counter = 0
-
 class Button:
     def __init__(self, center, radius, color, text):
         self.center = center
@@ -88,12 +64,23 @@ class PingPongGame(arcade.Window):
         self.spring_x = (self.window_size[0] - self.game_config.SPRING_WIDTH) // 2
         self.spring_y = self.paddle_y
 
-        ball_init_x = self.paddle_width / 4
-        ball_init_y = self.paddle_y - 200
-        self.balls = [Ball(ball_init_x, ball_init_y, self.game_config.BALL_RADIUS)]
+        # 物理坐标 y 轴向下（与 pygame 版本相同），绘制时翻转到 arcade 坐标
+        self.world = BallWorld(self.window_size[0], self.window_size[1],
+                               PhysicsConfig(gravity=self.game_config.GRAVITY,
+                                             damping_factor=self.game_config.DAMPING_FACTOR))
+        self.balls = self.world.balls
+        self.trails = []
+        self.update_world_geometry()
+        self.add_ball()
 
         self.setup_buttons()
 
+    def update_world_geometry(self):
+        self.world.resize(*self.window_size)
+        self.world.set_paddle(self.paddle_x, self.paddle_y, self.paddle_width, self.game_config.PADDLE_HEIGHT)
+        self.world.set_spring(self.spring_x, self.spring_y,
+                              self.game_config.SPRING_WIDTH, self.game_config.SPRING_HEIGHT)
+
     def setup_buttons(self):
         increase_center = (self.window_size[0] // 2 + self.game_config.BUTTON_RADIUS + 10,
                            10 + self.game_config.BUTTON_RADIUS)
@@ -121,6 +108,7 @@ class PingPongGame(arcade.Window):
         self.paddle_y = self.window_size[1] - self.game_config.PADDLE_HEIGHT - 10
         self.spring_x = (self.window_size[0] - self.game_config.SPRING_WIDTH) // 2
         self.spring_y = self.paddle_y
+        self.update_world_geometry()
         self.setup_buttons()
 
     def on_mouse_press(self, x, y, button, modifiers):
@@ -171,78 +159,18 @@ class PingPongGame(arcade.Window):
             self.paddle_x -= self.game_config.PADDLE_SPEED
         if self.right_pressed and self.paddle_x < self.window_size[0] - self.paddle_width:
             self.paddle_x += self.game_config.PADDLE_SPEED
+        self.world.set_paddle(self.paddle_x, self.paddle_y, self.paddle_width, self.game_config.PADDLE_HEIGHT)
 
     def update_balls(self):
         current_time = time.time() * 1000  # Arcade 时间单位为秒，转换为毫秒
-        for ball in self.balls:
-            ball.update(self.game_config.GRAVITY, self.game_config.DAMPING_FACTOR)
-            self.handle_collisions(ball)
-            self.update_trail(ball, current_time)
-
-    def handle_collisions(self, ball):
-        # 墙体碰撞
-        if ball.x - ball.radius < 0 or ball.x + ball.radius > self.window_size[0]:
-            ball.speed[0] = -ball.speed[0]
-            self.bounce_sound.play()
-        if ball.y - ball.radius < 0:
-            ball.speed[1] = -ball.speed[1]
-            self.bounce_sound.play()
-
-        # 球拍碰撞
-        paddle_rect = (self.paddle_x, self.paddle_y, self.paddle_width, self.game_config.PADDLE_HEIGHT)
-        if (ball.x + ball.radius > paddle_rect[0] and ball.x - ball.radius < paddle_rect[0] + paddle_rect[2] and
-            ball.y + ball.radius > paddle_rect[1] and ball.y - ball.radius < paddle_rect[1] + paddle_rect[3] and
-            ball.speed[1] > 0):
-            ball.speed[1] = -ball.speed[1]
+        if self.world.step():
             self.bounce_sound.play()
+        for ball, trail in zip(self.balls, self.trails):
+            self.update_trail(ball, trail, current_time)
 
-        # 弹簧碰撞
-        spring_rect = (self.spring_x, self.spring_y, self.game_config.SPRING_WIDTH, self.game_config.SPRING_HEIGHT)
-        if (ball.x + ball.radius > spring_rect[0] and ball.x - ball.radius < spring_rect[0] + spring_rect[2] and
-            ball.y + ball.radius > spring_rect[1] and ball.y - ball.radius < spring_rect[1] + spring_rect[3]):
-            self.handle_spring_collision(ball)
-
-        # 球与球碰撞
-        for other_ball in self.balls:
-            if ball is other_ball:
-                continue
-            dx = ball.x - other_ball.x
-            dy = ball.y - other_ball.y
-            distance = (dx * dx + dy * dy) ** 0.5
-            if distance < ball.radius + other_ball.radius:
-                nx = dx / distance
-                ny = dy / distance
-                dvx = ball.speed[0] - other_ball.speed[0]
-                dvy = ball.speed[1] - other_ball.speed[1]
-                normal_vel = dvx * nx + dvy * ny
-                if normal_vel > 0:
-                    continue
-                impulse = -(1 + 0.0) * normal_vel
-                ball.speed[0] += impulse * nx
-                ball.speed[1] += impulse * ny
-                other_ball.speed[0] -= impulse * nx
-                other_ball.speed[1] -= impulse * ny
-                overlap = (ball.radius + other_ball.radius - distance) / 2
-                ball.x += overlap * nx
-                ball.y += overlap * ny
-                other_ball.x -= overlap * nx
-                other_ball.y -= overlap * ny
-                self.bounce_sound.play()
-
-    def handle_spring_collision(self, ball):
-        spring_speed = 5
-        if (self.spring_x <= ball.x <= self.spring_x + self.game_config.SPRING_WIDTH and
-            ball.y + ball.radius >= self.spring_y and
-            ball.y + ball.radius <= self.spring_y + self.game_config.SPRING_HEIGHT):
-            if ball.trail and ball.trail[-1][1] <= self.spring_y:
-                ball.speed[1] = -spring_speed
-            else:
-                ball.speed[1] = -max(abs(ball.speed[1]) * 1.2, spring_speed)
-            self.bounce_sound.play()
-
-    def update_trail(self, ball, current_time):
-        ball.trail.append((ball.x, ball.y, current_time))
-        ball.trail = [pt for pt in ball.trail if current_time - pt[2] <= self.game_config.TRAIL_TIME]
+    def update_trail(self, ball, trail, current_time):
+        trail.append(ball.x, ball.y, current_time)
+        trail.evict(current_time - self.game_config.TRAIL_TIME)
 
     def update_buttons(self):
         # Use stored mouse state instead of arcade.get_mouse_buttons() and arcade.get_mouse_position()
@@ -264,34 +192,35 @@ class PingPongGame(arcade.Window):
 
     def draw_trails(self):
         current_time = time.time() * 1000  # replaced arcade.get_time() with time.time()
-        for ball in self.balls:
-            if not ball.trail:
-                continue
-            for tx, ty, t in ball.trail:
+        for ball, trail in zip(self.balls, self.trails):
+            for tx, ty, t in trail:
                 age = current_time - t
                 progress = min(1, age / self.game_config.TRAIL_TIME)
                 alpha = int(255 * (1 - progress))
                 rgb = colorsys.hsv_to_rgb(progress, 1, 1)
                 rainbow_color = (*[int(c * 255) for c in rgb], alpha)
-                arcade.draw_circle_filled(tx, ty, ball.radius, rainbow_color)
+                arcade.draw_circle_filled(tx, self.height - ty, ball.radius, rainbow_color)
 
     def draw_balls(self):
         for ball in self.balls:
-            arcade.draw_circle_filled(ball.x, ball.y, ball.radius, ball.color)
+            arcade.draw_circle_filled(ball.x, self.height - ball.y, ball.radius, ball.color)
 
     def draw_paddle_and_spring(self):
-        arcade.draw_lbwh_rectangle_filled(self.paddle_x + self.paddle_width / 2, self.paddle_y + self.game_config.PADDLE_HEIGHT / 2,
+        # 物理坐标的上沿翻转为 arcade 坐标的下沿
+        arcade.draw_lbwh_rectangle_filled(self.paddle_x, self.height - self.paddle_y - self.game_config.PADDLE_HEIGHT,
                                      self.paddle_width, self.game_config.PADDLE_HEIGHT, self.game_config.PADDLE_COLOR)
-        arcade.draw_lbwh_rectangle_filled(self.spring_x + self.game_config.SPRING_WIDTH / 2, self.spring_y + self.game_config.SPRING_HEIGHT / 2,
+        arcade.draw_lbwh_rectangle_filled(self.spring_x, self.height - self.spring_y - self.game_config.SPRING_HEIGHT,
                                      self.game_config.SPRING_WIDTH, self.game_config.SPRING_HEIGHT, self.game_config.SPRING_COLOR)
 
     def add_ball(self):
         ball_init_x = self.paddle_width / 4
         ball_init_y = self.paddle_y - 200
-        self.balls.append(Ball(ball_init_x, ball_init_y, self.game_config.BALL_RADIUS))
+        self.world.add_ball(ball_init_x, ball_init_y, self.game_config.BALL_RADIUS)
+        self.trails.append(TrailBuffer(trail_capacity(self.game_config.TRAIL_TIME / 1000, self.game_config.FPS)))
 
     def remove_ball(self):
-        self.balls.pop()
+        self.world.remove_ball()
+        self.trails.pop()
 
 def main():
     game = PingPongGame()
@@ -1,7 +1,9 @@
 import pygame
 import sys
-import random
-import colorsys   # 新增：用于HSV转换
+
+from ball_physics import BallWorld, PhysicsConfig
+from trail_buffer import TrailBuffer, trail_capacity
+from trail_render import TrailAtlas, draw_trails
 
 # 初始化Pygame
 pygame.mixer.pre_init(frequency=44100, size=-16, channels=2, buffer=4096)
@@ -16,13 +18,6 @@ damping_factor = 0.98  # 阻尼系数，建议取值范围：(0, 1] 表示每次
 fps = 60  # 帧率
 gravity = 9.8 / fps  # 重力加速度，建议取值范围：[0, 1] 表示每次垂直运动的速度增加
 
-# 新增：返回随机非灰度颜色
-def get_random_color():
-    while True:
-        r, g, b = random.randint(0,255), random.randint(0,255), random.randint(0,255)
-        if not (r == g == b):
-            return (r, g, b)
-
 # 设置球的属性
 ball_radius = 10
 
@@ -50,20 +45,32 @@ clock = pygame.time.Clock()
 paddle_x = (window_size[0] - paddle_width) // 2
 paddle_y = window_size[1] - paddle_height - 10
 
-# 初始化球列表，初始1个球
+# 球的运动和碰撞由 ball_physics 负责，沿用本文件原来的规则：速度很小又贴近木板时停在木板上，
+# 先加重力再移动，弹簧的速度加到原速度上，球与球之间不碰撞
+world = BallWorld(window_size[0], window_size[1],
+                  PhysicsConfig(gravity=gravity, damping_factor=damping_factor, rest_speed=2,
+                                semi_implicit=True, spring_rule="additive", ball_collisions=False))
+world.set_paddle(paddle_x, paddle_y, paddle_width, paddle_height)
+world.set_spring(spring_x, spring_y, spring_width, spring_height)
+
+# 初始化球列表，初始1个球；trails[i] 为第 i 个球的轨迹
 ball_init_x = paddle_width / 4
 ball_init_y = paddle_y - 200
 maxballs = 5
-balls = [{
-    "x": ball_init_x,
-    "y": ball_init_y,
-    "speed": [random.uniform(1, 3), random.uniform(1, 3)],
-    "color": get_random_color(),
-    "trail": [],
-    "counter": 0
-}]
-
+balls = world.balls
+trails = []
 trail_time = 2500  # 轨迹保留时间
+trail_atlas = TrailAtlas()  # 轨迹圆点按颜色/透明度预先画好
+
+def add_ball():
+    world.add_ball(ball_init_x, ball_init_y, ball_radius)
+    trails.append(TrailBuffer(trail_capacity(trail_time / 1000, fps)))
+
+def remove_ball():
+    world.remove_ball()
+    trails.pop()
+
+add_ball()
 
 # 在主循环开始处（绘制前）新增：按钮配置
 button_radius = 20
@@ -91,6 +98,9 @@ while True:
             spring_y = window_size[1] - paddle_height - 10
             decrease_button_center = (window_size[0]//2 - button_radius - 10, 10 + button_radius)
             increase_button_center = (window_size[0]//2 + button_radius + 10, 10 + button_radius)
+            world.resize(*window_size)
+            world.set_paddle(paddle_x, paddle_y, paddle_width, paddle_height)
+            world.set_spring(spring_x, spring_y, spring_width, spring_height)
 
         # 新增：按钮点击检测
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -99,37 +109,23 @@ while True:
             dx_inc = mouse_pos[0] - increase_button_center[0]
             dy_inc = mouse_pos[1] - increase_button_center[1]
             if (dx_inc*dx_inc + dy_inc*dy_inc) <= button_radius*button_radius and len(balls) < maxballs:
-                balls.append({
-                    "x": ball_init_x,
-                    "y": ball_init_y,
-                    "speed": [random.uniform(1, 3), random.uniform(1, 3)],
-                    "color": get_random_color(),
-                    "trail": [],
-                    "counter": 0
-                })
+                add_ball()
             # 检查点击是否落在圆形减少按钮内
             dx_dec = mouse_pos[0] - decrease_button_center[0]
             dy_dec = mouse_pos[1] - decrease_button_center[1]
             if (dx_dec*dx_dec + dy_dec*dy_dec) <= button_radius*button_radius and len(balls) > 1:
-                balls.pop()
+                remove_ball()
         # 新增：快捷键支持 Ctrl + '-' 和 Ctrl + '+'
         if event.type == pygame.KEYDOWN:
             if event.mod & pygame.KMOD_CTRL:
                 # 控制减少
                 if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
                     if len(balls) > 1:
-                        balls.pop()
+                        remove_ball()
                 # 控制增加；部分键盘上 '+'可能是 '=' (需 Shift)，也支持数字键盘加号
                 elif event.key in (pygame.K_PLUS, pygame.K_KP_PLUS, pygame.K_EQUALS):
                     if len(balls) < maxballs:
-                        balls.append({
-                            "x": ball_init_x,
-                            "y": ball_init_y,
-                            "speed": [random.uniform(1, 3), random.uniform(1, 3)],
-                            "color": get_random_color(),
-                            "trail": [],
-                            "counter": 0
-                        })
+                        add_ball()
 
     keys = pygame.key.get_pressed()
     if keys[pygame.K_LEFT] and paddle_x > 0:
@@ -137,49 +133,17 @@ while True:
     if keys[pygame.K_RIGHT] and paddle_x < window_size[0] - paddle_width:
         paddle_x += paddle_speed
 
+    world.set_paddle(paddle_x, paddle_y, paddle_width, paddle_height)
+
     # 更新每个球的位置和物理状态
     current_time = pygame.time.get_ticks()
-    for ball in balls:
-        ball["x"] += ball["speed"][0]
-        # 更新垂直运动及模拟重力和阻尼，每个球独立计数
-        if not (abs(ball["speed"][1]) < 2 and (paddle_y - ball["y"]) < 22):
-            ball["speed"][1] += gravity
-            ball["y"] += ball["speed"][1]
-            ball["counter"] += 1
-            if ball["counter"] == 60:
-                ball["speed"][1] *= damping_factor
-                ball["counter"] = 0
-        else:
-            ball["speed"][1] = 0
-            ball["y"] = paddle_y - ball_radius
-
-        # 球与墙的碰撞检测
-        if ball["x"] - ball_radius < 0 or ball["x"] + ball_radius > window_size[0]:
-            ball["speed"][0] = -ball["speed"][0]
-            bounce_sound.play()
-        if ball["y"] - ball_radius < 0:
-            ball["speed"][1] = -ball["speed"][1]
-            bounce_sound.play()
-
-        # 弹簧碰撞检测
-        spring_speed = 5
-        if spring_x <= ball["x"] <= spring_x + spring_width and (ball["y"] + ball_radius >= spring_y) and (ball["y"] + ball_radius <= spring_y + spring_height):
-            if ball["trail"] and ball["trail"][-1][1] <= spring_y:
-                ball["speed"][1] += spring_speed
-            else:
-                ball["speed"][1] += max(abs(ball["speed"][1]) * 1.2, spring_speed)
-            bounce_sound.play()
-
-        # 球与木板的碰撞检测
-        if (ball["speed"][1] > 0 and
-            paddle_x <= ball["x"] <= paddle_x + paddle_width and
-            paddle_y <= ball["y"] + ball_radius):
-            ball["speed"][1] = -ball["speed"][1]
-            bounce_sound.play()
-
-        # 记录并清理每个球的轨迹（5秒内）
-        ball["trail"].append((ball["x"], ball["y"], current_time))
-        ball["trail"] = [pt for pt in ball["trail"] if current_time - pt[2] <= trail_time]
+    if world.step():
+        bounce_sound.play()
+
+    # 记录并清理每个球的轨迹（trail_time 毫秒内）
+    for ball, trail in zip(balls, trails):
+        trail.append(ball.x, ball.y, current_time)
+        trail.evict(current_time - trail_time)
 
     # 绘制场景
     screen.fill((50, 50, 50))  # 修改为深灰色背景
@@ -209,26 +173,13 @@ while True:
     screen.blit(minus_text, minus_rect)
 
     # 新增：绘制每个球的轨迹（彩虹色，越旧越淡）
-    for ball in balls:
-        tail_eldest = ball["trail"][0][2]  # 最旧的轨迹时间
-        tail_newest = ball["trail"][-1][2]   # 最新的轨迹时间
-        tail_length = tail_newest - tail_eldest
-        # 绘制改为使用彩虹色
-        if tail_length > 0:
-            for tx, ty, t in ball["trail"]:
-                age = current_time - t
-                progress = min(1, age / trail_time)
-                alpha = int(255 * (1 - progress))
-                # 用progress作为hue[0,1]，转换为RGB
-                rgb = colorsys.hsv_to_rgb(progress, 1, 1)
-                rainbow_color = (int(rgb[0]*255), int(rgb[1]*255), int(rgb[2]*255), alpha)
-                trail_surface = pygame.Surface((ball_radius*2, ball_radius*2), pygame.SRCALPHA)
-                pygame.draw.circle(trail_surface, rainbow_color, (ball_radius, ball_radius), ball_radius)
-                screen.blit(trail_surface, (int(tx)-ball_radius, int(ty)-ball_radius))
+    # 只画已经拉开的轨迹（最新与最旧的采样时间不同）
+    draw_trails(screen, trail_atlas, [trail for trail in trails if trail.newest > trail.oldest],
+                ball_radius, current_time, trail_time)
 
     # 绘制每个球
     for ball in balls:
-        pygame.draw.circle(screen, ball["color"], (int(ball["x"]), int(ball["y"])), ball_radius)
+        pygame.draw.circle(screen, ball.color, (int(ball.x), int(ball.y)), ball_radius)
 
     pygame.draw.rect(screen, paddle_color, (paddle_x, paddle_y, paddle_width, paddle_height))
     pygame.draw.rect(screen, spring_color, (spring_x, spring_y, spring_width, spring_height))
@@ -6,13 +6,19 @@ import random
 import math
 import numpy as np
 
+from ball_physics import resolve_pairs
+from broad_phase import PairStats, grid_pairs
+
 class GameConfig:
     def __init__(self):
         self.WINDOW_SIZE = (800, 600)
         self.FPS = 60
         self.BOX_SIZE = 100.0  # 立方体盒子的大小
         self.BALL_RADIUS = 5.0
-        self.MAX_BALLS = 5
+        self.MAX_BALLS = 1000
+        self.INITIAL_BALLS = 3
+        self.BALL_BATCH = 100  # 按住 Shift 时空格/退格一次增减的球数
+        self.SPHERE_DETAIL = 16  # 球的经线、纬线数，球多时不宜太大
         self.DAMPING = 0.99    # 碰撞后的能量损失
         self.GRAVITY = 9.8 / 60  # 重力加速度
         # 弹簧配置
@@ -21,46 +27,95 @@ class GameConfig:
         self.SPRING_DEPTH = 20.0
         self.SPRING_SPEED = 15.0  # 与pingpang.py保持一致的弹跳速度
 
-class Ball:
-    def __init__(self, radius):
+class Balls:
+    """所有球的位置、速度、半径和颜色存成数组，整批更新，球多时也不逐个调用 numpy"""
+    def __init__(self, radius, capacity=64):
         self.radius = radius
-        self.position = np.array([0.0, 0.0, 50.0])  # 从顶部开始
-        self.velocity = np.array([
-            random.uniform(-2, 2),
-            random.uniform(-2, 2),
-            random.uniform(-2, -1)
-        ])
-        self.color = (
-            random.uniform(0.5, 1.0),
-            random.uniform(0.5, 1.0),
-            random.uniform(0.5, 1.0)
-        )
-        self.quadric = gluNewQuadric()
-        
+        self.count = 0
+        self._position = np.zeros((capacity, 3))
+        self._velocity = np.zeros((capacity, 3))
+        self._radius = np.zeros(capacity)
+        self._color = np.zeros((capacity, 3))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def position(self):
+        return self._position[:self.count]
+
+    @property
+    def velocity(self):
+        return self._velocity[:self.count]
+
+    @property
+    def radii(self):
+        return self._radius[:self.count]
+
+    @property
+    def color(self):
+        return self._color[:self.count]
+
+    def add(self, count=1, spread=0.0):
+        """添加 count 个球：从顶部开始；spread 大于 0 时水平位置在 ±spread 内、高度在上半个盒子内随机，避免重叠在同一点"""
+        start, end = self.count, self.count + count
+        if end > len(self._radius):
+            for name in ("_position", "_velocity", "_radius", "_color"):
+                old = getattr(self, name)
+                new = np.zeros((max(end, 2 * len(old)),) + old.shape[1:])
+                new[:start] = old[:start]
+                setattr(self, name, new)
+        self._position[start:end] = (0.0, 0.0, 50.0)
+        if spread:
+            self._position[start:end, :2] = np.random.uniform(-spread, spread, (count, 2))
+            self._position[start:end, 2] = np.random.uniform(0.0, spread, count)
+        self._velocity[start:end, :2] = np.random.uniform(-2, 2, (count, 2))
+        self._velocity[start:end, 2] = np.random.uniform(-2, -1, count)
+        self._radius[start:end] = self.radius
+        self._color[start:end] = np.random.uniform(0.5, 1.0, (count, 3))
+        self.count = end
+
+    def pop(self, count=1):
+        self.count = max(self.count - count, 0)
+
     def update(self, box_size, gravity, damping):
+        position, velocity, radius = self.position, self.velocity, self.radii
         # 更新位置
-        self.position += self.velocity
-        self.velocity[2] -= gravity  # 添加重力
-        
-        # 碰撞检测和处理
-        for i in range(3):  # x, y, z轴
-            if abs(self.position[i]) + self.radius > box_size/2:
-                # 如果球超出边界
-                self.position[i] = np.sign(self.position[i]) * (box_size/2 - self.radius)
-                self.velocity[i] *= -damping  # 反弹并损失能量
+        position += velocity
+        velocity[:, 2] -= gravity  # 添加重力
 
-    def draw(self):
-        glPushMatrix()
-        glTranslatef(*self.position)
-        
-        # 设置材质属性
-        glMaterialfv(GL_FRONT, GL_AMBIENT, [*self.color, 1.0])
-        glMaterialfv(GL_FRONT, GL_DIFFUSE, [*self.color, 1.0])
+        # 碰撞检测和处理：超出边界的球放回边界上，反弹并损失能量
+        limit = box_size / 2 - radius[:, None]
+        outside = np.abs(position) > limit
+        position[outside] = (np.sign(position) * limit)[outside]
+        velocity[outside] *= -damping
+
+    def collide(self, damping, stats=None):
+        """网格找出可能相碰的球对，每对只检查一次，整批求解，返回碰撞次数"""
+        first, second = grid_pairs(self.position, self.radii, stats=stats, ordered=False)
+        # 每个球的法向速度乘 damping，相当于弹性系数 2 * damping - 1；
+        # 盒子里挤满球时冲量直接相加会越撞越快，按接触数松弛
+        resolved = resolve_pairs(self.position, self.velocity, self.radii, first, second, 2 * damping - 1,
+                                 relax=True)
+        if stats is not None:
+            stats.resolved += resolved
+        return resolved
+
+    def draw(self, sphere):
+        """sphere 是单位球的显示列表，每个球只需平移、缩放后调用"""
         glMaterialfv(GL_FRONT, GL_SPECULAR, [1.0, 1.0, 1.0, 1.0])
         glMaterialf(GL_FRONT, GL_SHININESS, 60.0)
-        
-        gluSphere(self.quadric, self.radius, 32, 32)
-        glPopMatrix()
+        for (x, y, z), radius, color in zip(self.position.tolist(), self.radii.tolist(), self.color.tolist()):
+            glPushMatrix()
+            glTranslatef(x, y, z)
+            glScalef(radius, radius, radius)
+
+            # 设置材质属性
+            glMaterialfv(GL_FRONT, GL_AMBIENT, [*color, 1.0])
+            glMaterialfv(GL_FRONT, GL_DIFFUSE, [*color, 1.0])
+
+            glCallList(sphere)
+            glPopMatrix()
 
 class Spring:
     def __init__(self, config):
@@ -125,19 +180,18 @@ class Spring:
         glEnd()
         glPopMatrix()
 
-    def check_collision(self, ball):
+    def check_collision(self, balls):
+        """返回与弹簧接触的球的掩码"""
         # 获取球相对于弹簧的位置
-        rel_pos = ball.position - self.position
+        rel_pos = balls.position - self.position
         
         # 检查是否在弹簧的范围内
-        if (abs(rel_pos[0]) < self.width/2 and 
-            abs(rel_pos[1]) < self.depth/2 and 
-            abs(rel_pos[2]) < self.height/2 + ball.radius):
-            
-            # 检查是否从上方接触（与pingpang.py类似）
-            if ball.velocity[2] < 0:
-                return True
-        return False
+        inside = ((np.abs(rel_pos[:, 0]) < self.width/2) &
+                  (np.abs(rel_pos[:, 1]) < self.depth/2) &
+                  (np.abs(rel_pos[:, 2]) < self.height/2 + balls.radii))
+        
+        # 检查是否从上方接触（与pingpang.py类似）
+        return inside & (balls.velocity[:, 2] < 0)
 
 class Box:
     def __init__(self, size):
@@ -200,10 +254,19 @@ class Game:
         glLightfv(GL_LIGHT0, GL_DIFFUSE, [0.8, 0.8, 0.8, 1.0])
         glLightfv(GL_LIGHT0, GL_SPECULAR, [1.0, 1.0, 1.0, 1.0])
 
+        # 单位球编译成显示列表，所有球共用
+        self.quadric = gluNewQuadric()
+        self.sphere = glGenLists(1)
+        glNewList(self.sphere, GL_COMPILE)
+        gluSphere(self.quadric, 1.0, self.config.SPHERE_DETAIL, self.config.SPHERE_DETAIL)
+        glEndList()
+
     def setup_game_objects(self):
         self.box = Box(self.config.BOX_SIZE)
         self.spring = Spring(self.config)
-        self.balls = [Ball(self.config.BALL_RADIUS) for _ in range(3)]
+        self.balls = Balls(self.config.BALL_RADIUS)
+        self.balls.add(self.config.INITIAL_BALLS)
+        self.pair_stats = PairStats()
         
     def setup_camera(self):
         self.camera_distance = 200.0
@@ -215,12 +278,11 @@ class Game:
             if event.type == pygame.QUIT:
                 return False
             elif event.type == pygame.KEYDOWN:
+                count = self.config.BALL_BATCH if event.mod & pygame.KMOD_SHIFT else 1
                 if event.key == pygame.K_SPACE:
-                    if len(self.balls) < self.config.MAX_BALLS:
-                        self.balls.append(Ball(self.config.BALL_RADIUS))
+                    self.add_balls(count)
                 elif event.key == pygame.K_BACKSPACE:
-                    if len(self.balls) > 1:
-                        self.balls.pop()
+                    self.balls.pop(min(count, len(self.balls) - 1))
                         
         # 处理按住的键
         keys = pygame.key.get_pressed()
@@ -239,33 +301,25 @@ class Game:
             
         return True
 
+    def add_balls(self, count):
+        count = min(count, self.config.MAX_BALLS - len(self.balls))
+        if count > 0:
+            # 一次添加多个时在上半个盒子里散开
+            spread = 0.0 if count == 1 else self.config.BOX_SIZE/2 - self.config.BALL_RADIUS
+            self.balls.add(count, spread)
+
     def update(self):
-        for ball in self.balls:
-            # 更新球的位置
-            ball.update(self.config.BOX_SIZE, self.config.GRAVITY, self.config.DAMPING)
-            
-            # 检查弹簧碰撞
-            if self.spring.check_collision(ball):
-                # 模拟pingpang.py中的弹簧效果
-                if ball.velocity[2] < 0:  # 只在球向下运动时触发
-                    ball.velocity[2] = max(abs(ball.velocity[2]) * 1.2, self.spring.spring_speed)
-            
-            # 球之间的碰撞检测
-            for i, ball1 in enumerate(self.balls):
-                for ball2 in self.balls[i+1:]:
-                    diff = ball1.position - ball2.position
-                    distance = np.linalg.norm(diff)
-                    if distance < (ball1.radius + ball2.radius):
-                        normal = diff / distance
-                        relative_velocity = ball1.velocity - ball2.velocity
-                        impulse = -2.0 * np.dot(relative_velocity, normal) / 2.0
-                        ball1.velocity += normal * impulse * self.config.DAMPING
-                        ball2.velocity -= normal * impulse * self.config.DAMPING
-                        
-                        # 防止球体重叠
-                        overlap = (ball1.radius + ball2.radius - distance) / 2.0
-                        ball1.position += normal * overlap
-                        ball2.position -= normal * overlap
+        # 更新球的位置
+        self.balls.update(self.config.BOX_SIZE, self.config.GRAVITY, self.config.DAMPING)
+        
+        # 检查弹簧碰撞，模拟pingpang.py中的弹簧效果（只在球向下运动时触发）
+        hit = self.spring.check_collision(self.balls)
+        if hit.any():
+            velocity = self.balls.velocity
+            velocity[hit, 2] = np.maximum(np.abs(velocity[hit, 2]) * 1.2, self.spring.spring_speed)
+        
+        # 球之间的碰撞检测
+        self.balls.collide(self.config.DAMPING, self.pair_stats)
 
     def draw(self):
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
@@ -283,8 +337,7 @@ class Game:
         # 绘制场景
         self.box.draw()
         self.spring.draw()
-        for ball in self.balls:
-            ball.draw()
+        self.balls.draw(self.sphere)
         
         pygame.display.flip()
 
@@ -1,27 +1,39 @@
+import time
+_start_time = time.perf_counter()  # 启动计时的起点，在所有导入之前
+
 import pygame
 import math
+import random
+import logging
+from collections import OrderedDict
 from typing import List, Tuple, Optional
 import numpy as np
-from dataclasses import dataclass
-from tkinter import *
-from tkinter import messagebox
-from numba import njit
-Tk().wm_withdraw() #to hide the main window
+from wave_render import FieldRenderer, PixelRenderer, dedup_polyline, draw_rainbow_polyline
+from fixed_step import FixedStepClock
+from wave_room import PolygonRoom, regular_polygon
+from wave_compositor import DirtyRects, StaticLayer, TextLayer
+from wave_engine import WaveEngine, WaveTimeline, angle_cache_info, kernel_state, warm_up_kernels_async
+from wave_config import (BLACK, BLUE, GRAY, GREEN, HEIGHT, RAINBOW_COLORS, RED, WHITE, WIDTH, WINDOW_HEIGHT,
+                         WINDOW_WIDTH, WaveConfig)
+
+logger = logging.getLogger(__name__)
+
+# 启动耗时（秒）：导入、初始化、第一帧、numba 内核就绪
+startup_times = {"import": time.perf_counter() - _start_time}
 
 # 初始化 Pygame
 pygame.init()
 clock = pygame.time.Clock()
 
 # 设置窗口
-WINDOW_WIDTH = 900
-WINDOW_HEIGHT = 900
-WIDTH = 800
-HEIGHT = 800
 pygame.display.set_caption("Multiple Wave Reflection")
 try:
     icon = pygame.image.load("simple_wave_reflection.png")
     pygame.display.set_icon(icon)
 except Exception as ex:
+    # tkinter 只在需要弹窗时才导入
+    from tkinter import Tk, messagebox
+    Tk().wm_withdraw() #to hide the main window
     messagebox.showinfo("Error", f"Failed to load icon: {str(ex)}")
 screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
 
@@ -31,116 +43,122 @@ hotspot = (cursor_rect.width // 2, cursor_rect.height // 2)
 cursor = pygame.cursors.Cursor(hotspot, cursor_surface)
 pygame.mouse.set_cursor(cursor)
 
-# 颜色定义
-BLACK = (0, 0, 0)
-WHITE = (255, 255, 255)
-GRAY = (128, 128, 128)
-GREEN = (0, 255, 0)
-BLUE = (0, 0, 255)
-RED = (255, 0, 0)
-
-@dataclass
-class WaveConfig:
-    WAVE_COUNT = 10      # 每次点击产生的波数
-    RADIUS_GAP = 40     # 波之间的半径间隔
-    WAVE_SPEED = 1      # 波的扩散速度
-    ANGLE_STEP = 1      # 角度步进（越小越平滑）
-
-@njit
-def calculate_reflection_numba(coord, min_bound, max_bound):
-    total_range = max_bound - min_bound
-    relative_pos = coord - min_bound
-    n = relative_pos // total_range
-    remainder = relative_pos % total_range
-    if int(n) % 2 == 0:
-        return min_bound + remainder
-    else:
-        return max_bound - remainder
-
-class Wave:
-    color_index = 0
-    def __init__(self, x: float, y: float, start_x: float, start_y: float):
-        self.type = 0
-        self.center_x = x
-        self.center_y = y
-        self.start_x = start_x
-        self.start_y = start_y
-        self.radius = 0
-        color_index = Wave.color_index
-        Wave.color_index = (Wave.color_index + 1) % 3
-        self.color = BLUE if color_index == 0 else GREEN if color_index == 1 else RED
-        self.speed = 1
-        self.points: List[Tuple[float, float]] = []
-        # 预计算角度
-        # self.angles = np.radians(np.arange(0, 360, WaveConfig.ANGLE_STEP))
-        # self.cos_angles = np.cos(self.angles)
-        # self.sin_angles = np.sin(self.angles)
-        
-    def update(self, top_y: float, bottom_y: float, left_x: float, right_x: float):
-        self.radius += self.speed
-        # if self.radius >= 2400 or self.radius <= 0 :
-        #     self.speed *= -1
-
-        # 使用numpy进行向量化计算
-        if self.type == 0:
-            num_points = max(360, self.radius)
-            angles = np.radians(np.arange(0, 360, 1 / (num_points / 360)))
-        else:
-            angles = [angle for angle in range(0, max(360, self.radius), 1)] ## 直接用角，有另一种效果
-        x_coords = self.start_x + self.radius * np.cos(angles)
-        y_coords = self.start_y + self.radius * np.sin(angles)
-        
-        # 向量化处理反射
-        self.points = []
-        for x, y in zip(x_coords, y_coords):
-            actual_x = self._calculate_reflection(x, left_x, right_x)
-            actual_y = self._calculate_reflection(y, top_y, bottom_y)
-            self.points.append((actual_x, actual_y))
-    
-    def _calculate_reflection(self, coord: float, min_bound: float, max_bound: float) -> float:
-        return calculate_reflection_numba(coord, min_bound, max_bound)
-            
-    def draw(self, screen):
-        # 绘制波前
-        if len(self.points) > 1:
-            # 平移变换
-            translated_points = [(x + self.center_x, y + self.center_y) for x, y in self.points]
-            if self.type == 0:
-                pygame.draw.lines(screen, self.color, closed=True, points=translated_points, width=3)
-            elif len(translated_points) >= 7:
-                # 创建彩虹色
-                rainbow_colors = [
-                    (255, 0, 0),    # 红
-                    (255, 127, 0),  # 橙
-                    (255, 255, 0),  # 黄
-                    (0, 255, 0),    # 绿
-                    (0, 0, 255),    # 蓝
-                    (75, 0, 130),   # 靛
-                    (143, 0, 255)   # 紫
-                ]
-                # 绘制彩虹色线条
-                for i in range(len(translated_points) - 1):
-                    pygame.draw.line(screen, rainbow_colors[i % len(rainbow_colors)], translated_points[i], translated_points[i + 1], width=2)
-
-                # 连接最后一个点和第一个点
-                pygame.draw.line(screen, rainbow_colors[-1], translated_points[-1], translated_points[0], width=2)
+
+# 可切换的房间：None 为矩形边界，其余为多边形房间（坐标以窗口中心为原点）
+ROOMS = [
+    ("box", None),
+    ("hexagon", PolygonRoom(regular_polygon(6, 400))),
+    ("pentagon + wall", PolygonRoom(regular_polygon(5, 400, rotation=-math.pi / 2),
+                                    interior_walls=[((-150, 60), (150, 60))])),
+]
+
 
 class WaveSimulation:
     def __init__(self):
         self.border = pygame.Rect(-1 * WIDTH//2, -1 * HEIGHT//2, WIDTH, HEIGHT)
-        self.waves: List[Wave] = []
+        self.engine = WaveEngine(
+            (self.border.left, self.border.top, self.border.right, self.border.bottom),
+            capacity=WaveConfig.WAVE_COUNT * 2,
+            wave_count=WaveConfig.WAVE_COUNT,
+            radius_gap=WaveConfig.RADIUS_GAP,
+            speed=WaveConfig.WAVE_SPEED,
+            palette=(BLUE, GREEN, RED),
+            angle_quantum=WaveConfig.ANGLE_QUANTUM,
+            tolerance=WaveConfig.WAVE_TOLERANCE,
+            emitter_radius=WaveConfig.EMITTER_RADIUS
+        )
+        self.wave: Optional[int] = None  # 最近一次手动创建的波的编号（WaveEngine.wave_id），槽位会被复用
         self.paused = False
+        self.draw_calls = 0  # 当前帧的绘制调用数
+        self.last_draw_calls = 0  # 上一帧的绘制调用数，状态栏在绘制之前更新，显示这个值
+        self.scheduler = FixedStepClock(WaveConfig.SIM_RATE, WaveConfig.MAX_CATCH_UP)
+        self.pixel_renderer = WaveConfig.PIXEL_RENDERER
+        self.renderer = PixelRenderer((WINDOW_WIDTH, WINDOW_HEIGHT), RAINBOW_COLORS, background=BLACK,
+                                      dedup=WaveConfig.DEDUP_SEGMENTS)
+        self.field_mode = WaveConfig.FIELD_MODE
+        self.field_orders = WaveConfig.FIELD_ORDERS
+        self.field_renderer = FieldRenderer()
+        self.room_index = WaveConfig.ROOM
+        self.engine.room = ROOMS[self.room_index][1]
         self.last_wave_pos = (0, 0)
         self._last_key_time = None
-        
-    def create_waves(self, x: float, y: float, start_x: float, start_y: float):
-        """创建多个同心波"""
-        self.waves.clear()  # 清除现有的波
-        for i in range(WaveConfig.WAVE_COUNT):
-            initial_radius = i * WaveConfig.RADIUS_GAP
-            self.waves.append(Wave(x, y, start_x, start_y))
-        self.last_wave_pos = (x, y)
-        
+        # 多波源模式：点击添加独立波源，而不是重新发一串波
+        self.emitter_mode = False
+        self.drawn_points = 0  # 上一帧剔除后实际绘制的点数
+        # 视图变换：屏幕坐标 = 引擎坐标 * view_scale + view_offset
+        self.view_scale = 1.0
+        self.view_offset = (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)
+        # 时间轴：从最近一次发射/修改开始计帧，可直接跳到任意一帧
+        self.frame = 0
+        self.timeline: Optional[WaveTimeline] = None
+        self.frame_cache: OrderedDict = OrderedDict()
+        # 按脏矩形合成画面：状态文字和边界分别缓存，舞台（波所在区域）只在有变化时重画
+        self.status = TextLayer(pygame.font.Font(None, 24), GRAY)
+        self.border_layer = StaticLayer((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.dirty = DirtyRects((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.stage_dirty = True  # 为 True 时下一帧即使暂停也重画舞台
+        self._stage: Optional[pygame.Rect] = None
+
+    def _restart_timeline(self):
+        """波的集合被手动改变后，从当前状态重新开始时间轴"""
+        self.timeline = WaveTimeline(self.engine, self.frame)
+        self.frame_cache.clear()
+
+    def seek(self, frame: int):
+        """直接跳到时间轴上的第 frame 帧，不逐帧重放"""
+        if self.timeline is None:
+            return
+        self.frame = self.timeline.seek(frame)
+        # 跳转后的状态正好在一步上，之前累积的不足一步的时间不再适用
+        self.scheduler.reset()
+
+    def to_world(self, pos: Tuple[int, int]) -> Tuple[float, float]:
+        """屏幕坐标转换为引擎坐标"""
+        return ((pos[0] - self.view_offset[0]) / self.view_scale,
+                (pos[1] - self.view_offset[1]) / self.view_scale)
+
+    def viewport(self) -> Tuple[float, float, float, float]:
+        """窗口在引擎坐标中的范围，四周留出线宽"""
+        left, top = self.to_world((-3, -3))
+        right, bottom = self.to_world((WINDOW_WIDTH + 3, WINDOW_HEIGHT + 3))
+        return left, top, right, bottom
+
+    def zoom(self, factor: float, pos: Tuple[int, int]):
+        """以 pos 为中心缩放，pos 处的点在屏幕上不动"""
+        scale = min(max(self.view_scale * factor, 1.0), WaveConfig.MAX_ZOOM)
+        if scale == 1.0:
+            self.view_offset = (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)
+        else:
+            x, y = self.to_world(pos)
+            self.view_offset = (pos[0] - x * scale, pos[1] - y * scale)
+        self.view_scale = scale
+
+    def inside(self, x: float, y: float) -> bool:
+        """引擎坐标的点是否在边界或房间内"""
+        room = self.engine.room
+        if room is None:
+            return self.border.left <= x < self.border.right and self.border.top <= y < self.border.bottom
+        return room.contains(x, y)
+
+    def add_random_emitters(self, count: int):
+        """在边界或房间内随机添加 count 个独立波源"""
+        added = 0
+        while added < count:
+            x = random.uniform(self.border.left, self.border.right)
+            y = random.uniform(self.border.top, self.border.bottom)
+            if self.inside(x, y):
+                self.engine.add_emitter(x, y)
+                added += 1
+        self._restart_timeline()
+
+    def set_wave_type(self, wave_type: int) -> bool:
+        """把最近一次手动创建的波改为 wave_type 类型；它已被回收时不做任何事，返回 False"""
+        slot = None if self.wave is None else self.engine.slot_of(self.wave)
+        if slot is None:
+            return False
+        self.engine.type[slot] = wave_type
+        return True
+
     def handle_input(self) -> bool:
             
         # current_time = pygame.time.get_ticks()
@@ -167,24 +185,34 @@ class WaveSimulation:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
-                
-            elif event.type == pygame.KEYDOWN:
+            elif event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEWHEEL):
+                # 输入可能改变画面，暂停时也要重画舞台
+                self.stage_dirty = True
+
+            if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     return False
                     
                 elif event.key == pygame.K_SPACE:
                     self.paused = not self.paused
+                    if not self.paused:
+                        # 从暂停处接着走，不补暂停期间累积的时间
+                        self.scheduler.reset()
                     
                 elif event.key == pygame.K_a:
-                    self.waves.clear()
+                    self.emitter_mode = False
+                    self.engine.clear()
                     x, y = pygame.mouse.get_pos()
                     self.last_wave_pos = (x - WINDOW_WIDTH // 2, y - WINDOW_HEIGHT // 2)
-                    self.waves.append(Wave(WINDOW_WIDTH//2, WINDOW_HEIGHT//2, *self.last_wave_pos))
+                    self.engine.emit(*self.last_wave_pos)
+                    self._restart_timeline()
                 elif event.key == pygame.K_RETURN:
                     if self.last_wave_pos:
-                        self.waves.clear()
-                        self.wave = Wave(WINDOW_WIDTH//2, WINDOW_HEIGHT//2, *self.last_wave_pos)
-                        self.waves.append(self.wave)
+                        self.emitter_mode = False
+                        self.engine.clear()
+                        slot = self.engine.emit(*self.last_wave_pos)
+                        self.wave = self.engine.wave_id(slot)
+                        self._restart_timeline()
                 elif event.key == pygame.K_LEFT or event.key == pygame.K_RIGHT or event.key == pygame.K_UP  or event.key == pygame.K_DOWN:
                     x, y = pygame.mouse.get_pos()
                     if event.key == pygame.K_LEFT:
@@ -196,131 +224,296 @@ class WaveSimulation:
                     if event.key == pygame.K_DOWN:
                         y = y + 1
                     pygame.mouse.set_pos(x, y)
+                elif event.key == pygame.K_r:
+                    self.pixel_renderer = not self.pixel_renderer
+                elif event.key == pygame.K_f and self.engine.room is None:
+                    # 镜像法只适用于矩形边界
+                    self.field_mode = not self.field_mode
+                elif event.key == pygame.K_p:
+                    self.room_index = (self.room_index + 1) % len(ROOMS)
+                    self.engine.room = ROOMS[self.room_index][1]
+                    if self.engine.room is not None:
+                        self.field_mode = False
+                    self._restart_timeline()
+                elif event.key == pygame.K_m:
+                    # 切换模式时清空所有波，两种模式的波不混在一起
+                    self.emitter_mode = not self.emitter_mode
+                    self.engine.clear()
+                    self._restart_timeline()
+                elif event.key == pygame.K_n:
+                    if not self.emitter_mode:
+                        self.emitter_mode = True
+                        self.engine.clear()
+                    self.add_random_emitters(WaveConfig.EMITTER_BATCH)
+                elif event.key == pygame.K_d:
+                    self.renderer.dedup = not self.renderer.dedup
+                elif event.key == pygame.K_HOME:
+                    # 缩放到 1 倍即恢复默认视图
+                    self.zoom(0, (0, 0))
+                elif event.key == pygame.K_EQUALS:
+                    self.field_orders += 1
+                elif event.key == pygame.K_MINUS:
+                    self.field_orders = max(0, self.field_orders - 1)
                 elif event.key == pygame.K_0:
-                    self.wave.type = 0
+                    if self.set_wave_type(0):
+                        self._restart_timeline()
                 elif event.key == pygame.K_1:
-                    self.wave.type = 1
+                    if self.set_wave_type(1):
+                        self._restart_timeline()
+                elif event.key == pygame.K_LEFTBRACKET or event.key == pygame.K_RIGHTBRACKET:
+                    # 拖动时间轴时暂停，前后来回跳的帧从缓存中直接取出
+                    self.paused = True
+                    step = WaveConfig.SEEK_STEP if event.key == pygame.K_RIGHTBRACKET else -WaveConfig.SEEK_STEP
+                    self.seek(self.frame + step)
                         
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                pos = pygame.mouse.get_pos()
-                translated_border = pygame.Rect(
-                    self.border.x + WINDOW_WIDTH // 2,
-                    self.border.y + WINDOW_HEIGHT // 2,
-                    self.border.width,
-                    self.border.height
-                )
-                if translated_border.collidepoint(pos):
-                    self.wave = Wave(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2, pos[0] - WINDOW_WIDTH // 2, pos[1] - WINDOW_HEIGHT // 2)
-                    self.waves.append(self.wave)
-                    self.last_wave_pos = (pos[0] - WINDOW_WIDTH // 2, pos[1] - WINDOW_HEIGHT // 2)
+            elif event.type == pygame.MOUSEWHEEL:
+                self.zoom(1.25 ** event.y, pygame.mouse.get_pos())
+
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 2, 3):
+                x, y = self.to_world(pygame.mouse.get_pos())
+                if self.inside(x, y):
+                    if self.emitter_mode:
+                        self.engine.add_emitter(x, y)
+                    else:
+                        slot = self.engine.emit(x, y)
+                        self.wave = self.engine.wave_id(slot)
+                        self.last_wave_pos = (x, y)
+                    self._restart_timeline()
 
         return True
         
     def update(self):
-        if len(self.waves) > 0 and not self.paused:
-            for wave in self.waves:
-                wave.update(
-                    self.border.top,
-                    self.border.bottom,
-                    self.border.left,
-                    self.border.right
-                )
-            if len(self.waves) < WaveConfig.WAVE_COUNT and self.waves[-1].radius > WaveConfig.RADIUS_GAP:
-                self.waves.append(Wave(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2, *self.last_wave_pos))
-            if len(self.waves) >= WaveConfig.WAVE_COUNT and self.waves[0].radius > 1600:
-                if self.waves[0].radius > 2400:
-                    self.waves.pop(0)
-                elif len(self.waves) < WaveConfig.WAVE_COUNT * 2 and self.waves[-1].radius > WaveConfig.RADIUS_GAP:
-                    self.waves.append(Wave(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2, *self.last_wave_pos))
+        # 每个模拟步只推进半径和队列，产生/回收波（1600/2400 半径规则）只移动队列索引；
+        # 反射在绘制时按插值后的半径统一计算
+        if len(self.engine) > 0 and not self.paused:
+            self.engine.step(reflect=False)
+            self.frame += 1
             
-    def draw(self, screen):
-        # 清屏
-        screen.fill(BLACK)
+    def draw(self, screen, alpha: float = 0):
+        """按脏矩形重画：波所在的舞台区域只在有变化时重画，文字只在内容变化时重新渲染
+
+        画好的区域记入 self.dirty，由主循环调用 present() 推到显示器。
+        """
+        self.draw_calls = 0
+        stage = self.stage_rect()
+        if stage != self._stage:
+            # 缩放或切换房间后舞台范围变了，整窗重画
+            self._stage = stage
+            self.dirty.invalidate()
+        changed = self._update_status()
+        full = self.dirty.full
+        redraw_stage = (full or self.stage_dirty or (not self.paused and len(self.engine) > 0)
+                        or any(rect.colliderect(stage) for rect in changed))
+
+        if full:
+            screen.fill(BLACK)
+            self.draw_calls += self.status.blit(screen)
+        else:
+            # 先重画变化的文字，与舞台重叠的部分随后被舞台覆盖重画
+            for rect in changed:
+                screen.set_clip(rect)
+                screen.fill(BLACK)
+                self.draw_calls += self.status.blit(screen, rect) + 1
+                self.dirty.mark(rect)
+            screen.set_clip(None)
+
+        if redraw_stage:
+            screen.set_clip(stage)
+            self._draw_stage(screen, stage, alpha)
+            self.draw_calls += self.status.blit(screen, stage)
+            screen.set_clip(None)
+            self.dirty.mark(stage)
+        self.stage_dirty = False
+        self.last_draw_calls = self.draw_calls
+        logger.debug("draw calls: %d", self.draw_calls)
+
+    def stage_rect(self) -> pygame.Rect:
+        """波和边界所在的屏幕区域，四周留出线宽，裁剪到窗口内"""
+        if self.engine.room is None or self.field_mode:
+            left, top, right, bottom = self.border.left, self.border.top, self.border.right, self.border.bottom
+        else:
+            left, top, right, bottom = self.engine.room.bounds()
+        scale, offset = self.view_scale, self.view_offset
+        rect = pygame.Rect(math.floor(left * scale + offset[0]) - 4, math.floor(top * scale + offset[1]) - 4,
+                           math.ceil((right - left) * scale) + 9, math.ceil((bottom - top) * scale) + 9)
+        return rect.clip(screen.get_rect())
+
+    def _draw_stage(self, screen, stage: pygame.Rect, alpha: float):
+        """重画舞台区域；暂停时按帧缓存舞台的画面"""
+        cache_key = (self.frame, self.pixel_renderer, self.field_mode, self.field_orders, self.room_index,
+                     self.view_scale, self.view_offset, self.renderer.dedup)
+        cached = self.frame_cache.get(cache_key) if self.paused else None
+        if cached is not None:
+            self.frame_cache.move_to_end(cache_key)
+            screen.blit(cached, stage)
+            self.draw_calls += 1
+            return
+        if not self.field_mode:
+            # 看不见的波在采样之前就被剔除
+            self.engine.reflect(0 if self.paused else alpha, self.viewport())
+        self._draw_frame(screen, stage)
+        if self.paused:
+            # 只在暂停时缓存，运行时每帧都不同
+            self.frame_cache[cache_key] = screen.subsurface(stage).copy()
+            if len(self.frame_cache) > WaveConfig.FRAME_CACHE_SIZE:
+                self.frame_cache.popitem(last=False)
+
+    def _paint_border(self, surface):
+        """在静态层上画边界或房间的墙"""
+        scale, offset = self.view_scale, self.view_offset
+        room = self.engine.room
+        if room is None or self.field_mode:
+            translated_border = pygame.Rect(
+                round(self.border.x * scale + offset[0]),
+                round(self.border.y * scale + offset[1]),
+                round(self.border.width * scale),
+                round(self.border.height * scale)
+            )
+            pygame.draw.rect(surface, WHITE, translated_border, 2)
+        else:
+            for start, end in room.walls * scale + offset:
+                pygame.draw.line(surface, WHITE, start, end, 2)
+
+    def _draw_frame(self, screen, stage: Optional[pygame.Rect] = None):
+        """在 stage 区域（默认整窗）绘制边界和所有波，不含状态信息"""
+        stage = screen.get_rect() if stage is None else stage
+        scale, offset = self.view_scale, self.view_offset
+        self.drawn_points = 0
+        if self.field_mode:
+            # 波幅场铺满边界框，代替波前线条；网格按窗口像素计算，不随视图缩放
+            screen.fill(BLACK, stage)
+            field = self.engine.field(self.field_orders, WaveConfig.FIELD_RESOLUTION)
+            translated_border = self.border.move(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)
+            self.draw_calls += self.field_renderer.render(screen, field, translated_border)
+        elif self.pixel_renderer:
+            # 帧缓冲只更新舞台区域，同时完成清屏和所有波的绘制
+            self.draw_calls += self.renderer.render(screen, self.engine, offset, scale, stage)
+            self.drawn_points = self.renderer.drawn_points
+        else:
+            # 清屏
+            screen.fill(BLACK, stage)
         
-        # 绘制边界
-        translated_border = pygame.Rect(
-            self.border.x + WINDOW_WIDTH // 2,
-            self.border.y + WINDOW_HEIGHT // 2,
-            self.border.width,
-            self.border.height
-        )
-        pygame.draw.rect(screen, WHITE, translated_border, 2)
+        # 边界画在静态层上，房间和视图不变时直接复用
+        border_key = (self.room_index, self.field_mode, self.view_scale, self.view_offset)
+        self.border_layer.update(border_key, self._paint_border)
+        self.draw_calls += self.border_layer.blit(screen, stage)
         
-        # 绘制所有波
-        i = 0
-        for wave in self.waves:
-            wave.draw(screen)
-            i += 1
-            
-        # 绘制状态信息
-        self._draw_status(screen)
+        # 绘制所有波，包围盒在舞台之外的折线不画
+        if not self.pixel_renderer and not self.field_mode:
+            viewport = (stage.left - 3, stage.top - 3, stage.right + 3, stage.bottom + 3)
+            stats = self.renderer.stats
+            stats.reset()
+            for slot, points, closed in self.engine.polylines(offset, scale, viewport):
+                if self.renderer.dedup:
+                    keep = dedup_polyline(points, closed)
+                    stats.add(points, np.roll(points, -1, axis=0), keep, 3)
+                    points = points[keep]
+                    if len(points) < 2:
+                        continue
+                self._draw_wave(screen, points, self.engine.color[slot].tolist(), self.engine.type[slot], closed)
+                self.drawn_points += len(points)
         
-    def _draw_status(self, screen):
-        font = pygame.font.Font(None, 24)
-
-        x, y = 10, 10
-        status_texts = [
-            "Esc - Exit",
-            f'FPS:{int(clock.get_fps())}'
-        ]
-        for text in status_texts:
-            surface = font.render(text, True, GRAY)
-            screen.blit(surface, (x, y))
-            y += 25
+    def _draw_wave(self, screen, points: np.ndarray, color: Tuple[int, int, int], wave_type: int,
+                   closed: bool = True):
+        # points 已由引擎在复用的缓冲区中平移到窗口坐标
+        if wave_type == 0:
+            pygame.draw.lines(screen, color, closed=closed, points=points, width=3)
+            self.draw_calls += 1
+        elif len(points) >= 7:
+            # 彩虹色线条一次光栅化，颜色按段循环，最后一点连回第一点
+            draw_rainbow_polyline(screen, points, RAINBOW_COLORS, width=2, closed=closed)
+            self.draw_calls += 1
 
+    def _update_status(self) -> List[pygame.Rect]:
+        """更新状态文字，返回内容变化、需要重画的区域"""
         mouse_x, mouse_y = pygame.mouse.get_pos()
-        status_texts = [
-            f"Status: {'Paused' if self.paused else 'Running'}",
-            f"Mouse: ({mouse_x-50:03d}, {mouse_y-50:03d})"
+        cache_info = angle_cache_info()
+        columns = [
+            (10, [
+                "Esc - Exit",
+                f'FPS:{int(self.scheduler.render_rate)}',
+                f'Sim:{int(self.scheduler.sim_rate)}/{WaveConfig.SIM_RATE}'
+            ]),
+            (100, [
+                f"Status: {'Paused' if self.paused else 'Running'}",
+                f"Mouse: ({mouse_x-50:03d}, {mouse_y-50:03d})",
+                f"JIT: {kernel_state()}"
+            ]),
+            (260, [
+                f"Emitters: {len(self.engine.emitter_age)}" if self.emitter_mode
+                else f"Waves: {len(self.engine)}/{WaveConfig.WAVE_COUNT}",
+                f"Radius: {0 if len(self.engine) == 0 else int(self.engine.radius[self.engine.oldest])}",
+                f"Frame: {self.frame}"
+            ]),
+            (400, [
+                "Num 0-1 - Type",
+                "M/N - Emitters" if self.emitter_mode else "Click - Start new wave",
+                "[ ] - Seek"
+            ]),
+            (600, [
+                "Space - Pause/Resume",
+                "Enter - Restart last waves",
+                f"P - Room: {ROOMS[self.room_index][0]}"
+            ]),
         ]
-        x, y = 100, 10
-        for text in status_texts:
-            surface = font.render(text, True, GRAY)
-            screen.blit(surface, (x, y))
-            y += 25
+        changed = []
+        for x, texts in columns:
+            y = 10
+            for text in texts:
+                rect = self.status.set((x, y), text, (x, y))
+                if rect is not None:
+                    changed.append(rect)
+                y += 25
 
+        # 底部一行显示性能计数
         status_texts = [
-            f"Waves: {len(self.waves)}/{WaveConfig.WAVE_COUNT}",
-            f"Radius: {0 if len(self.waves) == 0 else self.waves[0].radius}"
+            f"Points: {self.drawn_points}/{self.engine.emitted_points}",
+            f"Trig cache: {cache_info.hits}/{cache_info.misses}",
+            f"Draw calls: {self.last_draw_calls}",
+            f"Dedup: {self.renderer.stats.saved:.0%} saved (D)" if self.renderer.dedup else "Dedup: off (D)",
+            f"Renderer: {'pixels' if self.pixel_renderer else 'lines'} (R)"
+            if not self.field_mode else f"Field: {self.field_orders} orders (F, -/=)",
         ]
-        x, y = 260, 10
+        x, y = 10, WINDOW_HEIGHT - 35
         for text in status_texts:
-            surface = font.render(text, True, GRAY)
-            screen.blit(surface, (x, y))
-            y += 25
+            rect = self.status.set((x, y), text, (x, y))
+            if rect is not None:
+                changed.append(rect)
+            x += 180
+        return changed
 
-        status_texts = [
-            "Num 0-1 - Type",
-            "Click - Start new wave",
-        ]
-        x, y = 400, 10
-        for text in status_texts:
-            surface = font.render(text, True, GRAY)
-            screen.blit(surface, (x, y))
-            y += 25
-
-        status_texts = [
-            "Space - Pause/Resume",
-            "Enter - Restart last waves",
-        ]
-        x, y = 600, 10
-        for text in status_texts:
-            surface = font.render(text, True, GRAY)
-            screen.blit(surface, (x, y))
-            y += 25
+def report_startup(stage: str):
+    """记录从启动到 stage 完成的耗时，并写入日志"""
+    startup_times[stage] = time.perf_counter() - _start_time
+    logger.info("startup %s: %.3fs", stage, startup_times[stage])
 
 def main():
+    logger.info("startup import: %.3fs", startup_times["import"])
+    # numba 的导入和编译放到后台线程，与模拟初始化并行；就绪前反射和光栅化先用 numpy。
+    # 在这里而不是导入时启动，只导入本模块（基准、导出）不会多出一个编译线程
+    warm_up_thread = warm_up_kernels_async()
     simulation = WaveSimulation()
+    report_startup("init")
     
     running = True
+    first_frame = True
     while running:
         running = simulation.handle_input()
-        simulation.update()
-        simulation.draw(screen)
-        pygame.display.flip()
+        # 模拟按固定频率推进，与绘制解耦：渲染慢时一帧补走多步，渲染快时按 alpha 插值
+        for _ in range(simulation.scheduler.advance()):
+            simulation.update()
+        simulation.draw(screen, simulation.scheduler.alpha)
+        simulation.dirty.present()
+        if first_frame:
+            report_startup("first frame")
+            first_frame = False
+        if warm_up_thread is not None and not warm_up_thread.is_alive():
+            report_startup("kernels ready")
+            warm_up_thread = None
         clock.tick(240)
 
     pygame.quit()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
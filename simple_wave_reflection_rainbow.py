@@ -1,12 +1,17 @@
 import pygame
 import math
+import logging
 from typing import List, Tuple, Optional
 import numpy as np
 from dataclasses import dataclass
+from wave_render import draw_rainbow_polyline
+from wave_engine import WaveEngine
 from tkinter import *
 from tkinter import messagebox
 Tk().wm_withdraw() #to hide the main window
 
+logger = logging.getLogger(__name__)
+
 # 初始化 Pygame
 pygame.init()
 
@@ -47,91 +52,36 @@ class WaveConfig:
     RADIUS_GAP = 3     # 波之间的半径间隔
     WAVE_SPEED = 1      # 波的扩散速度
     ANGLE_STEP = 1      # 角度步进（越小越平滑）
-
-class Wave:
-    color_index = 0
-    def __init__(self, x: float, y: float, start_x: float, start_y: float, radius: float = 0, color: Tuple[int,int,int] = None, line_width: int = 2):
-        self.type = 0
-        self.center_x = x
-        self.center_y = y
-        self.start_x = start_x
-        self.start_y = start_y
-        self.radius = radius
-        color_index = Wave.color_index
-        Wave.color_index = (Wave.color_index + 1) % 3
-        self.color = color if color != None else BLUE if color_index == 0 else GREEN if color_index == 1 else RED
-        self.speed = 1
-        self.points: List[Tuple[float, float]] = []
-        # 预计算角度
-        # self.angles = np.radians(np.arange(0, 360, WaveConfig.ANGLE_STEP))
-        # self.cos_angles = np.cos(self.angles)
-        # self.sin_angles = np.sin(self.angles)
-        
-    def update(self, top_y: float, bottom_y: float, left_x: float, right_x: float):
-        self.radius += self.speed
-        # if self.radius >= 2400 or self.radius <= 0 :
-        #     self.speed *= -1
-
-        # 使用numpy进行向量化计算
-        if self.type == 0:
-            num_points = max(360, self.radius)
-            angles = np.radians(np.arange(0, 360, 1 / (num_points / 360)))
-        else:
-            angles = [angle for angle in range(0, max(360, self.radius), 1)] ## 直接用角，有另一种效果
-        x_coords = self.start_x + self.radius * np.cos(angles)
-        y_coords = self.start_y + self.radius * np.sin(angles)
-        
-        # 向量化处理反射
-        self.points = []
-        for x, y in zip(x_coords, y_coords):
-            actual_x = self._calculate_reflection(x, left_x, right_x)
-            actual_y = self._calculate_reflection(y, top_y, bottom_y)
-            self.points.append((actual_x, actual_y))
-    
-    def _calculate_reflection(self, coord: float, min_bound: float, max_bound: float) -> float:
-        """优化的反射计算"""
-        total_range = max_bound - min_bound
-        relative_pos = coord - min_bound
-        
-        n = relative_pos // total_range
-        remainder = relative_pos % total_range
-        
-        if int(n) % 2 == 0:
-            return min_bound + remainder
-        else:
-            return max_bound - remainder
-            
-    def draw(self, screen):
-        # 绘制波前
-        if len(self.points) > 1:
-            # 平移变换
-            translated_points = [(x + self.center_x, y + self.center_y) for x, y in self.points]
-            if self.type == 0:
-                pygame.draw.lines(screen, self.color, closed=True, points=translated_points, width=3)
-            elif len(translated_points) >= 7:
-                
-                # 绘制彩虹色线条
-                for i in range(len(translated_points) - 1):
-                    pygame.draw.line(screen, rainbow_colors[i % len(rainbow_colors)], translated_points[i], translated_points[i + 1], width=2)
-
-                # 连接最后一个点和第一个点
-                pygame.draw.line(screen, rainbow_colors[-1], translated_points[-1], translated_points[0], width=2)
+    ANGLE_QUANTUM = 32  # 采样点数的取整粒度，越大三角函数表复用越多；1 为按半径精确采样，但几乎每帧都要重算三角函数表
 
 class WaveSimulation:
     def __init__(self):
         self.border = pygame.Rect(-1 * WIDTH//2, -1 * HEIGHT//2, WIDTH, HEIGHT)
-        self.waves: List[Wave] = []
+        self.engine = WaveEngine(
+            (self.border.left, self.border.top, self.border.right, self.border.bottom),
+            # 原来的波列表没有上限，连续点击时已有的波不消失：槽位用满就扩容，只在半径超过 retire_radius 时回收
+            capacity=len(rainbow_colors) * 8,
+            grow=True,
+            wave_count=WaveConfig.WAVE_COUNT,
+            radius_gap=WaveConfig.RADIUS_GAP,
+            speed=WaveConfig.WAVE_SPEED,
+            palette=(BLUE, GREEN, RED),
+            burst=[(i * 3, color) for i, color in enumerate(rainbow_colors)],
+            angle_quantum=WaveConfig.ANGLE_QUANTUM
+        )
+        self.wave: Optional[int] = None  # 最近一次手动创建的波的编号（WaveEngine.wave_id），槽位会被复用
         self.paused = False
+        self.draw_calls = 0  # 上一帧的绘制调用数
         self.last_wave_pos = (0, 0)
         
-    def create_waves(self, x: float, y: float, start_x: float, start_y: float):
-        """创建多个同心波"""
-        self.waves.clear()  # 清除现有的波
-        for i in range(WaveConfig.WAVE_COUNT):
-            initial_radius = i * WaveConfig.RADIUS_GAP
-            self.waves.append(Wave(x, y, start_x, start_y))
-        self.last_wave_pos = (x, y)
-        
+    def set_wave_type(self, wave_type: int) -> bool:
+        """把最近一次手动创建的波改为 wave_type 类型；它已被回收时不做任何事，返回 False"""
+        slot = None if self.wave is None else self.engine.slot_of(self.wave)
+        if slot is None:
+            return False
+        self.engine.type[slot] = wave_type
+        return True
+
     def handle_input(self) -> bool:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -146,13 +96,13 @@ class WaveSimulation:
                     
                 elif event.key == pygame.K_RETURN:
                     if self.last_wave_pos:
-                        self.waves.clear()
-                        for i in range(len(rainbow_colors)):
-                            self.waves.append(Wave(WINDOW_WIDTH//2, WINDOW_HEIGHT//2, *self.last_wave_pos, radius=i*3, color=rainbow_colors[i]))
+                        self.engine.clear()
+                        slot = self.engine.emit(*self.last_wave_pos)
+                        self.wave = self.engine.wave_id(slot)
                 elif event.key == pygame.K_0:
-                    self.wave.type = 0
+                    self.set_wave_type(0)
                 elif event.key == pygame.K_1:
-                    self.wave.type = 1
+                    self.set_wave_type(1)
                         
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 pos = pygame.mouse.get_pos()
@@ -163,35 +113,22 @@ class WaveSimulation:
                     self.border.height
                 )
                 if translated_border.collidepoint(pos):
-                    for i in range(len(rainbow_colors)):
-                        self.waves.append(Wave(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2, pos[0] - WINDOW_WIDTH // 2, pos[1] - WINDOW_HEIGHT // 2, radius=i*3, color=rainbow_colors[i]))
+                    slot = self.engine.emit(pos[0] - WINDOW_WIDTH // 2, pos[1] - WINDOW_HEIGHT // 2)
+                    self.wave = self.engine.wave_id(slot)
                     self.last_wave_pos = (pos[0] - WINDOW_WIDTH // 2, pos[1] - WINDOW_HEIGHT // 2)
         
         return True
         
     def update(self):
-        if len(self.waves) > 0 and not self.paused:
-            for wave in self.waves:
-                wave.update(
-                    self.border.top,
-                    self.border.bottom,
-                    self.border.left,
-                    self.border.right
-                )
-            if len(self.waves) < WaveConfig.WAVE_COUNT and self.waves[-1].radius > WaveConfig.RADIUS_GAP:
-                for i in range(len(rainbow_colors)):
-                    self.waves.append(Wave(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2, *self.last_wave_pos, radius=i*3, color=rainbow_colors[i]))
-            if len(self.waves) >= WaveConfig.WAVE_COUNT and self.waves[0].radius > 1600:
-                if self.waves[0].radius > 2400:
-                    self.waves.pop(0)
-                elif len(self.waves) < WaveConfig.WAVE_COUNT * 2 and self.waves[-1].radius > WaveConfig.RADIUS_GAP:
-                    for i in range(len(rainbow_colors)):
-                        self.waves.append(Wave(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2, *self.last_wave_pos, radius=i*3, color=rainbow_colors[i]))
+        # 所有波在引擎中一次推进和反射，每次补发一整组彩虹波
+        if len(self.engine) > 0 and not self.paused:
+            self.engine.step()
 
             
     def draw(self, screen):
         # 清屏
         screen.fill(BLACK)
+        self.draw_calls = 0
         
         # 绘制边界
         translated_border = pygame.Rect(
@@ -201,16 +138,28 @@ class WaveSimulation:
             self.border.height
         )
         pygame.draw.rect(screen, WHITE, translated_border, 2)
+        self.draw_calls += 1
         
         # 绘制所有波
-        i = 0
-        for wave in self.waves:
-            wave.draw(screen)
-            i += 1
+        for slot, points, closed in self.engine.polylines((WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)):
+            self._draw_wave(screen, points, self.engine.color[slot].tolist(), self.engine.type[slot], closed)
             
+        logger.debug("draw calls: %d", self.draw_calls)
+
         # 绘制状态信息
         self._draw_status(screen)
         
+    def _draw_wave(self, screen, points: np.ndarray, color: Tuple[int, int, int], wave_type: int,
+                   closed: bool = True):
+        # points 已由引擎在复用的缓冲区中平移到窗口坐标
+        if wave_type == 0:
+            pygame.draw.lines(screen, color, closed=closed, points=points, width=3)
+            self.draw_calls += 1
+        elif len(points) >= 7:
+            # 彩虹色线条一次光栅化，颜色按段循环，最后一点连回第一点
+            draw_rainbow_polyline(screen, points, rainbow_colors, width=2, closed=closed)
+            self.draw_calls += 1
+
     def _draw_status(self, screen):
         font = pygame.font.Font(None, 24)
         status_texts = [
@@ -233,8 +182,9 @@ class WaveSimulation:
 
         status_texts = [
             f"Status: {'Paused' if self.paused else 'Running'}",
-            f"Waves: {len(self.waves)}/{WaveConfig.WAVE_COUNT}",
-            f"Radius: {0 if len(self.waves) == 0 else self.waves[0].radius}"
+            f"Waves: {len(self.engine)}/{WaveConfig.WAVE_COUNT}",
+            f"Radius: {0 if len(self.engine) == 0 else int(self.engine.radius[self.engine.oldest])}",
+            f"Draw calls: {self.draw_calls}"
         ]
         x = 300
         y = 10
@@ -0,0 +1,87 @@
+"""球的轨迹：定长环形缓冲区
+
+每个球一个 TrailBuffer，x、y 和时间戳存成三个定长数组。新采样写在尾部，满了覆盖最旧的一个；
+过期的采样只需把 head 往前移。每帧既不新建列表也不复制，各个乒乓球界面共用。
+"""
+import math
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+
+def trail_capacity(duration: float, rate: float, margin: float = 1.25) -> int:
+    """保存 duration 时间内、每秒 rate 次的采样需要的容量；margin 留给帧率抖动"""
+    return max(2, math.ceil(duration * rate * margin))
+
+
+class TrailBuffer:
+    """一个球的轨迹，按时间先后保存 (x, y, t)
+
+    时间单位由调用方决定（pygame 版本用毫秒，arcade 版本用秒），只要 append 和 evict 一致。
+    """
+
+    def __init__(self, capacity: int):
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.t = np.zeros(capacity)
+        self.head = 0  # 最旧采样的位置
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def capacity(self) -> int:
+        return len(self.t)
+
+    def append(self, x: float, y: float, t: float):
+        """在尾部加入一个采样，缓冲区满时覆盖最旧的"""
+        capacity = len(self.t)
+        index = (self.head + self.size) % capacity
+        self.x[index] = x
+        self.y[index] = y
+        self.t[index] = t
+        if self.size < capacity:
+            self.size += 1
+        else:
+            self.head = (self.head + 1) % capacity
+
+    def evict(self, oldest: float):
+        """丢掉时间戳早于 oldest 的采样；采样按时间先后写入，从 head 往后移即可"""
+        capacity = len(self.t)
+        t = self.t
+        while self.size and t[self.head] < oldest:
+            self.head = (self.head + 1) % capacity
+            self.size -= 1
+
+    def clear(self):
+        self.head = 0
+        self.size = 0
+
+    @property
+    def oldest(self) -> float:
+        return self.t[self.head]
+
+    @property
+    def newest(self) -> float:
+        return self.t[(self.head + self.size - 1) % len(self.t)]
+
+    def _segments(self) -> List[slice]:
+        """按时间先后覆盖所有采样的一到两段切片"""
+        end = self.head + self.size
+        capacity = len(self.t)
+        if end <= capacity:
+            return [slice(self.head, end)]
+        return [slice(self.head, capacity), slice(0, end - capacity)]
+
+    def __iter__(self) -> Iterator[Tuple[float, float, float]]:
+        for part in self._segments():
+            yield from zip(self.x[part].tolist(), self.y[part].tolist(), self.t[part].tolist())
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """按时间先后排好的 x、y、t 数组（复制），方便整批计算"""
+        parts = self._segments()
+        if len(parts) == 1:
+            part = parts[0]
+            return self.x[part].copy(), self.y[part].copy(), self.t[part].copy()
+        return tuple(np.concatenate([array[part] for part in parts]) for array in (self.x, self.y, self.t))
@@ -0,0 +1,171 @@
+"""彩虹轨迹的绘制
+
+颜色随存在时间从红色沿色相变化，同时越来越透明，有两种画法：
+
+- 圆点（draw_trails）：每个采样画一个圆点。TrailAtlas 把圆点按色相/透明度分成 steps 级，
+  每种半径预先画成一条横向的贴图集；绘制时只按采样的存在时间算出级别，所有轨迹点合成一次 Surface.blits。
+- 折线（PolylineTrails）：每条轨迹抽稀成几段粗线，颜色分成少数几级，同一级的相邻线段合成一次 draw.lines，
+  绘制调用数与采样数无关。
+"""
+import colorsys
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pygame
+
+from trail_buffer import TrailBuffer
+
+
+def trail_color(progress: float) -> Tuple[int, int, int, int]:
+    """progress 为存在时间占轨迹时长的比例，0 为最新"""
+    rgb = colorsys.hsv_to_rgb(progress, 1, 1)
+    return (int(rgb[0]*255), int(rgb[1]*255), int(rgb[2]*255), int(255 * (1 - progress)))
+
+
+def trail_levels(age: np.ndarray, duration: float, steps: int) -> np.ndarray:
+    """存在时间对应的颜色级别，0 为最新，steps - 1 为已到轨迹时长"""
+    progress = np.clip(age / duration, 0, 1)
+    return np.rint(progress * (steps - 1)).astype(int)
+
+
+class TrailAtlas:
+    """按半径缓存的轨迹圆点贴图集，第 k 级对应 progress = k / (steps - 1)"""
+
+    def __init__(self, steps: int = 64):
+        self.steps = steps
+        self._strips: Dict[int, Tuple[pygame.Surface, List[pygame.Rect]]] = {}
+
+    def strip(self, radius: int) -> Tuple[pygame.Surface, List[pygame.Rect]]:
+        """半径为 radius 的贴图集和每一级在其中的区域，第一次用到时画好"""
+        radius = int(radius)
+        if radius not in self._strips:
+            size = radius * 2
+            surface = pygame.Surface((size * self.steps, size), pygame.SRCALPHA)
+            rects = []
+            for level in range(self.steps):
+                rect = pygame.Rect(level * size, 0, size, size)
+                pygame.draw.circle(surface, trail_color(level / (self.steps - 1)), rect.center, radius)
+                rects.append(rect)
+            self._strips[radius] = (surface, rects)
+        return self._strips[radius]
+
+    def levels(self, age: np.ndarray, duration: float) -> np.ndarray:
+        """每个采样的存在时间对应的级别"""
+        return trail_levels(age, duration, self.steps)
+
+    def stamps(self, trail: TrailBuffer, radius: int, now: float, duration: float) -> List[tuple]:
+        """一条轨迹的 (贴图集, 位置, 区域) 列表，从旧到新，可以直接交给 Surface.blits"""
+        if not len(trail):
+            return []
+        surface, rects = self.strip(radius)
+        x, y, t = trail.arrays()
+        left = (x.astype(int) - int(radius)).tolist()
+        top = (y.astype(int) - int(radius)).tolist()
+        return [(surface, (dx, dy), rects[level])
+                for dx, dy, level in zip(left, top, self.levels(now - t, duration).tolist())]
+
+
+def draw_trails(screen: pygame.Surface, atlas: TrailAtlas, trails: Iterable[TrailBuffer], radius: int,
+                now: float, duration: float) -> int:
+    """把所有轨迹合成一次 blits 画到 screen，返回画出的圆点数"""
+    stamps = []
+    for trail in trails:
+        stamps.extend(atlas.stamps(trail, radius, now, duration))
+    if stamps:
+        screen.blits(stamps, doreturn=False)
+    return len(stamps)
+
+
+class PolylineTrails:
+    """把每条轨迹抽稀成至多 segments 段粗线，每段的颜色和透明度取中点的存在时间
+
+    颜色只分 steps 级（比圆点粗），一条轨迹里同一级的相邻线段连成一条折线，用一次 pygame.draw.lines 画出，
+    每条轨迹的绘制调用不超过 min(segments, steps) 次。
+    pygame 画线不与屏幕混合透明度，所以线段先画在一块带 alpha 的图层上，再叠到屏幕；
+    图层只清空、叠加所有线段的外接矩形。segments 越大越接近圆点的效果；
+    round_joints 在每个折点补一个圆，转弯处不留缺口，但每段多一次绘制调用，默认不画。
+    相邻的圆点互相重叠，看上去比单个圆点更不透明；折线每处只画一层，alpha 取 overlap 个圆点叠加后的值。
+    """
+
+    def __init__(self, segments: int = 16, steps: int = 8, width: int = None,
+                 round_joints: bool = False, overlap: float = 4):
+        self.segments = segments
+        self.steps = steps
+        self.width = width  # 线宽，默认为球的直径
+        self.round_joints = round_joints
+        self.palette = []
+        for level in range(steps):
+            r, g, b, alpha = trail_color(level / (steps - 1))
+            self.palette.append((r, g, b, int(255 * (1 - (1 - alpha / 255) ** overlap))))
+        self.layer: pygame.Surface = None
+        self._keep: Dict[int, np.ndarray] = {}  # 采样数 -> 抽稀后保留的序号
+
+    def decimate(self, trail: TrailBuffer) -> np.ndarray:
+        """按采样序号均匀取至多 segments + 1 个点（保留首尾），返回它们在环形缓冲区里的位置"""
+        count = len(trail)
+        keep = self._keep.get(count)
+        if keep is None:
+            keep = np.arange(count)
+            if count > self.segments + 1:
+                keep = np.rint(np.linspace(0, count - 1, self.segments + 1)).astype(int)
+            self._keep[count] = keep
+        return (trail.head + keep) % trail.capacity
+
+    def _layer(self, size: Tuple[int, int]) -> pygame.Surface:
+        if self.layer is None or self.layer.get_size() != size:
+            self.layer = pygame.Surface(size, pygame.SRCALPHA)
+            self.layer.fill((0, 0, 0, 0))
+        return self.layer
+
+    def draw(self, screen: pygame.Surface, trails: Iterable[TrailBuffer], radius: int,
+             now: float, duration: float) -> int:
+        """画出所有轨迹，返回绘制调用数"""
+        width = self.width or int(radius) * 2
+        xs, ys, ts, counts = [], [], [], []
+        for trail in trails:
+            if len(trail) < 2:
+                continue
+            index = self.decimate(trail)
+            xs.append(trail.x[index])
+            ys.append(trail.y[index])
+            ts.append(trail.t[index])
+            counts.append(len(index))
+        if not xs:
+            return 0
+        # 所有轨迹的点连在一起整批计算，每条轨迹的最后一点不作为线段起点
+        x = np.concatenate(xs).astype(int)
+        y = np.concatenate(ys).astype(int)
+        t = np.concatenate(ts)
+        starts = np.ones(len(t), dtype=bool)
+        starts[np.cumsum(counts) - 1] = False
+        starts = np.flatnonzero(starts)
+        levels = trail_levels(now - (t[starts] + t[starts + 1]) / 2, duration, self.steps)
+        # 颜色级别变化或换了一条轨迹（起点不连续）时开始新的一组，每组的点是 points[first:last + 2]
+        breaks = np.ones(len(starts), dtype=bool)
+        breaks[1:] = (levels[1:] != levels[:-1]) | (starts[1:] != starts[:-1] + 1)
+        firsts = np.flatnonzero(breaks)
+        lasts = starts[np.append(firsts[1:], len(starts)) - 1]
+        firsts = starts[firsts]
+        levels = levels[breaks]
+
+        low = (int(x.min()) - width, int(y.min()) - width)
+        size = (int(x.max()) + width - low[0], int(y.max()) + width - low[1])
+        area = pygame.Rect(low, size).clip(screen.get_rect())
+        if not (area.width and area.height):
+            return 0
+        layer = self._layer(screen.get_size())
+        palette = self.palette
+        points = list(zip(x.tolist(), y.tolist()))
+        joint = width // 2
+        draws = len(levels)
+        for level, first, last in zip(levels.tolist(), firsts.tolist(), lasts.tolist()):
+            color = palette[level]
+            pygame.draw.lines(layer, color, False, points[first:last + 2], width)
+            if self.round_joints:
+                for point in points[first + 1:last + 2]:
+                    pygame.draw.circle(layer, color, point, joint)
+                draws += last + 1 - first
+        screen.blit(layer, area.topleft, area)
+        # 用完清空，下一帧的图层仍是全透明
+        layer.fill((0, 0, 0, 0), area)
+        return draws
@@ -0,0 +1,101 @@
+"""按脏矩形合成窗口画面
+
+每帧只重画变化了的区域，只把这些矩形交给 pygame.display.update，而不是整窗 flip。
+文字按位置缓存渲染结果，内容不变时直接复用，不再每帧调用 font.render；
+边界、墙这类很少变化的图形画在带透明色的静态层上，按键缓存。
+"""
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import pygame
+
+Color = Tuple[int, int, int]
+
+
+class TextLayer:
+    """按名字缓存已渲染的文字，内容变化时才重新渲染"""
+
+    def __init__(self, font: pygame.font.Font, color: Color):
+        self.font = font
+        self.color = color
+        self._items: Dict[Hashable, Tuple[str, pygame.Surface, pygame.Rect]] = {}
+
+    def set(self, name: Hashable, text: str, pos: Tuple[int, int]) -> Optional[pygame.Rect]:
+        """设置 name 处的文字，有变化时返回需要重画的区域（旧文字和新文字的并集）"""
+        old = self._items.get(name)
+        if old is not None and old[0] == text and old[2].topleft == pos:
+            return None
+        surface = self.font.render(text, True, self.color)
+        rect = surface.get_rect(topleft=pos)
+        self._items[name] = (text, surface, rect)
+        return rect if old is None else rect.union(old[2])
+
+    def blit(self, screen: pygame.Surface, area: Optional[pygame.Rect] = None) -> int:
+        """把与 area 相交（不给出时为全部）的文字画到 screen，返回绘制调用数"""
+        calls = 0
+        for _, surface, rect in self._items.values():
+            if area is None or rect.colliderect(area):
+                screen.blit(surface, rect)
+                calls += 1
+        return calls
+
+    def clear(self):
+        self._items.clear()
+
+
+class StaticLayer:
+    """很少变化的图形，按 key 缓存在一块透明色的 Surface 上，key 不变时只做一次 blit"""
+
+    def __init__(self, size: Tuple[int, int], colorkey: Color = (255, 0, 255)):
+        self.surface = pygame.Surface(size)
+        self.colorkey = colorkey
+        self.surface.set_colorkey(colorkey)
+        self.key: Hashable = None
+
+    def update(self, key: Hashable, paint: Callable[[pygame.Surface], None]) -> bool:
+        """key 变化时清空并调用 paint 重画，返回是否重画了"""
+        if key == self.key:
+            return False
+        self.surface.fill(self.colorkey)
+        paint(self.surface)
+        self.key = key
+        return True
+
+    def blit(self, screen: pygame.Surface, area: Optional[pygame.Rect] = None) -> int:
+        if area is None:
+            screen.blit(self.surface, (0, 0))
+        else:
+            screen.blit(self.surface, area.topleft, area)
+        return 1
+
+
+class DirtyRects:
+    """一帧内累积的脏矩形，present 时只更新这些区域"""
+
+    def __init__(self, size: Tuple[int, int]):
+        self.screen_rect = pygame.Rect((0, 0), size)
+        self.rects: List[pygame.Rect] = []
+        self.full = True  # 第一帧和窗口内容整体失效时整窗更新
+        self.updated_area = 0  # 最近一次 present 更新的像素数
+
+    def mark(self, rect: pygame.Rect):
+        rect = rect.clip(self.screen_rect)
+        if rect.width and rect.height:
+            self.rects.append(rect)
+
+    def invalidate(self):
+        self.full = True
+
+    def present(self) -> int:
+        """把脏矩形推到显示器，返回更新的矩形数"""
+        if self.full:
+            pygame.display.flip()
+            count = 1
+            self.updated_area = self.screen_rect.width * self.screen_rect.height
+        else:
+            count = len(self.rects)
+            if count:
+                pygame.display.update(self.rects)
+            self.updated_area = sum(rect.width * rect.height for rect in self.rects)
+        self.rects = []
+        self.full = False
+        return count
@@ -0,0 +1,53 @@
+"""simple_wave_reflection.py 的画面尺寸、颜色和波的参数
+
+不依赖 pygame，无窗口的导出（wave_export.py）和交互程序共用同一份设置。
+"""
+from dataclasses import dataclass
+
+# 窗口和边界框的大小（像素）
+WINDOW_WIDTH = 900
+WINDOW_HEIGHT = 900
+WIDTH = 800
+HEIGHT = 800
+
+# 颜色定义
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+GRAY = (128, 128, 128)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+RED = (255, 0, 0)
+
+# 彩虹色
+RAINBOW_COLORS = [
+    (255, 0, 0),    # 红
+    (255, 127, 0),  # 橙
+    (255, 255, 0),  # 黄
+    (0, 255, 0),    # 绿
+    (0, 0, 255),    # 蓝
+    (75, 0, 130),   # 靛
+    (143, 0, 255)   # 紫
+]
+
+
+@dataclass
+class WaveConfig:
+    WAVE_COUNT = 10      # 每次点击产生的波数
+    RADIUS_GAP = 40     # 波之间的半径间隔
+    WAVE_SPEED = 1      # 波的扩散速度（每个模拟步）
+    SIM_RATE = 240      # 每秒模拟步数，与渲染帧率无关
+    MAX_CATCH_UP = 8    # 渲染跟不上时每帧最多补走的模拟步数
+    ANGLE_STEP = 1      # 角度步进（越小越平滑）
+    ANGLE_QUANTUM = 32  # 采样点数的取整粒度，越大三角函数表复用越多
+    WAVE_TOLERANCE = 0.5  # 自适应采样允许的像素误差，0 表示按半径固定采样
+    PIXEL_RENDERER = False  # True 时把所有波光栅化进 numpy 帧缓冲，每帧只 blit 一次
+    SEEK_STEP = 10      # [ / ] 每次在时间轴上前后跳的帧数
+    FRAME_CACHE_SIZE = 32  # 暂停拖动时间轴时缓存的已渲染帧数
+    FIELD_MODE = False  # True 时用镜像法计算波幅场并画成热力图，代替波前线条
+    FIELD_ORDERS = 2    # 镜像源的最大反射次数，越大越精确也越慢
+    FIELD_RESOLUTION = 4  # 波幅场网格的像素边长，越小越精细也越慢
+    ROOM = 0            # ROOMS 中的初始房间，P 键切换
+    EMITTER_RADIUS = 400  # 多波源模式下每个波传播到此半径后回收
+    EMITTER_BATCH = 100   # N 键一次随机添加的波源数
+    MAX_ZOOM = 16       # 鼠标滚轮最大放大倍数
+    DEDUP_SEGMENTS = False  # True 时绘制前在像素空间去掉重复线段和重合的点，D 键切换
@@ -0,0 +1,887 @@
+"""波反射模拟的计算核心
+
+所有存活波的半径、波源、速度、类型和颜色保存在连续的 numpy 数组中，
+每帧一次向量化地推进和反射全部的波。本模块不依赖 pygame，可在无窗口环境下使用。
+安装了 numba 时用多核并行内核（wave_kernels）计算反射，否则退回 numpy 实现。
+numba 导入和编译较慢，只在第一次用到时加载，也可以用 warm_up_kernels_async() 提前在后台加载。
+"""
+import copy
+import threading
+from collections import OrderedDict
+from typing import Iterator, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+Color = Tuple[int, int, int]
+
+ANGLE_CACHE_SIZE = 256  # 三角函数表缓存的初始条目数，所有波共用；WaveEngine 按 angle_quantum 需要时扩大
+# 缓存条目数的上限。每条最多 retire_radius 个点（16 字节一个），上限时约 40 MB；
+# 需要的条目数超过上限时（默认 retire_radius 下 angle_quantum < 4）缓存只保留最近用到的点数，
+# 半径相差很大的波轮流用表会不断重算
+ANGLE_CACHE_LIMIT = 1024
+MIN_ADAPTIVE_POINTS = 32  # 自适应采样时每个波至少的采样点数
+
+# numba 内核模块：None 为尚未加载，False 为不可用（未安装 numba）
+_kernels = None
+_kernel_lock = threading.Lock()
+_warming = threading.Event()
+
+
+def load_kernels(wait: bool = True):
+    """返回已编译好的 numba 内核模块，未安装 numba 时返回 None
+
+    第一次调用时导入并预热所有内核。后台预热进行中且 wait 为 False 时立即返回 None，
+    调用方先用 numpy 实现，不会卡住当前帧。
+    """
+    global _kernels
+    if _kernels is None:
+        if not wait and _warming.is_set():
+            return None
+        with _kernel_lock:
+            if _kernels is None:
+                try:
+                    import wave_kernels
+                    wave_kernels.warm_up()
+                    _kernels = wave_kernels
+                except ImportError:
+                    _kernels = False
+    return _kernels or None
+
+
+def warm_up_kernels_async() -> threading.Thread:
+    """在后台线程导入 numba 并编译（或从缓存加载）所有内核"""
+    _warming.set()
+
+    def run():
+        try:
+            load_kernels()
+        finally:
+            _warming.clear()
+
+    thread = threading.Thread(target=run, name="numba-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def kernel_state() -> str:
+    """'warming'：后台正在加载；'numba'：内核可用；'numpy'：未安装 numba 或尚未加载"""
+    if _warming.is_set():
+        return "warming"
+    return "numba" if _kernels else "numpy"
+
+
+def reflect_fold(coords: np.ndarray, min_bound: float, max_bound: float) -> np.ndarray:
+    """镜像折叠反射的数组版本：把直线传播的坐标折回 [min_bound, max_bound] 区间"""
+    total_range = max_bound - min_bound
+    relative_pos = coords - min_bound
+    n = np.floor_divide(relative_pos, total_range)
+    remainder = np.mod(relative_pos, total_range)
+    odd = (n.astype(np.int64) & 1) == 1
+    return np.where(odd, max_bound - remainder, min_bound + remainder)
+
+
+def _place_waves_numpy(bank, shift, wave_index, sources, radii, bounds, fold, out):
+    """把单位圆采样缩放、平移到各自的波，fold 为 True 时同时折叠进边界，结果写入 out
+
+    第 i 个点属于第 wave_index[i] 个波，它的单位圆采样为 bank[i + shift[wave_index[i]]]。
+    """
+    unit = bank[np.arange(len(out)) + shift[wave_index]]
+    np.multiply(radii[wave_index, None], unit, out=out)
+    out += sources[wave_index]
+    if fold:
+        _fold_numpy(out, bounds)
+
+
+def _fold_numpy(points, bounds):
+    left, top, right, bottom = bounds
+    points[:, 0] = reflect_fold(points[:, 0], left, right)
+    points[:, 1] = reflect_fold(points[:, 1], top, bottom)
+
+
+def _angle_table(num_points: int, whole_radians: bool = False) -> np.ndarray:
+    """只读的 (num_points, 2) 单位圆 (cos, sin) 表
+
+    默认把圆周等分为 num_points 份；whole_radians 为 True 时直接以 0, 1, 2... 作为弧度。
+    """
+    if whole_radians:
+        angles = np.arange(num_points, dtype=float)
+    else:
+        angles = np.radians(np.arange(0, 360, 1 / (num_points / 360)))
+    table = np.column_stack((np.cos(angles), np.sin(angles)))
+    table.flags.writeable = False
+    return table
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class AngleTableCache:
+    """按 (点数, 类型) 缓存三角函数表，最久未用的先淘汰；容量可以原地扩大，已缓存的表保留"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._tables: "OrderedDict[Tuple[int, bool], np.ndarray]" = OrderedDict()
+
+    def get(self, num_points: int, whole_radians: bool = False) -> np.ndarray:
+        key = (num_points, whole_radians)
+        table = self._tables.get(key)
+        if table is not None:
+            self.hits += 1
+            self._tables.move_to_end(key)
+            return table
+        self.misses += 1
+        table = self._tables[key] = _angle_table(num_points, whole_radians)
+        if len(self._tables) > self.maxsize:
+            self._tables.popitem(last=False)
+        return table
+
+    def reserve(self, entries: int):
+        """把容量扩大到至少 entries 张表（不超过 ANGLE_CACHE_LIMIT，不缩小）"""
+        self.maxsize = max(self.maxsize, min(entries, ANGLE_CACHE_LIMIT))
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._tables))
+
+
+# 所有引擎共用的一个缓存；各引擎按自己的 angle_quantum 原地扩大它
+angle_cache = AngleTableCache(ANGLE_CACHE_SIZE)
+
+
+def angle_table(num_points: int, whole_radians: bool = False) -> np.ndarray:
+    """从共用缓存中取出（或算出）的单位圆表，见 _angle_table"""
+    return angle_cache.get(num_points, whole_radians)
+
+
+def angle_cache_entries(max_radius: float, angle_quantum: int) -> int:
+    """半径不超过 max_radius 的波按 angle_quantum 取整后可能用到的表数，两种类型各一份"""
+    return 2 * (max(0, int(np.ceil(max_radius)) - 360) // angle_quantum + 1)
+
+
+def angle_cache_info() -> CacheInfo:
+    """三角函数表缓存的命中/未命中统计"""
+    return angle_cache.info()
+
+
+def adaptive_point_count(radius, tolerance: float, fold_size: float):
+    """弦高误差不超过 tolerance 像素所需的圆周等分数；radius 可以是数组，半径须为正
+
+    同时保证相邻采样点的弦长小于边界尺寸 fold_size，使每段弦在每个方向上最多跨过一面墙。
+    """
+    sagitta_points = np.pi / np.arccos(np.maximum(-1.0, 1 - tolerance / radius))
+    fold_points = np.pi / np.arcsin(np.minimum(1.0, fold_size / (2 * radius))) + 1
+    return np.maximum(MIN_ADAPTIVE_POINTS, np.ceil(np.maximum(sagitta_points, fold_points)).astype(np.intp))
+
+
+def _ring_neighbors(offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """首尾相接的多段闭合折线中，每个点的前一个和后一个点的索引"""
+    total = offsets[-1]
+    starts, ends = offsets[:-1], offsets[1:]
+    nonempty = ends > starts
+    prev = np.arange(-1, total - 1)
+    nxt = np.arange(1, total + 1)
+    prev[starts[nonempty]] = ends[nonempty] - 1
+    nxt[ends[nonempty] - 1] = starts[nonempty]
+    return prev, nxt
+
+
+def insert_fold_vertices(points: np.ndarray, offsets: np.ndarray,
+                         bounds: Tuple[float, float, float, float],
+                         mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """在折叠前的闭合折线上插入与墙的交点
+
+    稀疏采样时，一段弦若跨过墙，折叠后两端点的连线会切掉墙角；
+    插入交点后折叠，墙上恰好有一个顶点。mask 为 False 的点所在的弦不处理。
+    要求每段弦在每个方向上最多跨过一面墙。
+    """
+    left, top, right, bottom = bounds
+    origin = np.array((left, top))
+    size = np.array((right - left, bottom - top))
+    _, nxt = _ring_neighbors(offsets)
+
+    delta = points[nxt] - points
+    cell = np.floor_divide(points - origin, size)
+    next_cell = cell[nxt]
+    crossing = cell != next_cell
+    if mask is not None:
+        crossing &= mask[:, None]
+    wall = origin + np.maximum(cell, next_cell) * size
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(crossing, (wall - points) / delta, np.inf)
+    t.sort(axis=1)
+    extra = np.isfinite(t).sum(axis=1)
+    if not extra.any():
+        return points, offsets
+
+    shift = np.zeros(len(points) + 1, dtype=np.intp)
+    np.cumsum(extra, out=shift[1:])
+    dst = np.arange(len(points)) + shift[:-1]
+    out = np.empty((len(points) + shift[-1], 2))
+    out[dst] = points
+    for k in range(2):
+        has = extra > k
+        out[dst[has] + k + 1] = points[has] + t[has, k, None] * delta[has]
+    return out, offsets + shift[offsets]
+
+
+def simplify_polylines(points: np.ndarray, offsets: np.ndarray, tolerance: float,
+                       mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """去掉闭合折线上近似共线或与前一点距离不足 tolerance 像素的点
+
+    连续的可删点只隔一个删一个，保证删除后的误差不超过 tolerance。每条折线的首点总是保留。
+    """
+    if len(points) == 0:
+        return points, offsets
+    prev, nxt = _ring_neighbors(offsets)
+    to_prev = points - points[prev]
+    chord = points[nxt] - points[prev]
+    step = np.hypot(to_prev[:, 0], to_prev[:, 1])
+    # 到前后两点连线段（不是直线）的距离，折返处的尖点不会被当作共线
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip(np.einsum('ij,ij->i', to_prev, chord) / np.einsum('ij,ij->i', chord, chord), 0, 1)
+    off_chord = to_prev - np.nan_to_num(t)[:, None] * chord
+    distance = np.hypot(off_chord[:, 0], off_chord[:, 1])
+    candidate = (step < tolerance) | (distance < tolerance)
+    candidate[offsets[:-1][offsets[:-1] < offsets[1:]]] = False
+    if mask is not None:
+        candidate &= mask
+    if not candidate.any():
+        return points, offsets
+
+    # 每段连续可删点中的位置，偶数位置删除
+    index = np.arange(len(points))
+    run_start = np.where(candidate & ~np.roll(candidate, 1), index, 0)
+    np.maximum.accumulate(run_start, out=run_start)
+    keep = ~(candidate & ((index - run_start) % 2 == 0))
+
+    kept_before = np.zeros(len(points) + 1, dtype=np.intp)
+    np.cumsum(keep, out=kept_before[1:])
+    return points[keep], kept_before[offsets]
+
+
+def split_wavefronts(points: np.ndarray, offsets: np.ndarray, spacing: np.ndarray,
+                     mask: np.ndarray, break_factor: float = 4) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """在相邻采样点的距离远大于采样弧长处把闭合波前断开
+
+    多边形房间里，墙角两侧的射线反射次序不同，波前在那里不连续，首尾相连会画出横穿房间的弦。
+    spacing 为每个波相邻采样点的弧长，mask 为参与断开的波。
+    返回 (重排后的点, 各段的 offsets, 各段所属的波, 各段是否闭合)，未断开的波仍是一个闭合段。
+    """
+    _, nxt = _ring_neighbors(offsets)
+    counts = np.diff(offsets)
+    wave_of_point = np.repeat(np.arange(len(counts)), counts)
+    gap = np.hypot(*(points[nxt] - points).T)
+    broken = (gap > break_factor * spacing[wave_of_point] + 1) & mask[wave_of_point]
+
+    order, piece_offsets, piece_wave, closed = [], [0], [], []
+    for i, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+        if end == start:
+            continue
+        breaks = np.flatnonzero(broken[start:end])
+        if len(breaks) == 0:
+            order.append(np.arange(start, end))
+            piece_offsets.append(piece_offsets[-1] + end - start)
+            piece_wave.append(i)
+            closed.append(True)
+            continue
+        # 从第一个断点之后开始绕一圈，在其余断点处切开
+        n = end - start
+        ring = start + (np.arange(n) + breaks[0] + 1) % n
+        order.append(ring)
+        for length in np.diff(np.append(breaks - breaks[0], n)):
+            piece_offsets.append(piece_offsets[-1] + length)
+            piece_wave.append(i)
+            closed.append(False)
+    order = np.concatenate(order) if order else np.empty(0, dtype=np.intp)
+    return (points[order], np.array(piece_offsets, dtype=np.intp),
+            np.array(piece_wave, dtype=np.intp), np.array(closed, dtype=bool))
+
+
+def _reserve(buffer: np.ndarray, rows: int) -> np.ndarray:
+    """需要时按倍数扩容，返回至少有 rows 行的缓冲区；已够大时原样返回"""
+    if len(buffer) >= rows:
+        return buffer
+    return np.empty((max(rows, 2 * len(buffer)),) + buffer.shape[1:], dtype=buffer.dtype)
+
+
+def mirror_coords(coord: float, min_bound: float, max_bound: float, orders: int) -> np.ndarray:
+    """reflect_fold 的逆：一维上折叠后落在 coord 的所有像，第 i 个像经过 |i| 次反射
+
+    返回 i = -orders..orders 对应的坐标。
+    """
+    total_range = max_bound - min_bound
+    relative_pos = coord - min_bound
+    i = np.arange(-orders, orders + 1)
+    return np.where(i % 2 == 0, min_bound + i * total_range + relative_pos,
+                    min_bound + (i + 1) * total_range - relative_pos)
+
+
+def image_sources(source: Tuple[float, float], bounds: Tuple[float, float, float, float],
+                  orders: int) -> np.ndarray:
+    """镜像法：波源关于四面墙的所有像，反射次数（两个方向之和）不超过 orders，形状 (N, 2)"""
+    left, top, right, bottom = bounds
+    xs = mirror_coords(source[0], left, right, orders)
+    ys = mirror_coords(source[1], top, bottom, orders)
+    i, j = np.meshgrid(np.arange(-orders, orders + 1), np.arange(-orders, orders + 1), indexing="ij")
+    within = np.abs(i) + np.abs(j) <= orders
+    return np.column_stack((xs[i[within] + orders], ys[j[within] + orders]))
+
+
+class WaveEngine:
+    """结构化数组（SoA）形式的多波引擎
+
+    波按环形队列存放在固定容量的槽位中，最旧的波在队首。
+    产生和回收波只移动队首/队尾索引，不做列表的插入和删除。
+    采样点和平移用的缓冲区都在各帧之间复用，只在点数超出时扩容；单位圆表从共用缓存中取，不复制到每个波。
+
+    默认是单波源模式：从 last_source 连续发出一串波。用 add_emitter() 添加独立波源后
+    进入多波源模式，每个波源各自按 radius_gap 的间隔发波，波长到 emitter_radius 时回收。
+    """
+
+    def __init__(self, bounds: Tuple[float, float, float, float], capacity: int,
+                 wave_count: int, radius_gap: float, speed: float = 1,
+                 palette: Sequence[Color] = ((0, 0, 255), (0, 255, 0), (255, 0, 0)),
+                 burst: Sequence[Tuple[float, Optional[Color]]] = ((0, None),),
+                 fade_radius: float = 1600, retire_radius: float = 2400,
+                 angle_quantum: int = 32, tolerance: float = 0, use_numba: bool = True,
+                 room=None, emitter_radius: float = 400, grow: bool = False):
+        # bounds: (left, top, right, bottom)
+        self.left, self.top, self.right, self.bottom = bounds
+        self.bounds = np.array(bounds, dtype=float)
+        self.capacity = capacity
+        # 槽位用满时：grow 为 True 则容量翻倍，否则回收最旧的波（它会从画面上消失）
+        self.grow = grow
+        self.wave_count = wave_count
+        self.radius_gap = radius_gap
+        self.wave_speed = speed
+        self.palette = list(palette)
+        # 每次发射产生的一组波：(初始半径, 颜色)，颜色为 None 时轮流使用调色板
+        self.burst = list(burst)
+        self.fade_radius = fade_radius
+        self.retire_radius = retire_radius
+        # 采样点数按此粒度向上取整，使不同半径的波能共用同一张三角函数表；
+        # 粒度越小需要的表越多，缓存按此扩大，见 ANGLE_CACHE_LIMIT
+        self.angle_quantum = angle_quantum
+        angle_cache.reserve(angle_cache_entries(retire_radius + abs(speed), angle_quantum))
+        # 自适应采样允许的像素误差，0 表示按 max(360, r) 固定采样
+        self.tolerance = tolerance
+        # 是否使用 numba 内核；内核在第一次反射时才加载
+        self.use_numba = use_numba
+        # 多边形房间（wave_room.PolygonRoom），为 None 时按 bounds 矩形折叠反射
+        self.room = room
+        # 多波源模式：各波源的位置和最新一个波的半径
+        self.emitter_radius = emitter_radius
+        self.emitter_source = np.empty((0, 2))
+        self.emitter_age = np.empty(0)
+
+        self.radius = np.zeros(capacity)
+        self.source = np.zeros((capacity, 2))
+        self.speed = np.zeros(capacity)
+        self.type = np.zeros(capacity, dtype=np.int8)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.emitter = np.full(capacity, -1, dtype=np.intp)  # 所属的独立波源，-1 为单波源模式的波
+        self.head = 0
+        self.count = 0
+        # 累计产生/回收（含 clear 清掉）的波数，时间轴据此识别每一帧的事件；
+        # 存活的波总是最后产生的 count 个，按产生顺序编号为 spawned - count 到 spawned - 1，见 wave_id
+        self.spawned = 0
+        self.retired = 0
+        self._palette_index = 0
+        self.last_source: Optional[Tuple[float, float]] = None
+
+        # 最近一次反射的结果：所有波的点首尾相接，offsets[i]:offsets[i+1] 为第 i 个波
+        self.points = np.empty((0, 2))
+        self.offsets = np.zeros(1, dtype=np.intp)
+        self.reflected_slots = np.empty(0, dtype=np.intp)
+        # 每段折线是否首尾相接；多边形房间中不连续的波前会断成多段不闭合的折线，
+        # 这时 reflected_slots 中同一个槽位出现多次
+        self.closed = np.empty(0, dtype=bool)
+        # 最近一次反射中剔除前的点数，含自适应采样在墙上插入的顶点，与绘制的点数在同一阶段统计；
+        # 剔除掉的波不计算采样点
+        self.emitted_points = 0
+        # 所有波共用的缓冲区，只在点数超出时扩容
+        self._buffer = np.empty((0, 2))
+        self._wave_index = np.empty(0, dtype=np.intp)
+        self._offsets = np.zeros(capacity + 1, dtype=np.intp)
+        self._translated = np.empty((0, 2))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def oldest(self) -> Optional[int]:
+        return self.head if self.count else None
+
+    @property
+    def newest(self) -> Optional[int]:
+        return (self.head + self.count - 1) % self.capacity if self.count else None
+
+    def wave_id(self, slot: int) -> int:
+        """槽位上存活的波的编号；编号按产生顺序递增，不随槽位复用、扩容或时间轴跳转改变"""
+        return int(self.spawned - self.count + (slot - self.head) % self.capacity)
+
+    def slot_of(self, wave_id: int) -> Optional[int]:
+        """编号为 wave_id 的波现在的槽位，已回收（或跳到它产生之前）时为 None"""
+        index = wave_id - (self.spawned - self.count)
+        if 0 <= index < self.count:
+            return (self.head + index) % self.capacity
+        return None
+
+    def live_slots(self) -> np.ndarray:
+        """按从旧到新的顺序返回存活波的槽位"""
+        return (self.head + np.arange(self.count)) % self.capacity
+
+    def spawn(self, x: float, y: float, radius: float = 0, color: Optional[Color] = None,
+              wave_type: int = 0, emitter: int = -1) -> int:
+        """在队尾占用一个槽位；容量已满时扩容（grow）或先回收最旧的波"""
+        if self.count == self.capacity:
+            if self.grow:
+                self.reserve(2 * self.capacity)
+            else:
+                self.retire_oldest()
+        slot = (self.head + self.count) % self.capacity
+        if color is None:
+            color = self.palette[self._palette_index]
+            self._palette_index = (self._palette_index + 1) % len(self.palette)
+        self.radius[slot] = radius
+        self.source[slot] = (x, y)
+        self.speed[slot] = self.wave_speed
+        self.type[slot] = wave_type
+        self.color[slot] = color
+        self.emitter[slot] = emitter
+        self.count += 1
+        self.spawned += 1
+        return slot
+
+    def spawn_batch(self, sources: np.ndarray, colors: np.ndarray, emitters: np.ndarray,
+                    radius: float = 0, wave_type: int = 0) -> np.ndarray:
+        """按顺序一次产生多个波，结果与逐个 spawn 相同，返回它们的槽位"""
+        n = len(sources)
+        if self.count + n > self.capacity:
+            if self.grow:
+                self.reserve(max(self.count + n, 2 * self.capacity))
+            else:
+                # 一次回收最旧的若干个波，同 retire_oldest
+                dropped = min(self.count + n - self.capacity, self.count)
+                self.head = (self.head + dropped) % self.capacity
+                self.count -= dropped
+                self.retired += dropped
+        if n > self.capacity:
+            # 不扩容时最先产生的波会被后面的挤掉，只留下最后 capacity 个
+            self.spawned += n - self.capacity
+            self.retired += n - self.capacity
+            sources, colors, emitters = sources[-self.capacity:], colors[-self.capacity:], emitters[-self.capacity:]
+            n = self.capacity
+        slots = (self.head + self.count + np.arange(n)) % self.capacity
+        self.radius[slots] = radius
+        self.source[slots] = sources
+        self.speed[slots] = self.wave_speed
+        self.type[slots] = wave_type
+        self.color[slots] = colors
+        self.emitter[slots] = emitters
+        self.count += n
+        self.spawned += n
+        return slots
+
+    def retire_oldest(self):
+        if self.count:
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+            self.retired += 1
+
+    def reserve(self, capacity: int):
+        """把槽位容量扩大到至少 capacity，存活的波按从旧到新移到数组开头"""
+        if capacity <= self.capacity:
+            return
+        live = self.live_slots()
+        for name in ("radius", "source", "speed", "type", "color", "emitter"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[live]
+            setattr(self, name, new)
+        self.emitter[self.count:] = -1
+        self.head = 0
+        self.capacity = capacity
+        self._offsets = np.zeros(capacity + 1, dtype=np.intp)
+        self.reflected_slots = np.empty(0, dtype=np.intp)
+
+    def add_emitter(self, x: float, y: float) -> int:
+        """添加一个独立波源并立即发出第一个波，返回波源序号"""
+        emitter = len(self.emitter_age)
+        self.emitter_source = np.vstack((self.emitter_source, (x, y)))
+        self.emitter_age = np.append(self.emitter_age, 0.0)
+        # 每个波源同时存活的波不超过 emitter_radius / radius_gap + 2 个
+        needed = len(self.emitter_age) * (int(np.ceil(self.emitter_radius / self.radius_gap)) + 2)
+        if needed > self.capacity:
+            self.reserve(max(needed, 2 * self.capacity))
+        self.spawn(x, y, color=self.palette[emitter % len(self.palette)], emitter=emitter)
+        return emitter
+
+    def clear(self):
+        self.retired += self.count
+        self.head = 0
+        self.count = 0
+        self.emitter_source = np.empty((0, 2))
+        self.emitter_age = np.empty(0)
+        self.points = np.empty((0, 2))
+        self.offsets = np.zeros(1, dtype=np.intp)
+        self.reflected_slots = np.empty(0, dtype=np.intp)
+        self.closed = np.empty(0, dtype=bool)
+
+    def emit(self, x: float, y: float) -> int:
+        """从 (x, y) 发射一组波，返回最后一个波的槽位"""
+        self.last_source = (x, y)
+        slot = -1
+        for radius, color in self.burst:
+            slot = self.spawn(x, y, radius=radius, color=color)
+        return slot
+
+    def step(self, reflect: bool = True):
+        """推进所有波一帧，按半径规则产生/回收波，然后统一计算反射
+
+        reflect 为 False 时只推进半径和队列，不计算采样点，用于快进。
+        """
+        if len(self.emitter_age):
+            self._step_emitters()
+        else:
+            if self.count == 0:
+                return
+            live = self.live_slots()
+            self.radius[live] += self.speed[live]
+
+            if self.count < self.wave_count and self.radius[self.newest] > self.radius_gap:
+                self.emit(*self.last_source)
+            if self.count >= self.wave_count and self.radius[self.oldest] > self.fade_radius:
+                if self.radius[self.oldest] > self.retire_radius:
+                    self.retire_oldest()
+                # 上面可能刚发射过，重新读最新一个波的半径，一步最多发射一次
+                elif self.count < self.wave_count * 2 and self.radius[self.newest] > self.radius_gap:
+                    self.emit(*self.last_source)
+
+        if reflect:
+            self.reflect()
+
+    def _step_emitters(self):
+        """多波源模式：最新的波超过 radius_gap 的波源补发一个波，超过 emitter_radius 的波回收"""
+        live = self.live_slots()
+        self.radius[live] += self.speed[live]
+        self.emitter_age += self.wave_speed
+        due = self.emitter_age > self.radius_gap
+        if due.any():
+            emitters = np.flatnonzero(due)
+            palette = np.array(self.palette, dtype=np.uint8)
+            self.spawn_batch(self.emitter_source[emitters], palette[emitters % len(palette)], emitters)
+            self.emitter_age[due] = 0
+        # 所有波速度相同，队首的波半径最大，按队列顺序回收即可
+        while self.count and self.radius[self.head] > self.emitter_radius:
+            self.retire_oldest()
+
+    def advance(self, frames: int):
+        """不计算反射地快进若干帧；波的状态只取决于帧数，快进后与逐帧 step 完全相同"""
+        for _ in range(frames):
+            self.step(reflect=False)
+
+    def _select_tables(self, radius: np.ndarray, wave_type: np.ndarray) -> Tuple[np.ndarray, list, np.ndarray]:
+        """为每个波选出单位圆表，返回 (每个波的采样点数, 用到的表, 每个波所用表的序号)
+
+        同一种表只从缓存取一次；半径不为正的波没有点。
+        """
+        # 类型 0 把圆周等分为 max(360, r) 份；类型 1 直接用整数作为弧度，有另一种效果
+        num_points = np.ceil(np.maximum(360, radius)).astype(np.intp)
+        if self.tolerance > 0 and self.room is None:
+            fold_size = min(self.right - self.left, self.bottom - self.top)
+            adaptive = (wave_type == 0) & (radius > 0)
+            # 误差预算一半给采样，一半给化简
+            num_points[adaptive] = np.minimum(num_points[adaptive],
+                                              adaptive_point_count(radius[adaptive], self.tolerance / 2, fold_size))
+        quantized = -(-num_points // self.angle_quantum) * self.angle_quantum
+        whole_radians = wave_type != 0
+        keys, table_of_wave = np.unique(quantized * 2 + whole_radians, return_inverse=True)
+        tables = [angle_table(int(key // 2), bool(key % 2)) for key in keys]
+        lengths = np.array([len(table) for table in tables], dtype=np.intp)
+        # 类型 0 用整张表，类型 1 只用表的前 num_points 个点
+        counts = np.where(whole_radians, num_points, lengths[table_of_wave])
+        counts[radius <= 0] = 0
+        return counts, tables, table_of_wave
+
+    @staticmethod
+    def _table_bank(tables: list, table_of_wave: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """把用到的表拼成一张总表，返回 (总表, 每个波的偏移)：第 i 个点的采样为 bank[i + shift[第 i 个点所属的波]]"""
+        if not tables:
+            return np.empty((0, 2)), np.empty(0, dtype=np.intp)
+        bank = np.concatenate(tables)
+        bank_start = np.zeros(len(tables), dtype=np.intp)
+        np.cumsum([len(table) for table in tables[:-1]], out=bank_start[1:])
+        return bank, bank_start[table_of_wave] - offsets[:-1]
+
+    def hidden_waves(self, radius: np.ndarray, sources: np.ndarray,
+                     viewport: Tuple[float, float, float, float]) -> np.ndarray:
+        """不可能出现在视口中的波
+
+        视口先裁剪到边界内，裁剪后为空时所有波都看不见。还没碰到边界的波就是完整的圆，
+        视口整个在圆外、或整个被圆包住时圆周与视口不相交；碰到边界的波折叠后可能出现在任何位置，不剔除。
+        """
+        x0, y0 = max(viewport[0], self.left), max(viewport[1], self.top)
+        x1, y1 = min(viewport[2], self.right), min(viewport[3], self.bottom)
+        if x0 > x1 or y0 > y1:
+            return np.ones(len(radius), dtype=bool)
+        sx, sy = sources[:, 0], sources[:, 1]
+        unfolded = ((sx - radius >= self.left) & (sx + radius <= self.right)
+                    & (sy - radius >= self.top) & (sy + radius <= self.bottom))
+        # 视口中离圆心最近和最远的距离
+        near = np.hypot(np.clip(sx, x0, x1) - sx, np.clip(sy, y0, y1) - sy)
+        far = np.hypot(np.maximum(sx - x0, x1 - sx), np.maximum(sy - y0, y1 - sy))
+        return unfolded & ((near > radius) | (far < radius))
+
+    def reflect(self, alpha: float = 0, viewport: Optional[Tuple[float, float, float, float]] = None):
+        """一次性计算所有存活波的采样点并折叠进边界（或在 room 中追踪反射）
+
+        alpha 为两步之间的插值比例，按 radius + alpha * speed 计算，不改变波的状态。
+        给出 viewport（引擎坐标的 (左, 上, 右, 下)）时，看不见的波不采样，只留下空折线。
+        """
+        live = self.live_slots()
+        radius = self.radius[live]
+        if alpha:
+            radius = radius + alpha * self.speed[live]
+        wave_type = self.type[live]
+        counts, tables, table_of_wave = self._select_tables(radius, wave_type)
+        self.emitted_points = int(counts.sum())
+        if viewport is not None and self.room is None:
+            hidden = self.hidden_waves(radius, self.source[live], viewport)
+            counts[hidden] = 0
+
+        offsets = self._offsets[:len(live) + 1]
+        np.cumsum(counts, out=offsets[1:])
+        total = offsets[-1]
+
+        # 所属波序号和输出点都写入复用的缓冲区
+        self._wave_index = _reserve(self._wave_index, total)
+        self._buffer = _reserve(self._buffer, total)
+        wave_index = self._wave_index[:total]
+        points = self._buffer[:total]
+        if self.room is not None:
+            # 多边形房间按缓存的射线路径逐波查出位置，不做矩形折叠；
+            # 射线路径按表的数据地址缓存，这里要传缓存中的表，不能传复用缓冲区的切片
+            for i in np.flatnonzero(counts):
+                table = tables[table_of_wave[i]][:counts[i]]
+                self.room.wave_points(self.source[live[i]], table, radius[i], out=points[offsets[i]:offsets[i + 1]])
+            # 类型 0 的相邻采样点间隔一段弧长，类型 1 按整数弧度采样，本来就不连续
+            spacing = 2 * np.pi * radius / np.maximum(counts, 1)
+            points, offsets, pieces, closed = split_wavefronts(points, offsets, spacing, wave_type == 0)
+            self.points = points
+            self.offsets = offsets
+            self.reflected_slots = live[pieces]
+            self.closed = closed
+            return
+        bank, shift = self._table_bank(tables, table_of_wave, offsets)
+        wave_index[:] = np.repeat(np.arange(len(live)), counts)
+        kernels = load_kernels(wait=False) if self.use_numba else None
+        place_waves = kernels.place_waves if kernels else _place_waves_numpy
+        fold = kernels.fold if kernels else _fold_numpy
+        # 自适应采样要先在折叠前插入墙上的顶点，再单独折叠
+        place_waves(bank, shift, wave_index, self.source[live], radius, self.bounds,
+                    self.tolerance <= 0, points)
+        if self.tolerance > 0:
+            # 只有类型 0 的波是按圆周顺序采样的，才能插入折叠顶点和化简
+            adaptive = wave_type[wave_index] == 0
+            points, offsets = insert_fold_vertices(points, offsets, self.bounds, adaptive)
+            # 剔除的波都没碰到墙，不会插入顶点，插入后的点数仍可与剔除前相比
+            self.emitted_points += len(points) - total
+            adaptive = np.repeat(wave_type == 0, np.diff(offsets))
+            fold(points, self.bounds)
+            points, offsets = simplify_polylines(points, offsets, self.tolerance / 2, adaptive)
+        self.points = points
+        self.offsets = offsets
+        self.reflected_slots = live
+        self.closed = np.ones(len(live), dtype=bool)
+
+    def translated(self, offset: Tuple[float, float], scale: float = 1) -> np.ndarray:
+        """最近一次反射的所有点放大 scale 倍再平移 offset 后的结果，写入复用的缓冲区"""
+        self._translated = _reserve(self._translated, len(self.points))
+        points = self._translated[:len(self.points)]
+        if scale == 1:
+            np.add(self.points, offset, out=points)
+        else:
+            np.multiply(self.points, scale, out=points)
+            points += offset
+        return points
+
+    def polylines(self, offset: Optional[Tuple[float, float]] = None, scale: float = 1,
+                  viewport: Optional[Tuple[float, float, float, float]] = None
+                  ) -> Iterator[Tuple[int, np.ndarray, bool]]:
+        """按从旧到新的顺序返回 (槽位, 点集视图, 是否闭合)，跳过不足两个点的折线
+
+        给出 offset 时返回变换后的点，视图在下一次调用前有效。
+        给出 viewport（变换后坐标）时跳过包围盒与视口不相交的折线。
+        """
+        points = self.points if offset is None else self.translated(offset, scale)
+        counts = np.diff(self.offsets)
+        visible = counts > 1
+        if viewport is not None and visible.any():
+            starts = self.offsets[:-1][visible]
+            low = np.minimum.reduceat(points, starts)
+            high = np.maximum.reduceat(points, starts)
+            # reduceat 在相邻起点之间归约，中间夹着的空折线没有点，不影响结果
+            visible[visible] = ((high[:, 0] >= viewport[0]) & (low[:, 0] <= viewport[2])
+                                & (high[:, 1] >= viewport[1]) & (low[:, 1] <= viewport[3]))
+        for i in np.flatnonzero(visible):
+            yield self.reflected_slots[i], points[self.offsets[i]:self.offsets[i + 1]], bool(self.closed[i])
+
+    def segments(self, offset: Optional[Tuple[float, float]] = None, scale: float = 1,
+                 viewport: Optional[Tuple[float, float, float, float]] = None
+                 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """最近一次反射的所有折线拆成线段：(起点, 终点, 线段所属折线的序号, 起点在 points 中的下标)
+
+        序号指向 reflected_slots/offsets 中的第几段折线；不闭合的折线没有首尾相接的一段。
+        给出 offset 时返回变换后的坐标；给出 viewport（变换后坐标）时丢弃
+        两个端点在视口同一侧之外的线段。
+        """
+        points = self.points if offset is None else self.translated(offset, scale)
+        _, nxt = _ring_neighbors(self.offsets)
+        wave_index = np.repeat(np.arange(len(self.reflected_slots)), np.diff(self.offsets))
+        if self.closed.all():
+            keep = None
+        else:
+            keep = self.closed[wave_index] | (nxt > np.arange(len(points)))
+        if viewport is not None:
+            ends = points[nxt]
+            outside = ((np.minimum(points[:, 0], ends[:, 0]) > viewport[2])
+                       | (np.maximum(points[:, 0], ends[:, 0]) < viewport[0])
+                       | (np.minimum(points[:, 1], ends[:, 1]) > viewport[3])
+                       | (np.maximum(points[:, 1], ends[:, 1]) < viewport[1]))
+            keep = ~outside if keep is None else keep & ~outside
+        if keep is None:
+            return points, points[nxt], wave_index, np.arange(len(points))
+        index = np.flatnonzero(keep)
+        return points[index], points[nxt[index]], wave_index[index], index
+
+    def field(self, orders: int, cell: float) -> np.ndarray:
+        """用镜像法计算盒子内的标量波幅场，返回 (列数, 行数) 的 float32 网格
+
+        每个波源发出波长为 radius_gap 的连续波，波前在该波源最大的存活半径处，
+        波前之外振幅为 0。盒子内的场等于波源和它所有像（反射次数不超过 orders）
+        在自由空间中的叠加，振幅按柱面波 1/sqrt(d) 衰减。cell 为网格的像素边长。
+        """
+        nx = max(1, int(round((self.right - self.left) / cell)))
+        ny = max(1, int(round((self.bottom - self.top) / cell)))
+        x = (self.left + (np.arange(nx, dtype=np.float32) + 0.5) * cell)[:, None]
+        y = (self.top + (np.arange(ny, dtype=np.float32) + 0.5) * cell)[None, :]
+        field = np.zeros((nx, ny), dtype=np.float32)
+        if self.count == 0:
+            return field
+
+        live = self.live_slots()
+        wavenumber = np.float32(2 * np.pi / self.radius_gap)
+        sources, group = np.unique(self.source[live], axis=0, return_inverse=True)
+        fronts = np.zeros(len(sources))
+        np.maximum.at(fronts, group.ravel(), self.radius[live])
+        for source, front in zip(sources, fronts):
+            for ix, iy in image_sources(source, self.bounds, orders):
+                # 波前还没到达盒子的像不用计算
+                gap_x = max(self.left - ix, 0, ix - self.right)
+                gap_y = max(self.top - iy, 0, iy - self.bottom)
+                if np.hypot(gap_x, gap_y) > front:
+                    continue
+                d = np.hypot(x - np.float32(ix), y - np.float32(iy))
+                wave = np.cos(wavenumber * (d - np.float32(front))) / np.sqrt(np.maximum(d, np.float32(cell)))
+                field += np.where(d <= front, wave, np.float32(0))
+        return field
+
+
+class WaveTimeline:
+    """从引擎当前状态开始的时间轴，可直接跳到任意一帧
+
+    每个波的半径只取决于它的产生帧：r = r0 + speed * (t - birth)。
+    产生/回收波的事件只记录一次（每帧累计产生数、回收数），此后跳到第 t 帧
+    只需查出存活的波并直接写入半径，不必逐帧重放。
+    事件表按需向后延伸，延伸时只推进半径和队列，不计算反射。
+    """
+
+    def __init__(self, engine: WaveEngine, start_frame: int = 0):
+        self.engine = engine
+        self.start_frame = start_frame
+        self._runner = copy.deepcopy(engine)
+        self._runner._buffer = np.empty((0, 2))
+
+        # 按产生顺序编号的每个波的参数，起始时已存活的波视为在 start_frame 产生
+        live = engine.live_slots()
+        self._birth = [start_frame] * len(live)
+        self._radius0 = engine.radius[live].tolist()
+        self._speed = engine.speed[live].tolist()
+        self._source = engine.source[live].tolist()
+        self._type = engine.type[live].tolist()
+        self._color = engine.color[live].tolist()
+        self._emitter = engine.emitter[live].tolist()
+
+        # 时间轴按产生顺序给波编号，第 0 号对应引擎中的 _first_id 号
+        self._first_id = engine.spawned - engine.count
+        # 第 i 项为 start_frame + i 帧时的累计产生数、回收数和调色板位置
+        self._spawned = [len(live)]
+        self._retired = [0]
+        self._palette = [engine._palette_index]
+
+    @property
+    def end_frame(self) -> int:
+        """事件表已经覆盖到的最后一帧"""
+        return self.start_frame + len(self._spawned) - 1
+
+    def extend(self, frame: int):
+        """把事件表延伸到第 frame 帧，不改变引擎；事件表建好后（例如复制到其他进程）跳转不再逐帧推进"""
+        runner = self._runner
+        while self.end_frame < frame:
+            spawned, retired = runner.spawned, runner.retired
+            runner.step(reflect=False)
+            birth = self.end_frame + 1
+            new = runner.spawned - spawned
+            # 新产生的波总在队尾
+            for k in range(new):
+                slot = (runner.head + runner.count - new + k) % runner.capacity
+                self._birth.append(birth)
+                self._radius0.append(float(runner.radius[slot]))
+                self._speed.append(float(runner.speed[slot]))
+                self._source.append(runner.source[slot].tolist())
+                self._type.append(int(runner.type[slot]))
+                self._color.append(runner.color[slot].tolist())
+                self._emitter.append(int(runner.emitter[slot]))
+            self._spawned.append(self._spawned[-1] + new)
+            self._retired.append(self._retired[-1] + runner.retired - retired)
+            self._palette.append(runner._palette_index)
+
+    def seek(self, frame: int) -> int:
+        """把引擎设置为第 frame 帧的状态并计算反射，返回实际到达的帧（不早于起点）"""
+        frame = max(frame, self.start_frame)
+        self.extend(frame)
+        i = frame - self.start_frame
+        first, last = self._retired[i], self._spawned[i]
+
+        engine = self.engine
+        serial = np.arange(first, last)
+        slots = serial % engine.capacity
+        birth = np.array(self._birth[first:last], dtype=float)
+        speed = np.array(self._speed[first:last], dtype=float)
+        engine.head = first % engine.capacity
+        engine.count = last - first
+        engine.spawned = self._first_id + last
+        engine.retired = self._first_id + first
+        engine.radius[slots] = np.array(self._radius0[first:last], dtype=float) + speed * (frame - birth)
+        engine.speed[slots] = speed
+        engine.source[slots] = np.array(self._source[first:last], dtype=float).reshape(-1, 2)
+        engine.type[slots] = self._type[first:last]
+        engine.color[slots] = np.array(self._color[first:last], dtype=np.uint8).reshape(-1, 3)
+        emitters = np.array(self._emitter[first:last], dtype=np.intp)
+        engine.emitter[slots] = emitters
+        if len(engine.emitter_age):
+            # 每个波源最新一个波的半径，就是它距离下次发波已走过的距离
+            owned = emitters >= 0
+            age = np.full(len(engine.emitter_age), np.inf)
+            np.minimum.at(age, emitters[owned], engine.radius[slots][owned])
+            engine.emitter_age[:] = np.where(np.isfinite(age), age, 0)
+        engine._palette_index = self._palette[i]
+        engine.last_source = self._runner.last_source
+        engine.reflect()
+        return frame
@@ -0,0 +1,161 @@
+"""无窗口导出波反射动画
+
+从给定波源发射一组波，按固定步长逐帧推进，把指定范围内的帧渲染成 PNG 序列，
+可选再用 ffmpeg 合成视频。波的状态只取决于帧数，所以帧范围被切成若干段，多核并行互不依赖：
+主进程先建好覆盖整个范围的时间轴（WaveTimeline），每段在独立进程中直接跳到起始帧再渲染，
+不必从第 0 帧重放。
+
+用法示例：
+    python wave_export.py --source 100 -50 --frames 0 3000 --out frames --video waves.mp4
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import pygame
+
+from wave_config import (BLACK, BLUE, GREEN, HEIGHT, RAINBOW_COLORS, RED, WHITE, WIDTH, WINDOW_HEIGHT,
+                         WINDOW_WIDTH, WaveConfig)
+from wave_engine import WaveEngine, WaveTimeline
+from wave_render import PixelRenderer
+
+FRAME_PATTERN = "frame_%06d.png"
+
+
+@dataclass
+class ExportConfig:
+    """默认与 simple_wave_reflection.py 的设置（wave_config.WaveConfig）相同"""
+    source: Tuple[float, float] = (0, 0)  # 波源，相对窗口中心
+    wave_count: int = WaveConfig.WAVE_COUNT
+    radius_gap: float = WaveConfig.RADIUS_GAP
+    wave_speed: float = WaveConfig.WAVE_SPEED
+    angle_quantum: int = WaveConfig.ANGLE_QUANTUM
+    tolerance: float = WaveConfig.WAVE_TOLERANCE
+    dedup: bool = WaveConfig.DEDUP_SEGMENTS  # 光栅化前去掉重复线段
+    out_dir: str = "frames"
+
+
+def create_engine(config: ExportConfig) -> WaveEngine:
+    """创建与交互程序相同设置的引擎，并从波源发射第一组波"""
+    engine = WaveEngine(
+        (-WIDTH // 2, -HEIGHT // 2, WIDTH // 2, HEIGHT // 2),
+        capacity=config.wave_count * 2,
+        wave_count=config.wave_count,
+        radius_gap=config.radius_gap,
+        speed=config.wave_speed,
+        palette=(BLUE, GREEN, RED),
+        angle_quantum=config.angle_quantum,
+        tolerance=config.tolerance
+    )
+    engine.emit(*config.source)
+    return engine
+
+
+def _init_worker():
+    # 多进程已占满所有核，每个进程内的 numba 内核只用一个线程，避免线程过量
+    try:
+        import numba
+        numba.set_num_threads(1)
+    except ImportError:
+        pass
+
+
+def create_timeline(config: ExportConfig, stop: int) -> WaveTimeline:
+    """从发射时刻开始、事件表覆盖到 stop 帧的时间轴，只在主进程建一次，各段共用"""
+    timeline = WaveTimeline(create_engine(config))
+    timeline.extend(stop)
+    return timeline
+
+
+def render_range(config: ExportConfig, timeline: WaveTimeline, start: int, stop: int) -> int:
+    """渲染 [start, stop) 帧并写入 out_dir，返回写出的帧数
+
+    第 n 帧是发射后推进 n 步的状态。timeline 的事件表已覆盖到 stop，
+    跳到 start 只需写入此时存活的波，与前面的帧数无关。
+    """
+    timeline.seek(start)
+    engine = timeline.engine
+
+    surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+    renderer = PixelRenderer((WINDOW_WIDTH, WINDOW_HEIGHT), RAINBOW_COLORS, background=BLACK, dedup=config.dedup)
+    offset = (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)
+    border = pygame.Rect((WINDOW_WIDTH - WIDTH) // 2, (WINDOW_HEIGHT - HEIGHT) // 2, WIDTH, HEIGHT)
+    for frame in range(start, stop):
+        if frame > start:
+            # seek 已经计算了起始帧的反射
+            engine.step()
+        renderer.render(surface, engine, offset)
+        pygame.draw.rect(surface, WHITE, border, 2)
+        pygame.image.save(surface, os.path.join(config.out_dir, FRAME_PATTERN % frame))
+    return stop - start
+
+
+def split_frames(start: int, stop: int, chunk: int) -> List[Tuple[int, int]]:
+    return [(s, min(s + chunk, stop)) for s in range(start, stop, chunk)]
+
+
+def export_frames(config: ExportConfig, start: int, stop: int, workers: int, chunk: int):
+    """把帧范围切段后分给进程池渲染"""
+    os.makedirs(config.out_dir, exist_ok=True)
+    ranges = split_frames(start, stop, chunk)
+    timeline = create_timeline(config, stop)
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(render_range, config, timeline, s, e) for s, e in ranges]
+        for future in as_completed(futures):
+            done += future.result()
+            print(f"\r{done}/{stop - start} frames", end="", flush=True)
+    print()
+
+
+def encode_video(config: ExportConfig, start: int, fps: int, video: str):
+    """用 ffmpeg 把 PNG 序列合成视频"""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        sys.exit("ffmpeg not found, frames are kept in " + config.out_dir)
+    subprocess.run([
+        ffmpeg, "-y", "-loglevel", "error",
+        "-framerate", str(fps),
+        "-start_number", str(start),
+        "-i", os.path.join(config.out_dir, FRAME_PATTERN),
+        "-pix_fmt", "yuv420p",
+        video
+    ], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the wave reflection animation without a display")
+    parser.add_argument("--source", type=float, nargs=2, default=(0, 0), metavar=("X", "Y"),
+                        help="wave source relative to the window centre")
+    parser.add_argument("--frames", type=int, nargs=2, default=(0, 600), metavar=("START", "STOP"),
+                        help="frame range [START, STOP)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--chunk", type=int, default=50, help="frames per task")
+    parser.add_argument("--out", default="frames", help="directory of the PNG sequence")
+    parser.add_argument("--video", help="encode the frames to this video file with ffmpeg")
+    parser.add_argument("--fps", type=int, default=60, help="frame rate of the video")
+    parser.add_argument("--tolerance", type=float, default=WaveConfig.WAVE_TOLERANCE,
+                        help="adaptive sampling tolerance in pixels")
+    args = parser.parse_args()
+
+    start, stop = args.frames
+    if start < 0 or stop <= start:
+        parser.error("--frames needs 0 <= START < STOP")
+    config = ExportConfig(source=tuple(args.source), tolerance=args.tolerance, out_dir=args.out)
+
+    begin = time.perf_counter()
+    export_frames(config, start, stop, max(1, args.workers), max(1, args.chunk))
+    print(f"rendered {stop - start} frames in {time.perf_counter() - begin:.1f}s")
+    if args.video:
+        encode_video(config, start, args.fps, args.video)
+        print(f"wrote {args.video}")
+
+
+if __name__ == "__main__":
+    main()
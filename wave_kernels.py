@@ -0,0 +1,99 @@
+"""波模拟的 numba 内核
+
+导入本模块会加载 numba，耗时较长，所以 wave_engine/wave_render 只在第一次需要时
+（或在后台线程预热时）通过 wave_engine.load_kernels() 导入它。
+所有内核都用 cache=True 编译，第二次启动时直接从磁盘缓存加载。
+"""
+import os
+import sys
+
+import numpy as np
+
+if getattr(sys, "frozen", False):
+    # 打包后的程序目录可能不可写，编译缓存放到用户缓存目录；必须在导入 numba 前设置
+    _cache_root = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    os.environ.setdefault("NUMBA_CACHE_DIR", os.path.join(_cache_root, "Waves", "numba"))
+
+# 内核会在后台线程中加载；TBB 线程层在非主线程初始化后，进程退出时会卡住，优先用 OpenMP
+os.environ.setdefault("NUMBA_THREADING_LAYER_PRIORITY", "omp workqueue tbb")
+
+from numba import njit, prange, typeof
+
+
+@njit(cache=True)
+def _fold_scalar(coord, min_bound, max_bound):
+    total_range = max_bound - min_bound
+    relative_pos = coord - min_bound
+    n = relative_pos // total_range
+    remainder = relative_pos % total_range
+    if int(n) % 2 == 0:
+        return min_bound + remainder
+    else:
+        return max_bound - remainder
+
+
+@njit(parallel=True, cache=True)
+def place_waves(bank, shift, wave_index, sources, radii, bounds, fold, out):
+    # 第 i 个点的单位圆采样为 bank[i + shift[w]]，w 为它所属的波
+    left, top, right, bottom = bounds[0], bounds[1], bounds[2], bounds[3]
+    for i in prange(out.shape[0]):
+        w = wave_index[i]
+        j = i + shift[w]
+        x = sources[w, 0] + radii[w] * bank[j, 0]
+        y = sources[w, 1] + radii[w] * bank[j, 1]
+        if fold:
+            x = _fold_scalar(x, left, right)
+            y = _fold_scalar(y, top, bottom)
+        out[i, 0] = x
+        out[i, 1] = y
+
+
+@njit(parallel=True, cache=True)
+def fold(points, bounds):
+    left, top, right, bottom = bounds[0], bounds[1], bounds[2], bounds[3]
+    for i in prange(points.shape[0]):
+        points[i, 0] = _fold_scalar(points[i, 0], left, right)
+        points[i, 1] = _fold_scalar(points[i, 1], top, bottom)
+
+
+@njit(cache=True)
+def rasterize(pixels, starts, ends, colors, width):
+    w, h = pixels.shape
+    low = -(width // 2) + (1 - width % 2)
+    high = width // 2
+    for s in range(starts.shape[0]):
+        x0 = int(np.floor(starts[s, 0]))
+        y0 = int(np.floor(starts[s, 1]))
+        dx = int(np.floor(ends[s, 0])) - x0
+        dy = int(np.floor(ends[s, 1])) - y0
+        steps = max(abs(dx), abs(dy))
+        x_major = abs(dx) > abs(dy)
+        for k in range(steps + 1):
+            t = k / steps if steps > 0 else 0.0
+            x = x0 + int(np.rint(t * dx))
+            y = y0 + int(np.rint(t * dy))
+            for offset in range(low, high + 1):
+                xx = x if x_major else x + offset
+                yy = y + offset if x_major else y
+                if 0 <= xx < w and 0 <= yy < h:
+                    pixels[xx, yy] = colors[s]
+
+
+def _compile(kernel, *args):
+    # 只按参数类型编译（或从缓存加载），不执行；并行内核不能在后台线程里启动线程池
+    kernel.compile(tuple(typeof(arg) for arg in args))
+
+
+def warm_up():
+    """按运行时的参数类型编译或从缓存加载每个内核，可以在后台线程中调用"""
+    points = np.zeros((4, 2))
+    wave_index = np.zeros(4, dtype=np.intp)
+    radii = np.ones(4)
+    bounds = np.zeros(4)
+    for fold_points in (True, False):
+        _compile(place_waves, points, wave_index, wave_index, points, radii, bounds, fold_points, points)
+    _compile(fold, points, bounds)
+    # 帧缓冲是转置的视图，surfarray.pixels2d 是普通数组，两种布局都预热
+    colors = np.zeros(1, dtype=np.uint32)
+    for pixels in (np.zeros((4, 4), dtype=np.uint32), np.zeros((4, 4), dtype=np.uint32).T):
+        _compile(rasterize, pixels, points, points, colors, 1)
@@ -0,0 +1,250 @@
+"""波模拟的 pygame 绘制辅助
+
+把大量线段直接光栅化进像素数组，代替逐段调用 pygame.draw.line。
+像素数组为 (宽, 高) 的 uint32，颜色用 Surface.map_rgb 映射后的整数。
+安装了 numba 时用编译内核（wave_kernels）光栅化，否则退回 numpy 实现。
+另外提供把标量波幅场画成热力图的 FieldRenderer。
+"""
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+from wave_engine import WaveEngine, load_kernels
+
+import numpy as np
+import pygame
+
+Color = Tuple[int, int, int]
+
+
+def _thickness_offsets(width: int) -> np.ndarray:
+    # 与 pygame.draw.line 相同：偶数线宽向正方向多画一像素
+    return np.arange(-(width // 2) + (1 - width % 2), width // 2 + 1)
+
+
+def _rasterize_numpy(pixels, starts, ends, colors, width):
+    p0 = np.floor(starts).astype(np.intp)
+    delta = np.floor(ends).astype(np.intp) - p0
+    steps = np.abs(delta).max(axis=1)
+
+    counts = steps + 1
+    offsets = np.zeros(len(counts) + 1, dtype=np.intp)
+    np.cumsum(counts, out=offsets[1:])
+    segment = np.repeat(np.arange(len(counts)), counts)
+    t = (np.arange(offsets[-1]) - offsets[:-1][segment]) / np.maximum(steps, 1)[segment]
+    x = p0[segment, 0] + np.rint(t * delta[segment, 0]).astype(np.intp)
+    y = p0[segment, 1] + np.rint(t * delta[segment, 1]).astype(np.intp)
+
+    # 横向为主的线段纵向加粗，纵向为主的线段横向加粗；按线段顺序写入，后画的覆盖先画的
+    x_major = (np.abs(delta[:, 0]) > np.abs(delta[:, 1]))[segment, None]
+    thickness = _thickness_offsets(width)
+    xx = (x[:, None] + thickness * ~x_major).ravel()
+    yy = (y[:, None] + thickness * x_major).ravel()
+    pixel_colors = np.repeat(colors[segment], len(thickness))
+    w, h = pixels.shape
+    inside = (xx >= 0) & (xx < w) & (yy >= 0) & (yy < h)
+    pixels[xx[inside], yy[inside]] = pixel_colors[inside]
+
+
+def rasterize_segments(pixels: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                       colors: np.ndarray, width: int = 1):
+    """把线段一次性画进 (宽, 高) 的像素数组
+
+    pixels 可以是 pygame.surfarray.pixels2d 返回的视图，也可以是独立的帧缓冲。
+    starts/ends 为 (N, 2) 的端点坐标，colors 为 (N,) 的映射后颜色。
+    线宽沿线段的次方向加粗，超出数组范围的像素被丢弃。
+    """
+    if len(starts) == 0:
+        return
+    kernels = load_kernels(wait=False)
+    if kernels:
+        kernels.rasterize(pixels, np.ascontiguousarray(starts, dtype=float),
+                          np.ascontiguousarray(ends, dtype=float), colors, width)
+    else:
+        _rasterize_numpy(pixels, starts, ends, colors, width)
+
+
+@dataclass
+class DedupStats:
+    """去重前后的线段数和光栅化像素数（每段按主方向的像素数乘线宽估算）"""
+    segments_in: int = 0
+    segments_out: int = 0
+    pixels_in: int = 0
+    pixels_out: int = 0
+
+    def reset(self):
+        self.segments_in = self.segments_out = self.pixels_in = self.pixels_out = 0
+
+    def add(self, starts: np.ndarray, ends: np.ndarray, keep: np.ndarray, width: int):
+        pixels = (np.abs(np.floor(ends) - np.floor(starts)).max(axis=1) + 1) * width
+        self.segments_in += len(starts)
+        self.segments_out += len(keep)
+        self.pixels_in += int(pixels.sum())
+        self.pixels_out += int(pixels[keep].sum())
+
+    @property
+    def saved(self) -> float:
+        """省掉的像素写入比例"""
+        return 1 - self.pixels_out / self.pixels_in if self.pixels_in else 0.0
+
+
+def dedup_segments(starts: np.ndarray, ends: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """返回去重后要保留的线段下标，保持原来的绘制顺序
+
+    端点按光栅化的取整方式量化到像素：两端落在同一像素的线段只画出相邻线段端点已覆盖的一点，直接去掉；
+    量化后端点相同（不计方向）且 keys（颜色等）相同的线段只保留最后一次出现，后画的覆盖先画的，结果不变。
+    """
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.intp)
+    p0 = np.floor(starts).astype(np.int64)
+    p1 = np.floor(ends).astype(np.int64)
+    moving = (p0 != p1).any(axis=1)
+    swap = (p0[:, 0] > p1[:, 0]) | ((p0[:, 0] == p1[:, 0]) & (p0[:, 1] > p1[:, 1]))
+    low = np.where(swap[:, None], p1, p0)
+    high = np.where(swap[:, None], p0, p1)
+    candidates = np.flatnonzero(moving)[::-1]  # 倒序：稳定排序后每组的第一个就是原顺序中的最后一次
+    ends_packed = np.column_stack((low, high))[candidates]
+    if ends_packed.size and np.abs(ends_packed).max() < 1 << 15:
+        # 四个端点坐标各 16 位拼成一个 int64，比按行 unique 快得多
+        packed = np.zeros(len(candidates), dtype=np.int64)
+        for column in range(4):
+            packed = (packed << 16) | (ends_packed[:, column] + (1 << 15))
+        order = np.lexsort((keys[candidates], packed))
+        packed, sorted_keys = packed[order], keys[candidates][order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (packed[1:] != packed[:-1]) | (sorted_keys[1:] != sorted_keys[:-1])
+        return np.sort(candidates[order[first]])
+    rows = np.column_stack((ends_packed, keys[candidates].astype(np.int64)))
+    _, first = np.unique(rows, axis=0, return_index=True)
+    return np.sort(candidates[first])
+
+
+def dedup_polyline(points: np.ndarray, closed: bool = True) -> np.ndarray:
+    """折线中要保留的点的下标：去掉量化后与前一点落在同一像素的点，闭合折线的末点与首点同像素时也去掉"""
+    pixels = np.floor(points)
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = (pixels[1:] != pixels[:-1]).any(axis=1)
+    if closed and len(points) > 1 and (pixels[-1] == pixels[0]).all():
+        keep[-1] = False
+    return np.flatnonzero(keep)
+
+
+def map_colors(surface: pygame.Surface, colors: Sequence[Color]) -> np.ndarray:
+    """把 RGB 颜色映射为 surface 像素格式的整数"""
+    return np.array([surface.map_rgb(color) for color in colors], dtype=np.uint32)
+
+
+def draw_rainbow_polyline(surface: pygame.Surface, points: np.ndarray,
+                          colors: Sequence[Color], width: int = 1, closed: bool = True):
+    """折线的第 i 段用 colors[i % len(colors)]，闭合时首尾相接的一段用 colors[-1]
+
+    所有线段在一次光栅化中直接写入 surface 的像素。
+    """
+    palette = map_colors(surface, colors)
+    segment_colors = palette[np.arange(len(points)) % len(palette)]
+    segment_colors[-1] = palette[-1]
+    ends = np.roll(points, -1, axis=0)
+    if not closed:
+        points, ends, segment_colors = points[:-1], ends[:-1], segment_colors[:-1]
+    pixels = pygame.surfarray.pixels2d(surface)
+    rasterize_segments(pixels, points, ends, segment_colors, width)
+    del pixels  # 释放对 surface 的锁定
+
+
+class PixelRenderer:
+    """把所有波前光栅化进一块 numpy 帧缓冲，每帧只 blit 一次
+
+    帧缓冲与窗口同样大小，按窗口的像素格式保存映射后的颜色（每像素一个 uint32），
+    直接 blit_array 到窗口上。
+    类型 0 的波用各自的颜色，类型 1 的波按段循环彩虹色，与 pygame.draw 的画法一致。
+    """
+
+    def __init__(self, size: Tuple[int, int], rainbow_colors: Sequence[Color],
+                 background: Color = (0, 0, 0), line_width: int = 3, rainbow_width: int = 2,
+                 dedup: bool = True):
+        # (宽, 高) 的视图，内存按行存放，与 Surface 的像素布局一致，blit 时是连续拷贝
+        self.framebuffer = np.zeros(size[::-1], dtype=np.uint32).T
+        self.rainbow_colors = list(rainbow_colors)
+        self.background = background
+        self.line_width = line_width
+        self.rainbow_width = rainbow_width
+        self.drawn_points = 0  # 最近一帧剔除后实际光栅化的线段数
+        # 光栅化前在像素空间去掉重复线段，stats 为最近一帧的统计
+        self.dedup = dedup
+        self.stats = DedupStats()
+
+    def render(self, screen: pygame.Surface, engine: WaveEngine, offset: Tuple[float, float],
+               scale: float = 1, rect: Optional[pygame.Rect] = None) -> int:
+        """把引擎最近一次反射的结果按 scale 缩放、offset 平移后画到 screen，返回绘制调用数
+
+        给出 rect 时只清空、更新 screen 的这块区域，其余像素保持不变。
+        完全在区域之外的线段在光栅化之前就被剔除。
+        """
+        if rect is None:
+            rect = pygame.Rect((0, 0), self.framebuffer.shape)
+        region = self.framebuffer[rect.left:rect.right, rect.top:rect.bottom]
+        region.fill(screen.map_rgb(self.background))
+        margin = max(self.line_width, self.rainbow_width)
+        starts, ends, wave_index, point_index = engine.segments(
+            offset, scale, (rect.left - margin, rect.top - margin, rect.right + margin, rect.bottom + margin))
+        slots = engine.reflected_slots
+        counts = np.diff(engine.offsets)
+        wave_type = engine.type[slots]
+        wave_colors = map_colors(screen, engine.color[slots].tolist())
+        palette = map_colors(screen, self.rainbow_colors)
+
+        # 段在所属波中的序号，决定彩虹色；每个波首尾相接的一段固定用最后一种颜色
+        local = point_index - engine.offsets[:-1][wave_index]
+        rainbow = palette[local % len(palette)]
+        rainbow[local == counts[wave_index] - 1] = palette[-1]
+        segment_type = wave_type[wave_index]
+        colors = np.where(segment_type == 0, wave_colors[wave_index], rainbow)
+
+        # 与逐波绘制时相同：少于两个点的波不画，类型 1 少于 7 个点不画
+        drawable = counts[wave_index] > 1
+        calls = 0
+        self.drawn_points = 0
+        self.stats.reset()
+        for wave_kind, width, min_points in ((0, self.line_width, 2), (1, self.rainbow_width, 7)):
+            mask = drawable & (segment_type == wave_kind) & (counts[wave_index] >= min_points)
+            if mask.any():
+                index = np.flatnonzero(mask)
+                if self.dedup:
+                    keep = dedup_segments(starts[index], ends[index], colors[index])
+                    self.stats.add(starts[index], ends[index], keep, width)
+                    index = index[keep]
+                rasterize_segments(self.framebuffer, starts[index], ends[index], colors[index], width)
+                calls += 1
+                self.drawn_points += len(index)
+
+        if rect.size == screen.get_size():
+            pygame.surfarray.blit_array(screen, self.framebuffer)
+        else:
+            pygame.surfarray.blit_array(screen.subsurface(rect), region)
+        return calls + 1
+
+
+def diverging_palette(size: int = 256) -> np.ndarray:
+    """负值为蓝、零为黑、正值为红的颜色表，形状 (size, 3)"""
+    t = np.linspace(-1, 1, size)
+    palette = np.column_stack((np.maximum(t, 0), 0.5 * t * t, np.maximum(-t, 0)))
+    return (palette * 255).astype(np.uint8)
+
+
+class FieldRenderer:
+    """把波幅网格按颜色表画成热力图，放大铺满边界框，每帧只 blit 一次"""
+
+    def __init__(self, palette: Optional[np.ndarray] = None, percentile: float = 99):
+        self.palette = diverging_palette() if palette is None else palette
+        # 按绝对值的百分位数归一化，避免波源附近的峰值压暗整个画面
+        self.percentile = percentile
+
+    def render(self, screen: pygame.Surface, field: np.ndarray, rect: pygame.Rect) -> int:
+        """field 为 (列数, 行数) 的网格，画到 screen 的 rect 区域，返回绘制调用数"""
+        scale = np.percentile(np.abs(field), self.percentile) if field.size else 0
+        if scale <= 0:
+            scale = 1
+        last = len(self.palette) - 1
+        index = np.clip((field / scale + 1) * (last / 2), 0, last).astype(np.intp)
+        surface = pygame.surfarray.make_surface(self.palette[index])
+        screen.blit(pygame.transform.scale(surface, rect.size), rect.topleft)
+        return 1
@@ -0,0 +1,160 @@
+"""多边形房间中的波前反射
+
+矩形边界可以用镜像折叠一次算出反射后的位置，任意多边形房间则要沿每条射线追踪：
+从波源出发的射线在墙上按镜面反射，波前就是所有射线走过距离 r 后的位置。
+
+墙预处理成数组：单位法向量、直线方程 n·x = c、线段端点和反射矩阵 I - 2nnᵀ，
+一次反弹对所有射线、所有墙向量化求交。每条射线的路径（每次反弹的起点、方向和累计距离）
+只与波源和射线方向有关、与半径无关，所以按 (波源, 单位圆表) 缓存，
+每帧只需按半径查出每条射线所在的路径段，再线性插值，代价与墙的数量无关。
+半径超过已追踪的长度时，路径再向后追踪若干次反弹。
+"""
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+Point = Tuple[float, float]
+
+PATH_CACHE_SIZE = 64  # 缓存的射线路径组数，每个 (波源, 单位圆表) 一组
+_EPSILON = 1e-9
+
+
+class PolygonRoom:
+    """凸多边形房间，可带若干内部墙（两面都反射的线段）
+
+    vertices 为房间外墙的顶点，按顺序首尾相接；interior_walls 为 ((x0, y0), (x1, y1)) 线段。
+    坐标与 WaveEngine 相同，以窗口中心为原点。
+    """
+
+    def __init__(self, vertices: Sequence[Point], interior_walls: Sequence[Tuple[Point, Point]] = ()):
+        self.vertices = np.array(vertices, dtype=float)
+        outer = np.stack((self.vertices, np.roll(self.vertices, -1, axis=0)), axis=1)
+        inner = np.array(interior_walls, dtype=float).reshape(-1, 2, 2)
+        self.walls = np.concatenate((outer, inner))  # (墙数, 2, 2)：每面墙的两个端点
+        self.outer_count = len(outer)
+
+        start, end = self.walls[:, 0], self.walls[:, 1]
+        edge = end - start
+        self.edge = edge
+        self.edge_length2 = (edge * edge).sum(axis=1)
+        normal = np.column_stack((-edge[:, 1], edge[:, 0])) / np.sqrt(self.edge_length2)[:, None]
+        self.normal = normal
+        self.offset = (normal * start).sum(axis=1)  # 直线方程 n·x = c 中的 c
+        # 关于每面墙的镜面反射：方向 v' = M v，点 x' = M x + 2 c n
+        self.reflection = np.eye(2) - 2 * normal[:, :, None] * normal[:, None, :]
+
+        self._paths: OrderedDict = OrderedDict()
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        left, top = self.vertices.min(axis=0)
+        right, bottom = self.vertices.max(axis=0)
+        return left, top, right, bottom
+
+    def contains(self, x: float, y: float) -> bool:
+        """点是否在外墙以内（外墙为凸多边形）"""
+        side = self.normal[:self.outer_count] @ (x, y) - self.offset[:self.outer_count]
+        return bool((side >= 0).all() or (side <= 0).all())
+
+    def mirror(self, points: np.ndarray, wall: int) -> np.ndarray:
+        """把点关于第 wall 面墙所在的直线做镜像"""
+        return points @ self.reflection[wall].T + 2 * self.offset[wall] * self.normal[wall]
+
+    def _next_hits(self, origin: np.ndarray, direction: np.ndarray,
+                   last_wall: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """所有射线与所有墙一次求交，返回 (最近的命中距离, 命中的墙)，没有命中时距离为 inf"""
+        # (射线数, 墙数)
+        facing = direction @ self.normal.T
+        distance = (self.offset[None, :] - origin @ self.normal.T) / np.where(
+            np.abs(facing) > _EPSILON, facing, np.nan)
+        hit = origin[:, None, :] + distance[:, :, None] * direction[:, None, :]
+        along = ((hit - self.walls[None, :, 0]) * self.edge[None]).sum(axis=2) / self.edge_length2
+        valid = (distance > _EPSILON) & (along >= -_EPSILON) & (along <= 1 + _EPSILON)
+        # 刚反射过的墙不会立即再次命中
+        valid[np.arange(len(origin)), last_wall] &= last_wall < 0
+        distance = np.where(valid, distance, np.inf)
+        wall = distance.argmin(axis=1)
+        return distance[np.arange(len(origin)), wall], wall
+
+    def _trace(self, path: dict, radius: float):
+        """把路径向后追踪，直到每条射线当前一段的终点（下一次命中）都超过 radius
+
+        所有射线同步反弹，第 k 层就是每条射线的第 k 段，层数等于最大反弹次数。
+        """
+        while (path["reach"] <= radius).any():
+            pending = np.flatnonzero(np.isfinite(path["reach"]))
+            origin = path["origin"][-1].copy()
+            direction = path["direction"][-1].copy()
+            start = path["start"][-1].copy()
+
+            # 在下一面墙上反射，不再命中任何墙的射线这一段与上一段相同
+            wall = path["next_wall"][pending]
+            hit = path["reach"][pending]
+            origin[pending] += (hit - start[pending])[:, None] * direction[pending]
+            direction[pending] = np.einsum("nij,nj->ni", self.reflection[wall], direction[pending])
+            start[pending] = hit
+            path["origin"].append(origin)
+            path["direction"].append(direction)
+            path["start"].append(start)
+            path["stacked"] = None
+            self._update_reach(path, pending, wall)
+
+    def _update_reach(self, path: dict, rays: np.ndarray, last_wall: np.ndarray):
+        """重新计算 rays 当前一段的下一次命中"""
+        origin = path["origin"][-1][rays]
+        direction = path["direction"][-1][rays]
+        distance, wall = self._next_hits(origin, direction, last_wall)
+        # 没有命中的射线（房间外或数值上漏过墙角）沿原方向一直走下去
+        path["reach"][rays] = path["start"][-1][rays] + distance
+        path["next_wall"][rays] = wall
+
+    def _path(self, source: Point, table: np.ndarray) -> dict:
+        # 类型 1 的表是缓存表的切片视图，每帧都是新对象，按数据地址和长度识别
+        key = (float(source[0]), float(source[1]), table.__array_interface__["data"][0], len(table))
+        path = self._paths.get(key)
+        if path is not None:
+            self._paths.move_to_end(key)
+            return path
+        n = len(table)
+        path = {
+            "table": table,  # 保持引用，使数据地址在缓存期间不被复用
+            # 每条射线的各段路径：起点、方向、从波源算起的累计距离
+            "origin": [np.tile(np.asarray(source, dtype=float), (n, 1))],
+            "direction": [np.asarray(table, dtype=float)],
+            "start": [np.zeros(n)],
+            "reach": np.zeros(n),  # 当前最后一段的终点，即下一次命中墙的累计距离
+            "next_wall": np.zeros(n, dtype=np.intp),
+            "stacked": None,
+        }
+        self._update_reach(path, np.arange(n), np.full(n, -1))
+        self._paths[key] = path
+        if len(self._paths) > PATH_CACHE_SIZE:
+            self._paths.popitem(last=False)
+        return path
+
+    def wave_points(self, source: Point, table: np.ndarray, radius: float,
+                    out: Optional[np.ndarray] = None) -> np.ndarray:
+        """从 source 出发、方向为 table 的各条射线走过 radius 后的位置"""
+        path = self._path(source, table)
+        self._trace(path, radius)
+        if path["stacked"] is None:
+            path["stacked"] = (np.stack(path["origin"]), np.stack(path["direction"]), np.stack(path["start"]))
+        origin, direction, start = path["stacked"]
+        # 每条射线在 radius 处所在的路径段：起点不超过 radius 的最后一段
+        segment = (start <= radius).sum(axis=0) - 1
+        rays = np.arange(len(table))
+        remaining = radius - start[segment, rays]
+        if out is None:
+            out = np.empty((len(table), 2))
+        np.multiply(direction[segment, rays], remaining[:, None], out=out)
+        out += origin[segment, rays]
+        return out
+
+    def clear_cache(self):
+        self._paths.clear()
+
+
+def regular_polygon(sides: int, radius: float, center: Point = (0, 0), rotation: float = 0) -> np.ndarray:
+    """正多边形的顶点，按顺序排列"""
+    angles = rotation + np.arange(sides) * 2 * np.pi / sides
+    return np.column_stack((center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)))